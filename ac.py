@@ -0,0 +1,128 @@
+import numpy as np
+import scipy.sparse as sp
+
+import solver
+from sparse_solver import SPARSE_MIN_SIZE, SparseLU
+
+
+# Small-signal AC analysis: (G + j w C) x = b_ac for every frequency of a sweep.
+#
+# The topology is the same at every frequency, so G, C and b_ac are assembled once. For circuits
+# up to SPARSE_MIN_SIZE unknowns the per-frequency matrices are built as one k x n x n complex
+# stack by broadcasting and solved with a single batched call (solver.solve_batch), in chunks
+# that keep the stack under BATCH_BYTES. Larger circuits are sparse and go through one sparse
+# LU per frequency instead.
+#
+# Diodes and transistors are replaced by their conductances at the DC operating point.
+
+
+# CONSTANTS
+BATCH_BYTES = 8 * 1024 ** 2     # Complex matrix stack built at once, small enough to stay in cache
+DEFAULT_POINTS_PER_DECADE = 100
+
+
+
+def decade_frequencies(start: float, stop: float, points_per_decade=DEFAULT_POINTS_PER_DECADE) -> np.ndarray:
+    """Logarithmically spaced frequencies in Hz, SPICE '.ac dec' style."""
+    if start <= 0 or stop <= start:
+        raise ValueError("AC sweep needs 0 < start < stop.")
+    count = int(np.ceil(np.log10(stop / start) * points_per_decade)) + 1
+    return np.logspace(np.log10(start), np.log10(stop), count)
+
+
+
+class ACResult:
+
+    def __init__(self, frequencies, x, names):
+
+        self.frequencies = frequencies
+        self.x = x              # k x n complex phasors, one row per frequency
+        self.names = names      # Node names, then "I(<element>)" for branch currents
+
+
+    def __getitem__(self, name) -> np.ndarray:
+        """Complex response of one node voltage or branch current across the sweep."""
+        return self.x[:, self.names.index(name)]
+
+
+    def magnitude_db(self, name) -> np.ndarray:
+        return 20 * np.log10(np.maximum(np.abs(self[name]), np.finfo(float).tiny))
+
+
+    def phase(self, name) -> np.ndarray:
+        """Unwrapped phase in degrees."""
+        return np.degrees(np.unwrap(np.angle(self[name])))
+
+
+    def bode(self, name):
+        """(frequencies, magnitude in dB, phase in degrees) for a Bode plot of one output."""
+        return self.frequencies, self.magnitude_db(name), self.phase(name)
+
+
+    def __repr__(self):
+        return f"ACResult(frequencies={len(self.frequencies)}, unknowns={len(self.names)})"
+
+
+
+class ACAnalysis:
+    """The frequency-independent pieces of a circuit's AC system, assembled once."""
+
+    def __init__(self, circuit):
+
+        self.circuit = circuit
+        n = self.n = circuit.size
+        rows, cols, vals, _ = circuit.triplets()
+
+        if circuit.nonlinear:
+            import newton
+            dc = newton.NewtonSolver(circuit)
+            operating_point = newton.operating_point(circuit, newton=dc)
+            device_rows, device_cols, device_vals = dc.small_signal(operating_point.x)
+            rows, cols, vals = (np.concatenate(pair) for pair in
+                                ((rows, device_rows), (cols, device_cols), (vals, device_vals)))
+
+        self.g = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+        rows, cols, vals = circuit.dynamic_triplets()
+        self.c = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+
+        sources = [element for element in circuit.elements.values() if element.ac is not None]
+        if not sources:
+            raise ValueError("AC analysis needs at least one source with an AC magnitude (e.g. 'V1 in 0 AC 1').")
+        self.b = np.zeros(n, dtype=complex)
+        for source in sources:
+            unit_rows, unit_vals = source.rhs_unit(circuit.node_index)
+            np.add.at(self.b, unit_rows, unit_vals * source.ac)
+
+        self.names = [*circuit.nodes, *(f"I({name})" for name in circuit.branches)]
+
+
+    def solve(self, frequencies) -> np.ndarray:
+        """k x n phasor solutions, one row per frequency."""
+        omega = 2 * np.pi * np.asarray(frequencies, dtype=float)
+        if self.n >= SPARSE_MIN_SIZE:
+            return np.array([SparseLU((self.g + 1j * w * self.c).tocsc()).solve(self.b) for w in omega])
+
+        g, c = self.g.toarray(), self.c.toarray()
+        x = np.empty((len(omega), self.n), dtype=complex)
+        chunk = max(1, min(len(omega), BATCH_BYTES // (16 * self.n * self.n)))
+        stack = np.empty((chunk, self.n, self.n), dtype=complex)  # Reused, so memory is touched once
+        rhs = np.broadcast_to(self.b, (chunk, self.n))
+
+        for start in range(0, len(omega), chunk):
+            w = omega[start:start + chunk, None, None]
+            block = stack[:len(w)]
+            block.real = g                          # Broadcast: every frequency's matrix at once
+            np.multiply(w, c, out=block.imag)
+            x[start:start + len(w)] = solver.solve_batch(block, rhs[:len(w)])
+        return x
+
+
+    def sweep(self, frequencies) -> ACResult:
+        frequencies = np.asarray(frequencies, dtype=float)
+        return ACResult(frequencies, self.solve(frequencies), self.names)
+
+
+
+def sweep(circuit, frequencies) -> ACResult:
+    """AC analysis of a circuit at the given frequencies (Hz)."""
+    return ACAnalysis(circuit).sweep(frequencies)
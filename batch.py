@@ -0,0 +1,251 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from fractions import Fraction
+
+import numpy as np
+
+import exact
+import netlist
+import solver
+from sparse_solver import SPARSE_MIN_SIZE
+from tracelog import TraceLog, TraceLogLevel
+
+
+# Headless batch solver. Streams augmented matrices [A | b] from disk, solves them across a
+# process pool with the same solver the Calculator uses, and writes results as they finish.
+#
+#   python batch.py systems.jsonl more.npy -o results.jsonl --workers 16
+#
+# Input formats (picked by extension):
+#   .jsonl / .ndjson    one system per line, either [[...], ...] or {"id": ..., "matrix": [[...], ...]}
+#   .npy                a k x n x (n+1) stack of systems, or a single n x (n+1) system
+#   .csv                comma-separated rows, systems separated by a blank line
+#   .cir / .net / .sp   a SPICE-like netlist (netlist.py), solved as its linear MNA system; from
+#                       SPARSE_MIN_SIZE unknowns up it stays a sparse (A, b) pair all the way to the LU
+
+
+# CONSTANTS
+DEFAULT_CHUNK_SIZE = 64     # Systems sent to a worker at once
+IN_FLIGHT_PER_WORKER = 2    # Chunks queued per worker, bounds memory for huge inputs
+
+
+
+def read_jsonl(path):
+    with open(path) as f:
+        for index, line in enumerate(f):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, dict):
+                yield record.get("id", f"{path}:{index}"), record["matrix"]
+            else:
+                yield f"{path}:{index}", record
+
+
+def read_npy(path):
+    systems = np.load(path, mmap_mode="r")  # Memory-mapped, so only the current system is read
+    if systems.ndim == 2:
+        yield f"{path}:0", np.array(systems)
+        return
+    for index in range(systems.shape[0]):
+        yield f"{path}:{index}", np.array(systems[index])
+
+
+def parse_cell(text: str, path: str) -> Fraction:
+    """A CSV cell as the Calculator reads a grid cell: integers, decimals or fractions like '1/2'."""
+    try:
+        return Fraction(text)
+    except (ValueError, ZeroDivisionError):
+        raise ValueError(f"{path}: invalid entry '{text}'") from None
+
+
+def read_csv(path):
+    with open(path, newline="") as f:
+        rows = []
+        index = 0
+        for row in csv.reader(f):
+            if not any(cell.strip() for cell in row):
+                if rows:
+                    yield f"{path}:{index}", rows
+                    rows, index = [], index + 1
+                continue
+            rows.append([parse_cell(cell.strip(), path) for cell in row if cell.strip()])
+        if rows:
+            yield f"{path}:{index}", rows
+
+
+def read_netlist(path):
+    circuit = netlist.Circuit.from_file(path)
+    if circuit.nonlinear:
+        raise ValueError(f"{path}: diodes and transistors need Newton iterations, not a single linear solve.")
+    if circuit.size < SPARSE_MIN_SIZE:
+        yield path, circuit.augmented_matrix()
+    else:
+        yield path, circuit.assemble()
+
+
+READERS = {
+    ".jsonl": read_jsonl,
+    ".ndjson": read_jsonl,
+    ".npy": read_npy,
+    ".csv": read_csv,
+    ".cir": read_netlist,
+    ".net": read_netlist,
+    ".sp": read_netlist,
+}
+
+
+def read_systems(paths):
+    """Yield (id, matrix) for every system in every input file, in order."""
+    for path in paths:
+        extension = os.path.splitext(path)[1].lower()
+        if extension not in READERS:
+            raise ValueError(f"Unsupported input format '{extension}' ({path})")
+        yield from READERS[extension](path)
+
+
+def chunked(iterable, size):
+    chunk = []
+    for item in iterable:
+        chunk.append(item)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+
+def solve_chunk(chunk, exact_mode=False, method="direct", iterative_options=None):
+    """Worker entry point: solve a list of (id, matrix). Errors are returned, not raised."""
+    results = []
+    for system_id, matrix in chunk:
+        try:
+            if isinstance(matrix, tuple):
+                a, b = matrix   # Sparse MNA system of a large netlist
+                if exact_mode or method == "refine":    # Both work on dense rows
+                    matrix = np.column_stack([a.toarray(), b])
+            if exact_mode:
+                x = [str(value) for value in exact.bareiss_solve(matrix)]
+            elif isinstance(matrix, tuple):
+                x = solver.solve_system(a, b, method=method, **(iterative_options or {})).tolist()
+            else:
+                x = solver.solve(np.asarray(matrix, dtype=float), method=method, **(iterative_options or {})).tolist()
+            results.append((system_id, x, None))
+        except (ValueError, ZeroDivisionError) as e:
+            results.append((system_id, None, str(e)))
+    return results
+
+
+
+class ResultWriter:
+    """Writes results incrementally as JSON lines or CSV (id, status, x0, x1, ...)."""
+
+    def __init__(self, stream, fmt="jsonl"):
+
+        self.stream = stream
+        self.fmt = fmt
+        self.csv = csv.writer(stream) if fmt == "csv" else None
+
+
+    def write(self, results):
+        for system_id, x, error in results:
+            if self.fmt == "csv":
+                self.csv.writerow([system_id, "error" if error else "ok", *(x if x is not None else [error])])
+            else:
+                record = {"id": system_id, "x": x} if error is None else {"id": system_id, "error": error}
+                self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+
+def run(paths, output, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, fmt="jsonl", exact_mode=False,
+        method="direct", iterative_options=None) -> tuple:
+    """
+    Solve every system in `paths` and write results to the `output` stream in input order.
+    At most workers * IN_FLIGHT_PER_WORKER chunks are pending at a time. Returns (solved, failed).
+    """
+    workers = workers or os.cpu_count() or 1
+    writer = ResultWriter(output, fmt)
+    solved = failed = 0
+
+    def record(results):
+        nonlocal solved, failed
+        writer.write(results)
+        failed += sum(error is not None for _, _, error in results)
+        solved += sum(error is None for _, _, error in results)
+
+    chunks = chunked(read_systems(paths), chunk_size)
+
+    if workers == 1:  # No pool overhead for a single worker
+        for chunk in chunks:
+            record(solve_chunk(chunk, exact_mode, method, iterative_options))
+        return solved, failed
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(solve_chunk, chunk, exact_mode, method, iterative_options))
+            if len(pending) >= workers * IN_FLIGHT_PER_WORKER:
+                record(pending.popleft().result())
+        while pending:
+            record(pending.popleft().result())
+
+    return solved, failed
+
+
+
+def main(argv=None) -> int:
+
+    parser = argparse.ArgumentParser(description="Solve batches of augmented linear systems [A | b] without the GUI.")
+    parser.add_argument("inputs", nargs="+", help="input files (.jsonl, .ndjson, .npy, .csv, or .cir/.net/.sp netlists)")
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (default)")
+    parser.add_argument("-f", "--format", choices=("jsonl", "csv"), default="jsonl", help="output format")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("-c", "--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="systems per task")
+    parser.add_argument("--exact", action="store_true", help="solve exactly with Bareiss elimination")
+    parser.add_argument("-m", "--method", choices=("direct", "cg", "gmres", "refine"), default="direct",
+                        help="solver (default: direct LU; refine: float32 LU with float64 iterative refinement)")
+    parser.add_argument("-p", "--preconditioner", choices=("none", "jacobi", "ilu0", "ic0", "mic0"), default="jacobi",
+                        help="preconditioner for cg/gmres")
+    parser.add_argument("--tol", type=float, default=1e-10, help="relative residual tolerance for cg/gmres/refine")
+    parser.add_argument("--maxiter", type=int, default=None, help="iteration cap for cg/gmres/refine")
+    args = parser.parse_args(argv)
+
+    iterative_options = None
+    if args.method == "refine":
+        iterative_options = {"tol": args.tol, "maxiter": args.maxiter}
+    elif args.method != "direct":
+        iterative_options = {"preconditioner": args.preconditioner, "tol": args.tol, "maxiter": args.maxiter}
+
+    log = TraceLog()
+    output = sys.stdout if args.output == "-" else open(args.output, "w", newline="")
+
+    start = time.perf_counter()
+    try:
+        solved, failed = run(args.inputs, output, args.workers, args.chunk_size, args.format, args.exact,
+                             args.method, iterative_options)
+    except (OSError, ValueError) as e:
+        log(TraceLogLevel.LOG_ERROR, "Batch failed: %s", e)
+        log.flush()
+        return 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    log(TraceLogLevel.LOG_INFO, "Solved %d systems (%d failed) in %.2fs", solved, failed, time.perf_counter() - start)
+    log.flush()
+    return 0 if failed == 0 else 2
+
+
+
+if __name__ == "__main__":
+
+    sys.exit(main())
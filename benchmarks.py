@@ -0,0 +1,303 @@
+import os
+import sys
+import tempfile
+import time
+from fractions import Fraction
+
+import numpy as np
+
+import ac
+import exact
+import iterative
+import leastsquares
+import montecarlo
+import netlist
+import outofcore
+import reduction
+import solver
+import structure
+import symbolic
+from tracelog import TraceLog, TraceLogLevel
+
+
+# Solver benchmarks. Run with: python benchmarks.py [name ...]
+
+
+
+def timed(function, *args, repeat=3):
+    """Best wall-clock time of `repeat` calls, plus the last result."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def ladder_matrix(n: int, seed=0) -> list:
+    """Ill-conditioned exact test system: a resistor ladder with small rational perturbations."""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(n):
+        row = [Fraction(0)] * (n + 1)
+        row[i] = Fraction(2) + Fraction(int(rng.integers(1, 9)), int(rng.integers(10, 99)))
+        if i > 0:
+            row[i - 1] = Fraction(-1)
+        if i < n - 1:
+            row[i + 1] = Fraction(-1)
+        for j in rng.integers(0, n, size=3):
+            row[j] += Fraction(int(rng.integers(-9, 9)), int(rng.integers(11, 97)))
+        row[n] = Fraction(int(rng.integers(-9, 9)), int(rng.integers(1, 7)))
+        rows.append(row)
+    return rows
+
+
+def bench_exact(sizes=(5, 10, 20, 30, 40)):
+    """Bareiss fraction-free elimination against naive Fraction Gaussian elimination."""
+    print(f"{'n':>5} {'naive Fraction (s)':>20} {'Bareiss (s)':>14} {'speedup':>9} {'max digits':>11}")
+    for n in sizes:
+        matrix = ladder_matrix(n)
+        naive_time, naive = timed(exact.fraction_solve, matrix, repeat=1)
+        bareiss_time, bareiss = timed(exact.bareiss_solve, matrix)
+        assert naive == bareiss, "exact solvers disagree"
+        digits = max(len(str(x.denominator)) for x in bareiss)
+        print(f"{n:>5} {naive_time:>20.4f} {bareiss_time:>14.4f} {naive_time / bareiss_time:>8.1f}x {digits:>11}")
+
+
+
+def bench_lu_threads(n=2000, block_sizes=(64, 128, 256), max_threads=None):
+    """
+    Blocked LU scaling from 1 to max_threads threads. Run with the BLAS library limited to one
+    thread (OPENBLAS_NUM_THREADS=1 / MKL_NUM_THREADS=1) to measure the solver's own parallelism.
+    """
+    max_threads = max_threads or os.cpu_count() or 1
+    a = np.random.default_rng(0).standard_normal((n, n))
+    thread_counts = sorted({1, *(2 ** k for k in range(1, max_threads.bit_length())), max_threads})
+
+    print(f"n = {n}")
+    print(f"{'block':>6} {'threads':>8} {'time (s)':>10} {'speedup':>9} {'GFLOP/s':>9}")
+    for block_size in block_sizes:
+        baseline = None
+        for threads in thread_counts:
+            elapsed, _ = timed(solver.lu_factor, a, block_size, solver.PIVOT_EPSILON, None, threads, repeat=1)
+            baseline = baseline or elapsed
+            gflops = (2 / 3) * n ** 3 / elapsed / 1e9
+            print(f"{block_size:>6} {threads:>8} {elapsed:>10.3f} {baseline / elapsed:>8.2f}x {gflops:>9.2f}")
+
+
+
+def power_grid(size: int, pads_every=40, spread=1.0, seed=0):
+    """
+    size x size on-chip power grid as a sparse SPD conductance matrix: lognormal segment
+    conductances (spread is the sigma of their log) and a 100 S supply pad every pads_every nodes.
+    """
+    import scipy.sparse as sp
+
+    rng = np.random.default_rng(seed)
+    index = np.arange(size * size).reshape(size, size)
+    a = np.r_[index[:, :-1].ravel(), index[:-1, :].ravel()]
+    b = np.r_[index[:, 1:].ravel(), index[1:, :].ravel()]
+    g = np.exp(spread * rng.standard_normal(len(a)))
+    mesh = sp.coo_matrix((np.r_[-g, -g], (np.r_[a, b], np.r_[b, a])), shape=(size * size,) * 2).tocsr()
+    pads = np.zeros(size * size)
+    pads[index[::pads_every, ::pads_every].ravel()] = 100.0
+    return (mesh + sp.diags(pads - np.asarray(mesh.sum(axis=1)).ravel())).tocsr()
+
+
+def bench_preconditioners(sizes=(200, 400), kinds=("jacobi", "ic0", "mic0"), tol=1e-8):
+    """CG on power grids by preconditioner: setup time, iterations and total solve time."""
+    print(f"{'unknowns':>9} {'preconditioner':>15} {'setup (s)':>10} {'iterations':>11} {'solve (s)':>10} {'vs jacobi':>10}")
+    for size in sizes:
+        a = power_grid(size)
+        b = np.full(a.shape[0], -1e-3)          # Every node draws 1 mA
+        baseline = None
+        for kind in kinds:
+            setup_time, preconditioner = timed(iterative.make_preconditioner, a, kind, repeat=1)
+            solve_time, result = timed(iterative.cg, a, b, preconditioner, tol, repeat=1)
+            assert result.converged, f"CG with {kind} did not converge"
+            baseline = baseline or solve_time
+            print(f"{a.shape[0]:>9} {kind:>15} {setup_time:>10.3f} {result.iterations:>11} {solve_time:>10.3f} "
+                  f"{baseline / solve_time:>9.1f}x")
+
+
+
+def structured_matrix(kind: str, n: int, seed=0) -> np.ndarray:
+    """Diagonally dominant test matrices with the structure each fast path targets."""
+    rng = np.random.default_rng(seed)
+    if kind == "spd":
+        m = rng.standard_normal((n, n))
+        return m @ m.T + n * np.eye(n)
+    bandwidth = 1 if kind == "tridiagonal" else 8
+    a = np.zeros((n, n))
+    for offset in range(-bandwidth, bandwidth + 1):
+        a += np.diag(rng.standard_normal(n - abs(offset)), offset)
+    return a + np.diag(np.abs(a).sum(axis=1))
+
+
+def bench_structure(sizes=(500, 1000, 2000)):
+    """Structure-detected fast paths against the general blocked LU, including the detection cost."""
+    print(f"{'kind':>12} {'n':>6} {'general LU (s)':>15} {'fast path (s)':>14} {'method':>18} {'speedup':>9}")
+    for kind in ("tridiagonal", "banded", "spd"):
+        for n in sizes:
+            a = structured_matrix(kind, n)
+            b = np.ones(n)
+            general_time, x = timed(lambda: solver.LUFactorization(a).solve(b), repeat=1)
+            fast_time, factors = timed(structure.factorize, a)
+            fast_time += timed(factors.solve, b)[0]
+            assert np.allclose(factors.solve(b), x), "fast path disagrees with LU"
+            print(f"{kind:>12} {n:>6} {general_time:>15.4f} {fast_time:>14.4f} {structure.describe(factors):>18} "
+                  f"{general_time / fast_time:>8.1f}x")
+
+
+
+def rc_ladder(sections: int) -> "netlist.Circuit":
+    """RC low-pass ladder driven by a 1 V AC source."""
+    lines = ["V1 n0 0 AC 1"]
+    for k in range(sections):
+        lines += [f"R{k} n{k} n{k + 1} 100", f"C{k} n{k + 1} 0 10n"]
+    return netlist.Circuit.from_netlist("\n".join(lines))
+
+
+def bench_ac(sections=(10, 30, 60, 120), points_per_decade=(50, 125)):
+    """Batched AC sweeps from 1 Hz to 100 MHz against a loop of per-frequency LU solves."""
+    print(f"{'unknowns':>9} {'freqs':>6} {'batched (s)':>12} {'loop (s)':>9} {'speedup':>9}")
+    for count in sections:
+        analysis = ac.ACAnalysis(rc_ladder(count))
+        g, c = analysis.g.toarray(), analysis.c.toarray()
+        for density in points_per_decade:
+            frequencies = ac.decade_frequencies(1, 1e8, density)
+            batched_time, x = timed(analysis.solve, frequencies, repeat=1)
+            loop = lambda: [solver.LUFactorization(g + 2j * np.pi * f * c).solve(analysis.b) for f in frequencies]
+            loop_time, _ = timed(loop, repeat=1)
+            print(f"{analysis.n:>9} {len(frequencies):>6} {batched_time:>12.4f} {loop_time:>9.3f} {loop_time / batched_time:>8.1f}x")
+
+
+
+def bench_montecarlo(sections=(10, 150), samples=4000, max_workers=None):
+    """Monte Carlo throughput of an RC ladder with 5% resistors, by number of worker processes."""
+    max_workers = max_workers or os.cpu_count() or 1
+    print(f"{'unknowns':>9} {'workers':>8} {'time (s)':>9} {'samples/s':>10}")
+    for count in sections:
+        circuit = rc_ladder(count)
+        tolerances = {f"R{k}": 0.05 for k in range(count)}
+        workers = 1
+        while workers <= max_workers:
+            run = lambda: montecarlo.monte_carlo(circuit, tolerances, samples, [f"n{count}"], workers=workers)
+            elapsed, _ = timed(run, repeat=1)
+            print(f"{circuit.size:>9} {workers:>8} {elapsed:>9.3f} {samples / elapsed:>10.0f}")
+            workers *= 2
+
+
+
+def resistor_mesh(size: int, chain: int, seed=0) -> "netlist.Circuit":
+    """size x size grid whose every edge is a chain of `chain` random resistors, driven at one corner."""
+    rng = np.random.default_rng(seed)
+    lines = ["V1 g0_0 0 1", f"Rload g{size - 1}_{size - 1} 0 50"]
+    edges = [((i, j), (i, j + 1)) for i in range(size) for j in range(size - 1)]
+    edges += [((i, j), (i + 1, j)) for i in range(size - 1) for j in range(size)]
+    for k, ((i, j), (p, q)) in enumerate(edges):
+        nodes = [f"g{i}_{j}", *(f"c{k}_{s}" for s in range(chain - 1)), f"g{p}_{q}"]
+        lines += [f"R{k}_{s} {a} {b} {rng.uniform(1, 100):.4f}" for s, (a, b) in enumerate(zip(nodes, nodes[1:]))]
+    return netlist.Circuit.from_netlist("\n".join(lines))
+
+
+def bench_reduction(sizes=(10, 20, 30), chain=8):
+    """Series/parallel, Y-delta and Kron reduction of resistor meshes: reduce time and solve time before/after."""
+    print(f"{'unknowns':>9} {'reduced':>8} {'reduce (s)':>11} {'full solve (s)':>15} {'reduced solve (s)':>18}")
+    for size in sizes:
+        circuit = resistor_mesh(size, chain)
+        full_time, _ = timed(circuit.solve)
+        reduce_time, reduced = timed(reduction.reduce, circuit)
+        solve_time, _ = timed(reduced.solve)
+        print(f"{circuit.size:>9} {reduced.circuit.size:>8} {reduce_time:>11.3f} {full_time:>15.3f} {solve_time:>18.3f}")
+
+
+
+def bench_symbolic(sections=(3, 10, 30), combinations=10 ** 6, solves=200):
+    """Symbolic solve + lambdify of a resistor ladder, then a parameter sweep against repeated numeric solves."""
+    print(f"{'unknowns':>9} {'symbols':>8} {'solve (s)':>10} {'compile (s)':>12} "
+          f"{'sweep (s)':>10} {'numeric est. (s)':>17}")
+    rng = np.random.default_rng(0)
+    for count in sections:
+        lines = ["V1 n0 0 1"]
+        for k in range(count):
+            lines += [f"R{k} n{k} n{k + 1} 100", f"RG{k} n{k + 1} 0 1k"]
+        circuit = netlist.Circuit.from_netlist("\n".join(lines))
+        output, names = f"n{count}", ["V1", "R0", f"RG{count - 1}"]
+
+        solve_time, solution = timed(symbolic.symbolic_solve, circuit, names, repeat=1)
+        compile_time, _ = timed(solution.compile, [output], repeat=1)
+        values = {"V1": rng.uniform(0.9, 1.1, combinations), "R0": rng.uniform(90, 110, combinations),
+                  f"RG{count - 1}": rng.uniform(900, 1100, combinations)}
+        sweep_time, _ = timed(lambda: solution.evaluate(values, [output]), repeat=1)
+
+        def numeric():
+            for k in range(solves):
+                for name in names:
+                    circuit.set_value(name, values[name][k])
+                circuit.solve()
+        numeric_time, _ = timed(numeric, repeat=1)
+        print(f"{circuit.size:>9} {len(solution.symbols):>8} {solve_time:>10.3f} {compile_time:>12.3f} "
+              f"{sweep_time:>10.3f} {numeric_time * combinations / solves:>17.0f}")
+
+
+
+def bench_least_squares(shapes=((1_000_000, 10), (4_000_000, 10), (200_000, 100), (2000, 500))):
+    """Blocked pivoted QR least squares against NumPy's SVD-based lstsq, on noisy tall-skinny fits."""
+    print(f"{'rows':>9} {'columns':>8} {'QR (s)':>8} {'numpy (s)':>10} {'residual diff':>14}")
+    rng = np.random.default_rng(0)
+    for rows, columns in shapes:
+        a = rng.standard_normal((rows, columns))
+        b = a @ rng.standard_normal(columns) + 0.01 * rng.standard_normal(rows)
+        qr_time, result = timed(leastsquares.lstsq, a, b, repeat=1)
+        numpy_time, (x, _, _, _) = timed(np.linalg.lstsq, a, b, None, repeat=1)
+        difference = abs(result.residual - np.linalg.norm(a @ x - b))
+        print(f"{rows:>9} {columns:>8} {qr_time:>8.3f} {numpy_time:>10.3f} {difference:>14.2e}")
+
+
+
+def bench_out_of_core(sizes=(2000, 4000, 6000), memory=32 << 20):
+    """Out-of-core LU on a memory-mapped file with a small memory budget, against the in-memory blocked LU."""
+    print(f"{'n':>6} {'file (MB)':>10} {'budget (MB)':>12} {'in-memory (s)':>14} {'out-of-core (s)':>16} {'same pivots':>12}")
+    rng = np.random.default_rng(0)
+    TraceLog().set_level(TraceLogLevel.LOG_WARNING)   # Keep the progress lines out of the table
+    with tempfile.TemporaryDirectory() as directory:
+        for n in sizes:
+            a = rng.standard_normal((n, n))
+            b = rng.standard_normal(n)
+            memory_time, (lu, piv) = timed(solver.lu_factor, a, repeat=1)
+
+            path = os.path.join(directory, f"matrix{n}.dat")
+            matrix = outofcore.create(path, n)
+            matrix[:] = a
+            matrix.flush()
+            del matrix
+            disk_time, factors = timed(lambda: outofcore.OutOfCoreLU(outofcore.open_matrix(path, n), memory=memory), repeat=1)
+            x = factors.solve(b)
+            assert np.allclose(x, solver.lu_solve(lu, piv, b))
+            print(f"{n:>6} {a.nbytes / 2 ** 20:>10.0f} {memory / 2 ** 20:>12.0f} {memory_time:>14.3f} "
+                  f"{disk_time:>16.3f} {str(np.array_equal(piv, factors.piv)):>12}")
+            del factors
+
+
+
+BENCHMARKS = {
+    "exact": bench_exact,
+    "lu-threads": bench_lu_threads,
+    "preconditioners": bench_preconditioners,
+    "structure": bench_structure,
+    "ac": bench_ac,
+    "montecarlo": bench_montecarlo,
+    "reduction": bench_reduction,
+    "symbolic": bench_symbolic,
+    "least-squares": bench_least_squares,
+    "out-of-core": bench_out_of_core,
+}
+
+
+if __name__ == "__main__":
+
+    for name in sys.argv[1:] or BENCHMARKS:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
@@ -0,0 +1,218 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.sparse.csgraph import connected_components, maximum_bipartite_matching
+
+import solver
+from sparse_solver import SPARSE_MIN_SIZE, to_csr
+
+
+# Graph preprocessing for reducible systems.
+#
+# A maximum matching of rows to columns (the coarse Dulmage-Mendelsohn step) puts a non-zero on
+# every diagonal entry, or proves the matrix structurally singular. The strongly connected
+# components of the matched matrix are then the diagonal blocks of its block triangular form
+# (BTF). Independent subcircuits show up as separate weakly connected components.
+#
+# Only the diagonal blocks are factored, all at once. Solving goes level by level through the
+# block dependency graph, and blocks on the same level (always including every independent
+# subcircuit) are solved concurrently.
+
+
+# CONSTANTS
+PARALLEL_BLOCK_SIZE = 64        # Smaller blocks are solved inline, a thread costs more than they do
+
+
+
+class StructurallySingularError(solver.SingularMatrixError):
+    """Raised when no assignment of unknowns to equations exists, whatever the values are."""
+
+
+
+class BlockDecomposition:
+    """
+    Row and column orders that put A in block triangular form, plus the block dependency levels.
+
+    Block k covers rows row_order[starts[k]:starts[k + 1]] and the unknowns col_order at the
+    same positions. Column indices are original unknown indices, so solutions never need
+    un-permuting.
+    """
+
+    def __init__(self, a):
+
+        a = to_csr(a)
+        a.eliminate_zeros()
+        n = a.shape[0]
+        if a.shape[1] != n:
+            raise ValueError("Block decomposition needs a square matrix.")
+        self.n = n
+
+        match = maximum_bipartite_matching(a, perm_type="column")   # Column matched to each row
+        unmatched = int(np.count_nonzero(match < 0))
+        self.structural_rank = n - unmatched
+        if unmatched:
+            raise StructurallySingularError(
+                f"Matrix is structurally singular: {unmatched} equation(s) cannot be matched to an unknown.")
+
+        # On the matched matrix B = A[:, match] rows and columns are the same unknowns, so it is a graph:
+        # its weak components are independent subcircuits, its strong components the BTF diagonal blocks
+        matched = a[:, match]
+        self.components = connected_components(matched, directed=True, connection="weak")[0]
+        count, labels = connected_components(matched, directed=True, connection="strong")
+
+        # Block k uses block j when an equation of k contains an unknown of j
+        coo = matched.tocoo()
+        users, used = labels[coo.row], labels[coo.col]
+        external = users != used
+        edges = np.unique(np.column_stack([users[external], used[external]]), axis=0)
+        self.levels = self._levels(count, edges)
+
+        # Blocks sorted by level, rows grouped by block
+        block_order = np.argsort(self.levels, kind="stable")
+        rank = np.empty(count, dtype=np.int64)
+        rank[block_order] = np.arange(count)
+        self.levels = self.levels[block_order]
+
+        self.row_order = np.argsort(rank[labels], kind="stable")
+        self.col_order = match[self.row_order]
+        sizes = np.bincount(rank[labels], minlength=count)
+        self.starts = np.concatenate([[0], np.cumsum(sizes)])
+
+
+    @staticmethod
+    def _levels(count, edges) -> np.ndarray:
+        """Longest dependency chain below each block (Kahn's algorithm on the condensation DAG)."""
+        waiting = np.bincount(edges[:, 0], minlength=count) if len(edges) else np.zeros(count, dtype=np.int64)
+        users = [[] for _ in range(count)]
+        for user, dependency in edges:
+            users[dependency].append(user)
+
+        levels = np.zeros(count, dtype=np.int64)
+        ready = list(np.flatnonzero(waiting == 0))
+        while ready:
+            block = ready.pop()
+            for user in users[block]:
+                levels[user] = max(levels[user], levels[block] + 1)
+                waiting[user] -= 1
+                if waiting[user] == 0:
+                    ready.append(user)
+        return levels
+
+
+    @property
+    def block_count(self) -> int:
+        return len(self.starts) - 1
+
+
+    def block(self, k):
+        """(rows, unknowns) of block k."""
+        return self.row_order[self.starts[k]:self.starts[k + 1]], self.col_order[self.starts[k]:self.starts[k + 1]]
+
+
+    def by_level(self):
+        """Lists of block indices that can be solved together, in dependency order."""
+        boundaries = np.flatnonzero(np.diff(self.levels)) + 1
+        return [list(group) for group in np.split(np.arange(self.block_count), boundaries)]
+
+
+    def summary(self) -> str:
+        largest = int(np.diff(self.starts).max(initial=0))
+        return (f"{self.components} independent subcircuit(s), {self.block_count} block(s) in "
+                f"{len(self.by_level())} level(s), largest block {largest}")
+
+
+
+def decompose(a) -> BlockDecomposition:
+    return BlockDecomposition(a)
+
+
+
+class BlockTriangularFactorization:
+    """
+    Factorization of a reducible matrix through its BTF: only the diagonal blocks are factored
+    (concurrently), the off-diagonal blocks are applied as sparse products during the solve.
+    Same solve()/solve_transpose() interface as the other factorizations.
+    """
+
+    method = "block triangular decomposition"
+
+    def __init__(self, a, decomposition=None, workers=None):
+
+        self.a = to_csr(a)
+        self.shape = self.a.shape
+        self.decomposition = decomposition or BlockDecomposition(self.a)
+        self.workers = workers or os.cpu_count() or 1
+        self._transposed = None     # Columns of A per block, built on the first solve_transpose
+
+        self._blocks = [self.decomposition.block(k) for k in range(self.decomposition.block_count)]
+        self._equations = [self.a[rows] for rows, _ in self._blocks]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            self.factors = list(pool.map(self._factor_block, (equations[:, cols] for equations, (_, cols)
+                                                              in zip(self._equations, self._blocks))))
+
+
+    @staticmethod
+    def _factor_block(block):
+        if block.shape[0] == 1:
+            value = block[0, 0]
+            if value == 0:
+                raise solver.SingularMatrixError("Matrix is singular and cannot be solved.")
+            return value
+        return solver.factorize(block if block.shape[0] >= SPARSE_MIN_SIZE else block.toarray())
+
+
+    @staticmethod
+    def _solve_block(factors, rhs, transpose=False):
+        if not hasattr(factors, "solve"):   # 1 x 1 block
+            return rhs / factors
+        return factors.solve_transpose(rhs) if transpose else factors.solve(rhs)
+
+
+    def _run(self, b, transpose):
+        b = np.asarray(b, dtype=float)
+        x = np.zeros_like(b)
+        levels = self.decomposition.by_level()
+        couplings = self._transpose() if transpose else self._equations
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for level in (reversed(levels) if transpose else levels):
+                jobs = []
+                for k in level:
+                    rows, cols = self._blocks[k]
+                    equations, unknowns = (cols, rows) if transpose else (rows, cols)
+                    rhs = b[equations] - couplings[k] @ x  # Unknowns of unsolved blocks are still zero
+                    if len(rows) >= PARALLEL_BLOCK_SIZE and len(level) > 1:
+                        jobs.append((unknowns, pool.submit(self._solve_block, self.factors[k], rhs, transpose)))
+                    else:
+                        x[unknowns] = self._solve_block(self.factors[k], rhs, transpose)
+                for unknowns, job in jobs:
+                    x[unknowns] = job.result()
+        return x
+
+
+    def _transpose(self):
+        if self._transposed is None:
+            transposed = self.a.T.tocsr()
+            self._transposed = [transposed[cols] for _, cols in self._blocks]
+        return self._transposed
+
+
+    def solve(self, b) -> np.ndarray:
+        """Solve A x = b. x comes back in the original unknown order."""
+        return self._run(b, transpose=False)
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        """Solve A^T x = b, visiting the blocks in reverse."""
+        return self._run(b, transpose=True)
+
+
+
+def solve(a, b, workers=None) -> np.ndarray:
+    """Solve A x = b, splitting it into independent and triangular blocks when it is reducible."""
+    decomposition = BlockDecomposition(a)
+    if decomposition.block_count == 1:
+        return solver.solve_system(a, b)
+    return BlockTriangularFactorization(a, decomposition, workers).solve(b)
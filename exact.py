@@ -0,0 +1,109 @@
+from fractions import Fraction
+from math import lcm
+
+from solver import SingularMatrixError
+
+
+# Exact rational solving. Entries stay Fractions (or ints) the whole way through,
+# so answers like x = 1/3 come out as 1/3 instead of 0.333...
+
+
+
+def to_fraction(value) -> Fraction:
+    """Convert an int, float, Fraction or string such as '3/4' to a Fraction."""
+    if isinstance(value, Fraction):
+        return value
+    return Fraction(value)
+
+
+def integer_rows(matrix) -> list:
+    """
+    Scale every row by the lcm of its denominators so all entries become integers.
+    Row scaling does not change the solution of the system.
+    """
+    rows = []
+    for row in matrix:
+        row = [to_fraction(x) for x in row]
+        scale = lcm(*(x.denominator for x in row))
+        rows.append([x.numerator * (scale // x.denominator) for x in row])
+    return rows
+
+
+def bareiss_elimination(rows: list) -> list:
+    """
+    Fraction-free Bareiss elimination of an integer augmented matrix, in place.
+
+    Every division is exact, and each entry after step k is a k x k minor of the input,
+    so entry sizes grow linearly with n instead of exponentially. Returns the upper
+    triangular integer matrix; its last pivot is +/- the determinant of the coefficient block.
+    """
+    n = len(rows)
+    if n == 0 or any(len(row) != n + 1 for row in rows):
+        raise ValueError("Matrix dimensions do not match for an augmented system.")
+
+    previous = 1
+    for k in range(n):
+        if rows[k][k] == 0:
+            for p in range(k + 1, n):
+                if rows[p][k] != 0:
+                    rows[k], rows[p] = rows[p], rows[k]
+                    break
+            else:
+                raise SingularMatrixError("Matrix is singular and cannot be solved.")
+
+        pivot_row = rows[k]
+        pivot = pivot_row[k]
+        for i in range(k + 1, n):
+            row = rows[i]
+            factor = row[k]
+            rows[i] = row[:k] + [0] + [(row[j] * pivot - factor * pivot_row[j]) // previous for j in range(k + 1, n + 1)]
+        previous = pivot
+
+    return rows
+
+
+def bareiss_solve(matrix) -> list:
+    """Solve an augmented system exactly. Returns the solution as a list of Fractions."""
+    rows = bareiss_elimination(integer_rows(matrix))
+    n = len(rows)
+    det = rows[n - 1][n - 1]
+
+    # By Cramer's rule x[i] * det is an integer, so back substitution stays fraction-free too
+    numerators = [0] * n
+    for i in range(n - 1, -1, -1):
+        total = rows[i][n] * det - sum(rows[i][j] * numerators[j] for j in range(i + 1, n))
+        numerators[i] = total // rows[i][i]
+
+    return [Fraction(num, det) for num in numerators]
+
+
+def fraction_solve(matrix) -> list:
+    """
+    Plain Gaussian elimination on Fractions, the way the float path works but exact.
+    Kept as the baseline for benchmarks.bench_exact; prefer bareiss_solve.
+    """
+    rows = [[to_fraction(x) for x in row] for row in matrix]
+    n = len(rows)
+    if n == 0 or any(len(row) != n + 1 for row in rows):
+        raise ValueError("Matrix dimensions do not match for an augmented system.")
+
+    for i in range(n):
+        if rows[i][i] == 0:
+            for k in range(i + 1, n):
+                if rows[k][i] != 0:
+                    rows[i], rows[k] = rows[k], rows[i]
+                    break
+            else:
+                raise SingularMatrixError("Matrix is singular and cannot be solved.")
+
+        pivot = rows[i][i]
+        rows[i] = rows[i][:i] + [x / pivot for x in rows[i][i:]]
+        for k in range(i + 1, n):
+            factor = rows[k][i]
+            rows[k] = rows[k][:i] + [rows[k][j] - factor * rows[i][j] for j in range(i, n + 1)]
+
+    solution = [Fraction(0)] * n
+    for i in range(n - 1, -1, -1):
+        solution[i] = rows[i][n] - sum(rows[i][j] * solution[j] for j in range(i + 1, n))
+
+    return solution
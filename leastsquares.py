@@ -0,0 +1,220 @@
+import numpy as np
+
+import solver
+
+
+# Least-squares solving of rectangular systems [A | b] (m equations, n unknowns) with Householder QR.
+#
+# The factorization is blocked: each panel of columns is reduced with Householder reflectors, and
+# the rest of the matrix is only touched once per panel, with one matrix product against the
+# panel's reflectors (Y) and the matching block F = A^T Y T. Column pivoting picks the remaining
+# column of largest norm at every step; the column norms are downdated as rows are finished and
+# recomputed when cancellation makes the downdate unreliable. The diagonal of R then falls off
+# with the numerical rank, which is counted against a relative tolerance.
+#
+# b is carried along as an extra column that is never pivoted, so it comes out as Q^T b and Q is
+# never formed. Tall-skinny systems are streamed a cache-sized block of rows at a time: each block
+# is stacked under the R of the rows before it and factored without pivoting, which keeps the
+# working set at about ROW_BLOCK_ENTRIES values whatever m is (an np.memmap works too). Pivoting
+# then runs on the final (n+1) x (n+1) triangle, which has the same R as A up to the orthogonal factor.
+
+
+# CONSTANTS
+QR_BLOCK_SIZE = 32              # Panel width of the blocked QR
+ROW_BLOCK_ENTRIES = 1 << 17     # Size of a block of rows streamed through the QR (rows x (n+1))
+NORM_RECOMPUTE = np.sqrt(np.finfo(float).eps)   # Downdated norms below this fraction are recomputed
+
+
+
+class LeastSquaresResult:
+    """Solution of min ||A x - b|| with the residual norm and the numerical rank of A."""
+
+    def __init__(self, x, residual: float, rank: int, shape: tuple, diagonal):
+
+        self.x = x
+        self.residual = residual    # ||A x - b||
+        self.rank = rank
+        self.shape = shape          # (equations, unknowns)
+        self.diagonal = diagonal    # |R[k][k]| in pivot order, non-increasing
+
+
+    @property
+    def rank_deficient(self) -> bool:
+        return self.rank < self.shape[1]
+
+
+    @property
+    def condition(self) -> float:
+        """|R[0][0]| / |R[r-1][r-1]|, a cheap estimate of the condition number of the kept columns."""
+        if self.rank == 0:
+            return float("inf")
+        return float(self.diagonal[0] / self.diagonal[self.rank - 1])
+
+
+    def summary(self) -> str:
+        rows, columns = self.shape
+        kind = "over-determined" if rows > columns else "under-determined" if rows < columns else "square"
+        text = f"{rows} x {columns} {kind} system, rank {self.rank}, residual norm {self.residual:.6g}"
+        if self.rank_deficient:
+            text += f" ({columns - self.rank} unknown(s) set to 0 for the dependent columns)"
+        return text
+
+
+    def __repr__(self):
+        return f"LeastSquaresResult(shape={self.shape}, rank={self.rank}, residual={self.residual:.3g})"
+
+
+
+def _reflector(column):
+    """Householder vector v (v[0] = 1), tau and beta with (I - tau v v^T) column = beta e_0."""
+    alpha = column[0]
+    tail = np.linalg.norm(column[1:])
+    if tail == 0.0:
+        return np.zeros(len(column) - 1), 0.0, alpha
+    beta = -np.copysign(np.hypot(alpha, tail), alpha)
+    return column[1:] / (alpha - beta), (beta - alpha) / beta, beta
+
+
+def householder_qr(a, pivot_columns=0, block_size=QR_BLOCK_SIZE):
+    """
+    Blocked Householder QR of a (m x c) in place: R ends up on and above the diagonal, the
+    reflectors below it. Column pivoting runs over the first `pivot_columns` columns only (0 for
+    none); the others stay where they are and are just transformed (so a column b becomes Q^T b).
+    Returns (tau, perm) with a[:, perm] = Q R for the original a.
+    """
+    m, c = a.shape
+    steps = min(m, c)
+    tau = np.zeros(steps)
+    perm = np.arange(c)
+    block_size = max(1, int(block_size))
+
+    norms = np.linalg.norm(a[:, :pivot_columns], axis=0)
+    exact_norms = norms.copy()     # Last norms computed in full, the reference for the downdates
+
+    k0 = 0
+    while k0 < steps:
+        nb = min(block_size, steps - k0)
+        y = np.zeros((m - k0, nb))                  # Panel reflectors, rows k0:m
+        f = np.zeros((c - k0, nb))                  # F = A^T Y T for the columns k0:c
+        recompute = False
+
+        j = 0
+        while j < nb:
+            k = k0 + j
+            if k < pivot_columns:
+                p = k + int(np.argmax(norms[k:]))
+                if p != k:
+                    a[:, [k, p]] = a[:, [p, k]]
+                    f[[j, p - k0]] = f[[p - k0, j]]
+                    perm[[k, p]] = perm[[p, k]]
+                    norms[[k, p]] = norms[[p, k]]
+                    exact_norms[[k, p]] = exact_norms[[p, k]]
+
+            # Bring column k up to date with the reflectors of this panel, then reduce it
+            a[k:, k] -= y[j:, :j] @ f[j, :j]
+            v, tau[k], a[k, k] = _reflector(a[k:, k])
+            a[k + 1:, k] = v
+            y[j, j] = 1.0
+            y[j + 1:, j] = v
+
+            # F[:, j] = tau (A^T v - F Y^T v), restricted to the columns after k
+            f[j + 1:, j] = tau[k] * (a[k:, k + 1:].T @ y[j:, j])
+            f[:, j] -= f[:, :j] @ (tau[k] * (y[j:, :j].T @ y[j:, j]))
+
+            # Row k of R is final now; the rows below wait for the block update
+            a[k, k + 1:] -= y[j, :j + 1] @ f[j + 1:, :j + 1].T
+            j += 1
+
+            if k + 1 < pivot_columns:
+                rest = slice(k + 1, pivot_columns)
+                active = norms[rest] > 0
+                ratio = np.zeros_like(norms[rest])
+                ratio[active] = np.abs(a[k, rest][active]) / norms[rest][active]
+                shrink = np.maximum(0.0, 1.0 - ratio ** 2)
+                lost = np.zeros_like(shrink)
+                lost[active] = shrink[active] * (norms[rest][active] / exact_norms[rest][active]) ** 2
+                stale = active & (lost <= NORM_RECOMPUTE)
+                norms[rest] *= np.sqrt(shrink)
+                if stale.any():
+                    norms[rest][stale] = -1.0                   # Flag for an exact recompute below
+                    recompute = True
+                    break                                       # Needs the trailing rows up to date
+
+        # Block update of the rows below the panel, then the flagged norms from scratch
+        k1 = k0 + j
+        if k1 < c and k1 < m:
+            a[k1:, k1:] -= y[j:, :j] @ f[j:, :j].T
+        if recompute:
+            flagged = k1 + np.flatnonzero(norms[k1:pivot_columns] < 0)
+            norms[flagged] = exact_norms[flagged] = np.linalg.norm(a[k1:, flagged], axis=0)
+        k0 = k1
+
+    return tau, perm
+
+
+def _stream_triangle(a, b, row_block, block_size):
+    """R of [A | b] (at most (n+1) x (n+1)), factoring row_block rows at a time under the R so far."""
+    m, n = a.shape
+    triangle = np.zeros((0, n + 1))
+    for start in range(0, m, row_block):
+        stop = min(start + row_block, m)
+        stacked = np.empty((len(triangle) + stop - start, n + 1))
+        stacked[:len(triangle)] = triangle
+        stacked[len(triangle):, :n] = a[start:stop]
+        stacked[len(triangle):, n] = b[start:stop]
+        householder_qr(stacked, block_size=block_size)
+        triangle = np.triu(stacked[:n + 1])
+    return triangle
+
+
+def lstsq(a, b, rcond=None, row_block=None, block_size=QR_BLOCK_SIZE) -> LeastSquaresResult:
+    """
+    Least-squares solution of A x = b for any m x n A, with column-pivoted Householder QR.
+    Columns whose R diagonal falls below rcond * |R[0][0]| (default max(m, n) * machine epsilon)
+    count as dependent: rank < n, and their unknowns are set to 0 (the basic solution). Systems
+    with more than row_block rows (default: about ROW_BLOCK_ENTRIES values' worth) are streamed,
+    so a and b may be memory-mapped.
+    """
+    if not isinstance(a, np.ndarray):
+        a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    if np.iscomplexobj(a) or np.iscomplexobj(b):
+        raise ValueError("Least squares is real-only.")
+    if a.ndim != 2 or a.shape[0] == 0 or a.shape[1] == 0 or b.shape != (a.shape[0],):
+        raise ValueError("Least squares needs an m x n matrix and m right-hand side values.")
+
+    m, n = a.shape
+    if rcond is None:
+        rcond = max(m, n) * np.finfo(float).eps
+    if row_block is None:
+        row_block = max(ROW_BLOCK_ENTRIES // (n + 1), 8 * (n + 1))
+
+    if m > row_block:
+        work = _stream_triangle(a, b, row_block, block_size)
+    else:
+        work = np.empty((m, n + 1))
+        work[:, :n] = a
+        work[:, n] = b
+
+    # Pivoted pass, with b as the last, never pivoted, column: it comes out as Q^T b
+    _, perm = householder_qr(work, pivot_columns=n, block_size=block_size)
+    steps = min(len(work), n)
+    diagonal = np.abs(np.diag(work[:steps, :steps]))
+    small = diagonal <= rcond * diagonal[0] if steps else np.ones(0, dtype=bool)
+    rank = int(np.argmax(small)) if small.any() else steps
+
+    qtb = work[:min(len(work), n + 1), n]        # Q^T b; below the diagonal are reflectors
+    x = np.zeros(n)
+    x[perm[:rank]] = solver.backward_substitution(work[:rank, :rank], qtb[:rank])
+    return LeastSquaresResult(x, float(np.linalg.norm(qtb[rank:])), rank, (m, n), diagonal)
+
+
+def solve(matrix, rcond=None) -> LeastSquaresResult:
+    """Least-squares solve of an augmented m x (n+1) system [A | b]."""
+    augmented = np.array(matrix)
+    if np.iscomplexobj(augmented):
+        raise ValueError("Least squares is real-only.")
+    augmented = augmented.astype(float)   # Fractions from exact mode included
+    if augmented.ndim != 2 or augmented.shape[0] == 0 or augmented.shape[1] < 2:
+        raise ValueError("Matrix dimensions do not match for an augmented system.")
+    return lstsq(augmented[:, :-1], augmented[:, -1], rcond=rcond)
@@ -0,0 +1,120 @@
+import numpy as np
+
+import solver
+
+
+# Incremental re-solves after small coefficient edits.
+#
+# If A = A0 + D E^T, where E picks the k edited columns and D holds their changes, Woodbury gives
+#   A^-1 b = y - Z (I + E^T Z)^-1 E^T y,   y = A0^-1 b,   Z = A0^-1 D
+# so with A0's LU kept around, a re-solve costs k + 1 triangular solve pairs (O(k n^2)) instead of O(n^3).
+
+
+# CONSTANTS
+DEFAULT_MAX_RANK = 16           # More edited columns than this and we refactor
+CONDITION_LIMIT = 1e10          # Capacitance matrix conditioning considered unsafe
+RESIDUAL_LIMIT = 1e-9           # Relative residual above which the update is rejected
+
+
+
+class IncrementalSolver:
+    """
+    Keeps the LU of a base matrix A0 and solves nearby matrices with Sherman-Morrison-Woodbury.
+
+    Falls back to a fresh factorization (which becomes the new base) when too many columns
+    changed, when the capacitance matrix is ill-conditioned, or when the updated solution
+    fails a residual check.
+    """
+
+    def __init__(self, max_rank=DEFAULT_MAX_RANK, condition_limit=CONDITION_LIMIT, residual_limit=RESIDUAL_LIMIT):
+
+        self.max_rank = max_rank
+        self.condition_limit = condition_limit
+        self.residual_limit = residual_limit
+
+        self.base = None            # A0
+        self.factorization = None   # LU of A0
+        self._columns = {}          # column -> (change D[:, column], Z[:, column]) already solved for
+
+        self.updates = 0
+        self.refactorizations = 0
+        self.last_method = None     # "update" or "factor"
+        self.last_rank = 0
+
+
+    def rebase(self, a, factorization=None):
+        """Make `a` the new base matrix, reusing its factorization if the caller already has one."""
+        base = np.array(a, dtype=float)
+        self.factorization = factorization or solver.LUFactorization(base)  # May raise; keep the old base then
+        self.base = base
+        self._columns = {}
+
+
+    def changed_columns(self, a) -> np.ndarray:
+        """Indices of the columns of `a` that differ from the base matrix."""
+        return np.flatnonzero((np.asarray(a) != self.base).any(axis=0))
+
+
+    def is_small_edit(self, a) -> bool:
+        """True if `a` differs from the base in at least one and at most max_rank columns."""
+        a = np.asarray(a)
+        if self.base is None or a.shape != self.base.shape:
+            return False
+        return 0 < len(self.changed_columns(a)) <= self.max_rank
+
+
+    def solve(self, a, b) -> np.ndarray:
+        """Solve A x = b, by a low-rank update of the base factorization when that is safe."""
+        a = np.asarray(a, dtype=float)
+        b = np.asarray(b, dtype=float)
+
+        if self.base is not None and a.shape == self.base.shape:
+            columns = self.changed_columns(a)
+            if len(columns) <= self.max_rank:
+                x = self._woodbury(a, b, columns)
+                if x is not None:
+                    self.updates += 1
+                    self.last_method, self.last_rank = "update", len(columns)
+                    return x
+
+        self.rebase(a)
+        self.refactorizations += 1
+        self.last_method, self.last_rank = "factor", 0
+        return self.factorization.solve(b)
+
+
+    def _woodbury(self, a, b, columns):
+        """Updated solution, or None if the update is numerically unsafe."""
+        y = self.factorization.solve(b)
+        if len(columns) == 0:
+            return y
+
+        changes = a[:, columns] - self.base[:, columns]
+        z = self._solved_columns(columns, changes)
+
+        # Measured against the identity, so a near-singular updated matrix is caught even for k = 1
+        capacitance = np.eye(len(columns)) + z[columns, :]
+        singular_values = np.linalg.svd(capacitance, compute_uv=False)
+        if singular_values[-1] * self.condition_limit <= max(1.0, singular_values[0]):
+            return None
+
+        x = y - z @ np.linalg.solve(capacitance, y[columns])
+
+        # One O(n^2) residual check guards against cancellation in the update
+        scale = np.linalg.norm(a, np.inf) * np.linalg.norm(x, np.inf) + np.linalg.norm(b, np.inf)
+        if scale and np.linalg.norm(a @ x - b, np.inf) / scale > self.residual_limit:
+            return None
+        return x
+
+
+    def _solved_columns(self, columns, changes):
+        """Z = A0^-1 D, only solving for columns whose change is new since the last call."""
+        stale = [k for k, column in enumerate(columns)
+                 if column not in self._columns or not np.array_equal(self._columns[column][0], changes[:, k])]
+        if stale:
+            solved = self.factorization.solve(changes[:, stale])
+            for k, z in zip(stale, solved.T):
+                self._columns[columns[k]] = (changes[:, k].copy(), z)
+
+        self._columns = {column: self._columns[column] for column in columns}  # Drop reverted columns
+        return np.column_stack([self._columns[column][1] for column in columns])
@@ -1,6 +1,19 @@
 from pyray import *
 import threading
+import cmath
+import math
 from fractions import Fraction
+import solver
+import exact
+import steptrace
+import lowrank
+import pipeline
+import conditioning
+import structure
+import blocks
+import sensitivity
+import leastsquares
+from tracelog import TraceLog
 
 
 # ONE BACKSPACE     - FLOW
@@ -38,44 +51,6 @@ class Circle:
 
 
 # MAIN CLASSES
-class TraceLog:
-
-    _instance = None
-    _lock = threading.Lock()
-
-    colors = {
-        TraceLogLevel.LOG_INFO: "\033[34m",         # Blue
-        TraceLogLevel.LOG_WARNING: "\033[33m",      # Yellow
-        TraceLogLevel.LOG_ERROR: "\033[31m",        # Red
-    }
-
-    def __new__(cls, *args, **kwargs):
-
-        with cls._lock: 
-
-            if not cls._instance:
-                cls._instance = super().__new__(cls)
-
-        return cls._instance
-    
-
-    def __call__(self, level: int, text: str):
-
-        with self._lock: 
-
-            color = self.colors.get(level, "\033[37m")
-            reset_color = "\033[0m"
-
-            level_names = {
-                TraceLogLevel.LOG_INFO: "[INFO]",
-                TraceLogLevel.LOG_WARNING: "[WARNING]",
-                TraceLogLevel.LOG_ERROR: "[ERROR]",
-            }
-
-            print(f"{color}{level_names.get(level, '[UNKNOWN]')}: {text}{reset_color}")
-
-
-
 class ResourceManager:
 
     _instance = None
@@ -376,6 +351,10 @@ class MessageBox: # TODO: COMBINE MESSAGEBOX AND BUTTON CLASS
                     self.text += "/"
                 elif key == KeyboardKey.KEY_PERIOD:  # Allow the '.' character for floats
                     self.text += "."
+                elif key == KeyboardKey.KEY_J:  # Allow 'j' for complex phasors (e.g. 3+4j)
+                    self.text += "j"
+                elif key == KeyboardKey.KEY_KP_ADD or (key == KeyboardKey.KEY_EQUAL and is_key_down(KeyboardKey.KEY_LEFT_SHIFT)):
+                    self.text += "+"
                 elif 48 <= key <= 57:  # Allow numeric input (keys 0-9)
                     self.text += chr(key)
                 key = get_key_pressed()
@@ -383,27 +362,50 @@ class MessageBox: # TODO: COMBINE MESSAGEBOX AND BUTTON CLASS
 
     def validate_input(self):
         """
-        Validate the text as either a valid fraction or float.
+        Validate the text as either a valid fraction, float or complex number.
         Returns True if valid, False otherwise.
         """
         if not self.text:
             return False
         try:
-            # Try to parse as a fraction or float
-            float(Fraction(self.text))
+            self.get_value()
             return True
         except ValueError:
             return False
 
 
+    def is_complex(self) -> bool:
+        return "j" in self.text
+
+
     def get_value(self):
         """
-        Return the numeric value of the input as a float.
+        Return the numeric value of the input as a float, or a complex for phasors like '3+4j'.
         If the input is invalid, raise a ValueError.
         """
-        if not self.validate_input():
-            raise ValueError(f"Invalid input: '{self.text}'")
-        return float(Fraction(self.text))
+        try:
+            # Try to parse as a fraction or float first
+            return float(Fraction(self.text))
+        except (ValueError, ZeroDivisionError):
+            if not self.is_complex():
+                raise ValueError(f"Invalid input: '{self.text}'") from None
+        try:
+            return complex(self.text)
+        except ValueError:
+            raise ValueError(f"Invalid input: '{self.text}'") from None
+
+
+    def get_exact_value(self) -> Fraction:
+        """
+        Return the input as an exact Fraction (e.g. '1/3' stays 1/3).
+        If the input is invalid, raise a ValueError.
+        """
+        try:
+            return Fraction(self.text)
+        except (ValueError, ZeroDivisionError):
+            if self.is_complex():
+                raise ValueError(f"Exact mode does not support complex input: '{self.text}'") from None
+            raise ValueError(f"Invalid input: '{self.text}'") from None
 
 
     def fit_text_size(self) -> int:
@@ -476,6 +478,7 @@ class PopupWindow:
 
     def __init__(self, message, font, rect=Rectangle(100, 100, APP_WIDTH - 200, APP_HEIGHT - 200), font_size=40, line_spacing=1.5):
         self.message = message
+        self.lines = message.split("\n")
         self.font = font
         self.rect = rect
         self.font_size = font_size
@@ -487,8 +490,13 @@ class PopupWindow:
     
     def show(self, message):
 
-        """Display the popup window with the given message."""
+        """
+        Display the popup window with the given message.
+        The message is either a string or a sequence of lines such as a steptrace.StepReport,
+        which is only rendered line by line as lines scroll into view.
+        """
         self.message = message
+        self.lines = message.split("\n") if isinstance(message, str) else message
         self.is_visible = True
         self.scroll_offset = 0  # Reset scroll offset when a new message is shown
 
@@ -501,8 +509,7 @@ class PopupWindow:
         draw_rectangle_rec(self.rect, DARKGRAY)
         draw_rectangle_lines_ex(self.rect, 5, RAYWHITE)
 
-        # Split the message into lines
-        lines = self.message.split("\n")
+        lines = self.lines
         line_height = int(self.font_size * self.line_spacing)
         total_content_height = len(lines) * line_height
         visible_content_height = self.rect.height - 40  # Account for padding
@@ -551,12 +558,14 @@ class Calculator:
         # Buttons
         self.buttons = {
             "NEXT": Button(Rectangle(810, 800, 300, 100), GRAY, text="NEXT", font_size=50),
-            "SOLVE": Button(Rectangle(810, 950, 300, 100), GRAY, text="SOLVE", font_size=50)
+            "SOLVE": Button(Rectangle(810, 950, 300, 100), GRAY, text="SOLVE", font_size=50),
+            "EXACT": Button(Rectangle(1150, 950, 300, 100), GRAY, text="EXACT", font_size=50),
         }
 
         # Matrix message boxes
         self.matrix_boxes = []  # List of message boxes for matrix input
         self.matrix_size = 0  # Current matrix size (determined by row/column input)
+        self.matrix_rows = 0  # Equations; differs from matrix_size for least-squares systems
 
         # Camera2D setup for grid panning and zooming
         self.camera = Camera2D(
@@ -573,22 +582,48 @@ class Calculator:
 
         self.popup = PopupWindow("", RM.get("mainfont"))
 
-        self.solution = ""
+        self.solution = steptrace.StepReport()
+
+        # Exact mode keeps Fractions and solves with Bareiss elimination instead of floats
+        self.exact_mode = False
+
+        # Factorizations of recently solved coefficient blocks, so editing only the source column is cheap
+        self.factor_cache = solver.FactorizationCache()
+        self.record_steps = True  # Turn off to skip step recording entirely
+
+        # Base factorization for incremental re-solves after editing a few cells
+        self.incremental = lowrank.IncrementalSolver()
+
+        # Background elimination of rows as they are typed (large grids only)
+        self.pipeline = None
+
+
+    @property
+    def record_steps(self) -> bool:
+        return self.factor_cache.record_trace
+
+
+    @record_steps.setter
+    def record_steps(self, value: bool):
+        """Cached factorizations only carry steps if they were recorded, so switching drops them."""
+        if value != self.factor_cache.record_trace:
+            self.factor_cache.clear()
+        self.factor_cache.record_trace = value
 
 
-    def collect_matrix_input(self):
+    def collect_matrix_input(self, exact=False):
         """Collect matrix input from the message boxes and format it for computation."""
         matrix = []
         try:
             for row_boxes in self.matrix_boxes:
                 row = []
                 for box in row_boxes:
-                    row.append(box.get_value())  # Use get_value to handle fractions and floats
+                    row.append(box.get_exact_value() if exact else box.get_value())  # Fractions in exact mode, floats otherwise
                 matrix.append(row)
 
-            # Ensure augmented matrix size (n x n+1)
-            if len(matrix) != self.matrix_size or any(len(row) != self.matrix_size + 1 for row in matrix):
-                raise ValueError("Invalid matrix size! Ensure it's n x n+1.")
+            # Ensure augmented matrix size (m x n+1)
+            if len(matrix) != self.matrix_rows or any(len(row) != self.matrix_size + 1 for row in matrix):
+                raise ValueError("Invalid matrix size! Ensure it's m x n+1.")
 
             return matrix
 
@@ -601,17 +636,23 @@ class Calculator:
         """Generate a grid of message boxes for matrix input based on matrix size."""
         self.matrix_boxes.clear()  # Clear any existing matrix boxes
 
+        # Start a fresh typing pipeline for the new size
+        if self.pipeline is not None:
+            self.pipeline.close()
+        square = self.matrix_rows == self.matrix_size  # Least-squares systems are not eliminated row by row
+        self.pipeline = pipeline.EliminationPipeline(self.matrix_size) if square and self.matrix_size > solver.STEP_LOG_MAX_SIZE else None
+
         # Fixed cell size for simplicity
         cell_size = 50
         padding = 5  # Space between cells
 
         # Calculate starting position for the grid
         grid_width = (self.matrix_size + 1) * (cell_size + padding) - padding  # Include the extra column
-        grid_height = self.matrix_size * (cell_size + padding) - padding
+        grid_height = self.matrix_rows * (cell_size + padding) - padding
         start_x = (APP_WIDTH - grid_width) // 2
         start_y = (APP_HEIGHT - grid_height) // 2
 
-        for i in range(self.matrix_size):
+        for i in range(self.matrix_rows):
             row_boxes = []
             for j in range(self.matrix_size + 1):  # Add the extra column for augmented matrix
                 x = start_x + j * (cell_size + padding)
@@ -683,9 +724,14 @@ class Calculator:
                         box.is_focused = False
 
                 # Handle input and render the box
+                previous_text = box.text
                 box.handle_input()
                 box.render()
 
+                # Feed edited coefficient rows to the background elimination
+                if box.text != previous_text and col_idx < len(row) - 1:
+                    self.feed_pipeline(row_idx)
+
                 # Add a separator before the last column
                 if col_idx == len(row) - 2:  # Second-to-last column
                     separator_x = box.rect.x + box.rect.width + 5
@@ -698,6 +744,18 @@ class Calculator:
 
 
 
+    def feed_pipeline(self, row_idx):
+        """Send a coefficient row to the typing pipeline once every cell in it is a valid number."""
+        if self.pipeline is None:
+            return
+
+        row_boxes = self.matrix_boxes[row_idx][:-1]  # The source column is not part of the factorization
+        if all(box.validate_input() and not box.is_complex() for box in row_boxes):  # The pipeline is real-only
+            self.pipeline.submit_row(row_idx, [box.get_value() for box in row_boxes])
+        else:
+            self.pipeline.invalidate_row(row_idx)
+
+
     def handle_camera_input(self):
         """Handle Camera2D input for zooming and panning."""
         # Zoom with the mouse wheel
@@ -750,14 +808,15 @@ class Calculator:
                 column_count = int(self.column_box.text)
                 row_count = int(self.row_box.text)
 
-                # Ensure it's a square matrix
-                if column_count == row_count and column_count > 0:
+                # Rectangular systems are solved in the least-squares sense
+                if column_count > 0 and row_count > 0:
                     self.matrix_size = column_count
+                    self.matrix_rows = row_count
                     self.generate_matrix_boxes()
                     return True  # Transition to matrix input
                 else:
-                    log(TraceLogLevel.LOG_WARNING, "Matrix must be square and non-zero!")
-                    self.popup.show("Matrix must be square and non-zero!")
+                    log(TraceLogLevel.LOG_WARNING, "Matrix size must be non-zero!")
+                    self.popup.show("Matrix size must be non-zero!")
 
             except ValueError:
                 log(TraceLogLevel.LOG_WARNING, "Invalid matrix size input!")
@@ -768,48 +827,33 @@ class Calculator:
     # (Other methods and initializations remain unchanged)
     def gaussian_elimination(self, matrix):
         """
-        Perform Gaussian elimination step-by-step and log the process.
-        The input matrix is modified in place to transform it to row-echelon form.
+        Reduce the augmented matrix to row-echelon form and log the result.
+        The elimination itself runs in the headless solver module (vectorized, partial pivoting).
+        Row operations are recorded as a steptrace.EliminationTrace unless record_steps is off.
         """
         n = len(matrix)
         if len(matrix[0]) != n + 1:
             raise ValueError("Matrix dimensions do not match for an augmented system.")
 
         log(TraceLogLevel.LOG_INFO, "Starting Gaussian elimination...")
-        self.solution += "Starting Gaussian elimination...\n"
-
-        for i in range(n):
-            # Step 1: Find the pivot element
-            pivot = matrix[i][i]
-            if abs(pivot) < 1e-12:  # Small epsilon for near-zero pivot
-                log(TraceLogLevel.LOG_WARNING, f"Near-zero pivot encountered at row {i}.")
-                self.solution += f"Near-zero pivot encountered at row {i}.\n"
-                # Swap with a non-zero row if possible
-                for k in range(i + 1, n):
-                    if abs(matrix[k][i]) > 1e-12:
-                        matrix[i], matrix[k] = matrix[k], matrix[i]
-                        log(TraceLogLevel.LOG_INFO, f"Swapped row {i} with row {k}.")
-                        self.solution += f"Swapped row {i} with row {k}.\n"
-                        pivot = matrix[i][i]
-                        break
-                else:
-                    raise ValueError("Matrix is singular and cannot be solved.")
+        self.solution.add("Starting Gaussian elimination...")
+
+        # Steps are stored as op-codes and only rendered for the lines the popup shows
+        steps = steptrace.EliminationTrace() if self.record_steps else None
 
-            # Step 2: Normalize the pivot row
-            matrix[i][i:] = [x / pivot for x in matrix[i][i:]]
-            log(TraceLogLevel.LOG_INFO, f"Normalized row {i}: {matrix[i]}")
-            self.solution += f"Normalized row {i}: {matrix[i]}\n"
+        hits = self.factor_cache.hits
+        echelon, piv = solver.row_echelon(matrix, cache=self.factor_cache, trace=steps)
+        if self.factor_cache.hits > hits:
+            log(TraceLogLevel.LOG_INFO, "Coefficients unchanged, reusing cached LU factorization.")
+            self.solution.add("Coefficients unchanged, reusing cached LU factorization.")
 
-            # Step 3: Eliminate below the pivot
-            for k in range(i + 1, n):
-                factor = matrix[k][i]
-                matrix[k][i:] = [matrix[k][j] - factor * matrix[i][j] for j in range(i, n + 1)]
-                log(TraceLogLevel.LOG_INFO, f"Eliminated row {k} using row {i}: {matrix[k]}")
-                self.solution += f"Eliminated row {k} using row {i}: {matrix[k]}\n"
+        if steps is not None:
+            log(TraceLogLevel.LOG_INFO, "Recorded %d elimination steps.", len(steps))
+            self.solution.add_trace(steps)
 
         log(TraceLogLevel.LOG_INFO, "Gaussian elimination complete.")
-        self.solution += "Gaussian elimination complete.\n"
-        return matrix
+        self.solution.add("Gaussian elimination complete.")
+        return echelon
 
 
 
@@ -817,16 +861,11 @@ class Calculator:
         """
         Perform back substitution on a row-echelon matrix to find the solution.
         """
-        n = len(matrix)
-        solution = [0] * n
+        solution = solver.back_substitution(matrix).tolist()
 
-        for i in range(n - 1, -1, -1):
-            solution[i] = matrix[i][n]
-            for j in range(i + 1, n):
-                solution[i] -= matrix[i][j] * solution[j]
-            solution[i] /= matrix[i][i]
-            log(TraceLogLevel.LOG_INFO, f"Back substitution at row {i}: x[{i}] = {solution[i]}")
-            self.solution += f"Back substitution at row {i}: x[{i}] = {solution[i]}\n"
+        for i in range(len(solution) - 1, -1, -1):
+            log(TraceLogLevel.LOG_INFO, "Back substitution at row %d: x[%d] = %s", i, i, solution[i])
+            self.solution.add(f"Back substitution at row {i}: x[{i}] = {solution[i]}")
 
         return solution
 
@@ -834,29 +873,159 @@ class Calculator:
         """
         Collect the matrix, perform Gaussian elimination, and display the solution step by step.
         """
-        matrix = self.collect_matrix_input()
+        matrix = self.collect_matrix_input(exact=self.exact_mode)
         if not matrix:
             self.popup.show("Matrix input is invalid. Please check your entries.")
             return
 
+        if self.matrix_rows != self.matrix_size:
+            self.solve_matrix_least_squares(matrix)
+            return
+
+        if self.exact_mode:
+            self.solve_matrix_exact(matrix)
+            return
+
+        if any(isinstance(value, complex) for row in matrix for value in row):
+            self.solve_matrix_complex(matrix)
+            return
+
         try:
-            # Perform Gaussian elimination
-            log(TraceLogLevel.LOG_INFO, "Performing Gaussian elimination...")
-            self.solution += "Performing Gaussian elimination...\n"
-            self.gaussian_elimination(matrix)
+            coefficients = [row[:-1] for row in matrix]
+            sources = [row[-1] for row in matrix]
+            typed = self.pipeline.factorization(coefficients) if self.pipeline is not None else None
+            if typed is not None:
+                solution = typed.solve(sources)
+                if pipeline.backward_error(coefficients, solution, sources) > pipeline.BACKWARD_ERROR_LIMIT:
+                    # Element growth without pivoting spoiled the typed factors: take a pivoted path below
+                    log(TraceLogLevel.LOG_WARNING, "Elimination while typing was not accurate enough, solving again with pivoting.")
+                    typed = None
+            layout = structure.analyze(coefficients) if len(coefficients) > solver.STEP_LOG_MAX_SIZE else None
+            split = blocks.decompose(coefficients) if len(coefficients) > solver.STEP_LOG_MAX_SIZE else None
+
+            if typed is not None:
+                # Rows were eliminated in the background while they were typed
+                log(TraceLogLevel.LOG_INFO, "Matrix was eliminated while typing, only triangular solves left.")
+                self.solution.add("Matrix was eliminated while typing, only triangular solves left.")
+                solution = solution.tolist()
+                self.incremental.rebase(coefficients, typed)
+                factors = typed
+            elif solver.prefers_sparse(coefficients):
+                # Mostly-zero system: sparse LU, no step-by-step rows to show
+                log(TraceLogLevel.LOG_INFO, "Sparse system detected, using sparse LU...")
+                self.solution.add("Sparse system detected, using sparse LU...")
+                solution = solver.solve(matrix, sparse=True, cache=self.factor_cache).tolist()
+                factors = self.factor_cache.get(coefficients, sparse=True)
+            elif layout is not None and layout.kind != "general":
+                # Tridiagonal, banded or SPD: a specialised factorization beats general elimination
+                factors = structure.factorize(coefficients, structure=layout)
+                message = (f"Structure: {layout.kind}, bandwidth {layout.lower_bandwidth}/{layout.upper_bandwidth}. "
+                           f"Solving with {structure.describe(factors)}...")
+                log(TraceLogLevel.LOG_INFO, message)
+                self.solution.add(message)
+                solution = factors.solve(sources).tolist()
+                self.incremental.rebase(coefficients, factors)
+            elif split is not None and split.block_count > 1:
+                # Independent subcircuits / block triangular form: factor and solve the blocks concurrently
+                message = f"Reducible system: {split.summary()}. Solving blocks separately..."
+                log(TraceLogLevel.LOG_INFO, message)
+                self.solution.add(message)
+                factors = blocks.BlockTriangularFactorization(coefficients, split)
+                solution = factors.solve(sources).tolist()
+                self.incremental.rebase(coefficients, factors)
+            elif self.incremental.is_small_edit(coefficients):
+                # A few cells changed since the last full elimination: Woodbury update of its LU
+                solution = self.incremental.solve(coefficients, sources).tolist()
+                if self.incremental.last_method == "update":
+                    message = f"{self.incremental.last_rank} column(s) edited, updated the previous factorization (Woodbury)."
+                else:
+                    message = "Edit could not be applied as a safe low-rank update, refactored the matrix."
+                log(TraceLogLevel.LOG_INFO, message)
+                self.solution.add(message)
+                # Updated solves never factor the edited matrix, so there is nothing cheap to estimate from
+                factors = self.incremental.factorization if self.incremental.last_method == "factor" else None
+            else:
+                # Perform Gaussian elimination
+                log(TraceLogLevel.LOG_INFO, "Performing Gaussian elimination...")
+                self.solution.add("Performing Gaussian elimination...")
+                echelon = self.gaussian_elimination(matrix)
+
+                # Perform back substitution
+                log(TraceLogLevel.LOG_INFO, "Performing back substitution...")
+                self.solution.add("Performing back substitution...")
+                solution = self.back_substitution(echelon)
 
-            # Perform back substitution
-            log(TraceLogLevel.LOG_INFO, "Performing back substitution...")
-            self.solution += "Performing back substitution...\n"
-            solution = self.back_substitution(matrix)
+                # Later single-cell edits are solved as low-rank updates of this factorization
+                factors = self.factor_cache.get(coefficients, sparse=False, structured=False)
+                self.incremental.rebase(coefficients, factors)
 
             # Display solution in the popup
             solution_text = "\n".join([f"x[{i}] = {x:.2f}" for i, x in enumerate(solution)])
-            self.solution += f"Solution:\n{solution_text}\n"
+            self.solution.add(f"Solution:\n{solution_text}")
+
+            # A few extra triangular solves with the factors we already have
+            if factors is not None:
+                condition = conditioning.condition_estimate(coefficients, factors)
+                level = TraceLogLevel.LOG_WARNING if condition >= conditioning.ILL_CONDITIONED else TraceLogLevel.LOG_INFO
+                log(level, conditioning.describe_condition(condition))
+                self.solution.add(conditioning.describe_condition(condition))
+
+                # One transposed solve per unknown gives its derivative with respect to every entry
+                if len(solution) <= sensitivity.REPORT_SIZE:
+                    self.solution.add(sensitivity.matrix_sensitivities(solution, factors).report())
 
         except ValueError as e:
             log(TraceLogLevel.LOG_WARNING, f"Error: {str(e)}")
-            self.solution += f"Error: {str(e)}\n"
+            self.solution.add(f"Error: {str(e)}")
+
+    def solve_matrix_exact(self, matrix):
+        """Solve with fraction-free Bareiss elimination and show the answers as exact fractions."""
+        try:
+            log(TraceLogLevel.LOG_INFO, "Performing exact Bareiss elimination...")
+            self.solution.add("Performing exact Bareiss elimination...")
+            solution = exact.bareiss_solve(matrix)
+
+            solution_text = "\n".join([f"x[{i}] = {x}" + ("" if x.denominator == 1 else f" ({float(x):.2f})") for i, x in enumerate(solution)])
+            self.solution.add(f"Solution:\n{solution_text}")
+
+        except ValueError as e:
+            log(TraceLogLevel.LOG_WARNING, f"Error: {str(e)}")
+            self.solution.add(f"Error: {str(e)}")
+
+    def solve_matrix_least_squares(self, matrix):
+        """Solve a rectangular system in the least-squares sense and report its rank and residual."""
+        try:
+            if self.exact_mode:
+                self.solution.add("Exact mode needs a square system, solving in floating point.")
+            log(TraceLogLevel.LOG_INFO, "Rectangular system, solving least squares with pivoted Householder QR...")
+            self.solution.add("Rectangular system, solving least squares with pivoted Householder QR...")
+            result = leastsquares.solve(matrix)
+
+            level = TraceLogLevel.LOG_WARNING if result.rank_deficient else TraceLogLevel.LOG_INFO
+            log(level, result.summary())
+            self.solution.add(result.summary())
+
+            solution_text = "\n".join([f"x[{i}] = {x:.2f}" for i, x in enumerate(result.x)])
+            self.solution.add(f"Solution:\n{solution_text}")
+
+        except ValueError as e:
+            log(TraceLogLevel.LOG_WARNING, f"Error: {str(e)}")
+            self.solution.add(f"Error: {str(e)}")
+
+    def solve_matrix_complex(self, matrix):
+        """Solve a system of complex phasors (AC circuits) and show each unknown as magnitude and phase."""
+        try:
+            log(TraceLogLevel.LOG_INFO, "Complex entries detected, solving with complex LU...")
+            self.solution.add("Complex entries detected, solving with complex LU...")
+            solution = solver.solve(matrix)
+
+            solution_text = "\n".join([f"x[{i}] = {x.real:.2f}{x.imag:+.2f}j (|x| = {abs(x):.2f}, angle {math.degrees(cmath.phase(x)):.1f} deg)"
+                                       for i, x in enumerate(solution)])
+            self.solution.add(f"Solution:\n{solution_text}")
+
+        except ValueError as e:
+            log(TraceLogLevel.LOG_WARNING, f"Error: {str(e)}")
+            self.solution.add(f"Error: {str(e)}")
 
     def update(self) -> str:
         """Main update loop."""
@@ -872,11 +1041,17 @@ class Calculator:
             end_mode_2d()
 
             # Check if Enter key is pressed to solve the matrix
+            self.buttons["EXACT"].render()
+            if self.buttons["EXACT"].is_clicked():
+                self.exact_mode = not self.exact_mode
+                self.buttons["EXACT"].set_color(GOLDEN_YELLOW if self.exact_mode else GRAY)
+                log(TraceLogLevel.LOG_INFO, f"Exact mode {'on' if self.exact_mode else 'off'}.")
+
             self.buttons["SOLVE"].render()
             if self.buttons["SOLVE"].is_clicked() or is_key_pressed(KeyboardKey.KEY_ENTER):
                 self.solve_matrix()
                 self.popup.show(self.solution)
-                self.solution = ""
+                self.solution = steptrace.StepReport()
 
             # if is_key_pressed(KeyboardKey.KEY_ENTER):
             #     self.solve_matrix()
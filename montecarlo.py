@@ -0,0 +1,448 @@
+import copy
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+import solver
+from iterative import ConvergenceError
+from sparse_solver import SPARSE_MIN_SIZE, SparsePattern
+
+
+# Monte Carlo and corner tolerance analysis of netlist circuits.
+#
+# Every sample is the same circuit with different element values, so the topology is built once
+# per worker process (pool initializer) and only values change afterwards: small circuits are
+# scattered into a k x n x n stack and solved with one batched call, larger ones reuse a single
+# SparsePattern (assembly map + column ordering), nonlinear ones one NewtonSolver warm-started
+# from the nominal operating point.
+#
+# Samples are drawn in chunks. Chunk i always gets the i-th child of the seed's SeedSequence,
+# so results do not depend on the number of workers or on which worker ran which chunk. Chunk
+# results are folded into per-output histograms and running moments as they arrive and dropped.
+
+
+# CONSTANTS
+DEFAULT_SAMPLES = 1000
+CHUNK_SIZE = 256                # Samples per task handed to a worker
+HISTOGRAM_BINS = 512
+PILOT_MARGIN = 0.5              # Histogram range: the first chunk's range, widened by this fraction on each side
+CORNER_LIMIT = 16               # Toleranced elements beyond which the 2**k corners are refused
+DISTRIBUTIONS = ("uniform", "gaussian")
+
+
+
+class Tolerance:
+    """
+    Relative tolerance of one element value. 'uniform' draws from nominal * (1 +- relative),
+    'gaussian' treats relative as 3 sigma.
+    """
+
+    def __init__(self, relative: float, distribution="uniform"):
+
+        if relative < 0:
+            raise ValueError("Tolerance must be non-negative.")
+        if distribution not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown distribution '{distribution}'. Expected one of {DISTRIBUTIONS}.")
+        self.relative = relative
+        self.distribution = distribution
+
+
+    def sample(self, nominal: float, rng, count: int) -> np.ndarray:
+        if self.distribution == "gaussian":
+            return nominal * (1 + self.relative / 3 * rng.standard_normal(count))
+        return nominal * (1 + self.relative * rng.uniform(-1.0, 1.0, count))
+
+
+    def __repr__(self):
+        return f"Tolerance({self.relative:g}, '{self.distribution}')"
+
+
+
+def as_tolerances(tolerances: dict) -> dict:
+    """Accept {'R1': 0.05} shorthand next to {'R1': Tolerance(0.05, 'gaussian')}."""
+    return {name: spec if isinstance(spec, Tolerance) else Tolerance(float(spec))
+            for name, spec in tolerances.items()}
+
+
+
+class OnlineHistogram:
+    """
+    Fixed-bin histogram plus running count, mean, variance, min and max of a stream of values.
+    Values outside the bins are counted as underflow/overflow and still enter the moments.
+    """
+
+    def __init__(self, edges):
+
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.underflow = self.overflow = 0
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.minimum, self.maximum = np.inf, -np.inf
+
+
+    @classmethod
+    def around(cls, values, bins=HISTOGRAM_BINS, margin=PILOT_MARGIN) -> "OnlineHistogram":
+        """Empty histogram whose bins cover the range of a pilot sample, with some margin."""
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        low, high = (values.min(), values.max()) if len(values) else (0.0, 0.0)
+        spread = high - low or max(abs(high), 1.0) * 1e-6
+        return cls(np.linspace(low - margin * spread, high + margin * spread, bins + 1))
+
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+
+        self.counts += np.histogram(values, self.edges)[0]
+        self.underflow += int(np.count_nonzero(values < self.edges[0]))
+        self.overflow += int(np.count_nonzero(values > self.edges[-1]))
+
+        # Chan et al. parallel update of the mean and the sum of squared deviations
+        count, mean = len(values), values.mean()
+        m2 = ((values - mean) ** 2).sum()
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self._m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+
+    def percentile(self, q: float) -> float:
+        """Percentile q (0-100), interpolated inside its bin. Tails beyond the bins clamp to min/max."""
+        if self.count == 0:
+            return float("nan")
+        rank = q / 100 * self.count
+        if rank <= self.underflow:
+            return float(self.minimum)
+        cumulative = self.underflow + np.cumsum(self.counts)
+        k = int(np.searchsorted(cumulative, rank))
+        if k >= len(self.counts):
+            return float(self.maximum)
+        below = cumulative[k] - self.counts[k]
+        fraction = (rank - below) / self.counts[k] if self.counts[k] else 0.0
+        value = self.edges[k] + fraction * (self.edges[k + 1] - self.edges[k])
+        return float(np.clip(value, self.minimum, self.maximum))
+
+
+    def __repr__(self):
+        return f"OnlineHistogram(count={self.count}, mean={self.mean:.6g}, std={self.std:.6g})"
+
+
+
+class SampleEvaluator:
+    """Solves one circuit for many sets of element values, reusing everything that depends only on topology."""
+
+    def __init__(self, circuit, names, outputs):
+
+        self.circuit = copy.deepcopy(circuit)  # Values are overwritten sample by sample
+        self.names = list(names)
+        self.n = self.circuit.size
+        unknowns = [*self.circuit.nodes, *(f"I({name})" for name in self.circuit.branches)]
+        missing = [output for output in outputs if output not in unknowns]
+        if missing:
+            raise ValueError(f"Unknown output(s): {', '.join(missing)}")
+        self.outputs = list(outputs)
+        self.columns = np.array([unknowns.index(output) for output in outputs], dtype=np.int64)
+
+        rows, cols, _, _ = self.circuit.triplets()
+        self.newton = self.pattern = None
+        if self.circuit.nonlinear:
+            import newton
+            self.newton = newton.NewtonSolver(self.circuit)
+            self.x0 = newton.operating_point(self.circuit, newton=self.newton).x
+            return
+
+        if self.n >= SPARSE_MIN_SIZE:
+            self.pattern = SparsePattern(rows, cols, (self.n, self.n))
+        else:
+            # Scatter matrix from unsummed triplets to the flattened dense matrix (duplicates add up)
+            self.scatter = sp.csr_matrix((np.ones(len(rows)), (np.arange(len(rows)), rows * self.n + cols)),
+                                         shape=(len(rows), self.n * self.n))
+        rhs_rows, _ = self.circuit.rhs_entries()
+        self.rhs_scatter = sp.csr_matrix((np.ones(len(rhs_rows)), (np.arange(len(rhs_rows)), rhs_rows)),
+                                         shape=(len(rhs_rows), self.n))
+        self.laws = self._value_laws()
+
+
+    def _value_laws(self):
+        """(matrix slice, rhs slice, coefficients, powers) of every toleranced element, see Element.value_law."""
+        laws = []
+        for name in self.names:
+            law = self.circuit.elements[name].value_law(self.circuit.node_index)
+            if law is None:
+                return None
+            laws.append((*self.circuit.slices(name), *law))
+        return laws
+
+
+    def _operating_point(self):
+        try:
+            return self.newton.solve(self.x0)[0]
+        except ConvergenceError:
+            return self.newton.solve_with_source_stepping()[0]
+
+
+    def _stamped(self, values):
+        """Triplet values (k x entries) and right-hand sides (k x n) of k samples."""
+        k = len(values)
+        _, _, vals, _ = self.circuit.triplets()
+        vals = np.tile(vals, (k, 1))
+        rhs_vals = np.tile(self.circuit.rhs_entries()[1], (k, 1))
+
+        if self.laws is None:
+            for i, sample in enumerate(values):
+                for name, value in zip(self.names, sample):
+                    self.circuit.set_value(name, value)
+                vals[i] = self.circuit.triplets()[2]
+                rhs_vals[i] = self.circuit.rhs_entries()[1]
+        else:
+            for j, (matrix_slice, rhs_slice, coefficients, powers) in enumerate(self.laws):
+                entries = coefficients * values[:, j, None] ** powers
+                count = matrix_slice.stop - matrix_slice.start
+                vals[:, matrix_slice] = entries[:, :count]
+                rhs_vals[:, rhs_slice] = entries[:, count:]
+        return vals, (self.rhs_scatter.T @ rhs_vals.T).T
+
+
+    def evaluate(self, values) -> np.ndarray:
+        """k x outputs array for a k x len(names) array of element values. Failed samples are NaN."""
+        values = np.atleast_2d(values)
+        k = len(values)
+        out = np.full((k, len(self.columns)), np.nan)
+
+        if self.newton is not None:
+            for i, sample in enumerate(values):
+                for name, value in zip(self.names, sample):
+                    self.circuit.set_value(name, value)
+                try:
+                    out[i] = self._operating_point()[self.columns]
+                except ValueError:  # ConvergenceError
+                    pass
+            return out
+
+        vals, rhs = self._stamped(values)
+        if self.pattern is not None:
+            for i in range(k):
+                try:
+                    out[i] = self.pattern.factor(vals[i]).solve(rhs[i])[self.columns]
+                except ValueError:  # SingularMatrixError
+                    pass
+            return out
+
+        stack = (self.scatter.T @ vals.T).T.reshape(k, self.n, self.n)
+        if k:
+            try:
+                out[:] = solver.solve_batch(stack, rhs)[:, self.columns]
+            except solver.SingularMatrixError:  # One bad sample: retry one by one so the others survive
+                for i in range(k):
+                    try:
+                        out[i] = solver.solve_batch(stack[i:i + 1], rhs[i:i + 1])[0, self.columns]
+                    except solver.SingularMatrixError:
+                        pass
+        return out
+
+
+
+# Per-process state, set up once by the pool initializer
+_evaluator = None
+
+
+def _start_worker(circuit, names, outputs):
+    global _evaluator
+    _evaluator = SampleEvaluator(circuit, names, outputs)
+
+
+def _draw(seed, count, nominal, tolerances) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    return np.column_stack([tolerance.sample(value, rng, count) for value, tolerance in zip(nominal, tolerances)])
+
+
+def _monte_carlo_chunk(task):
+    seed, count, nominal, tolerances = task
+    return _evaluator.evaluate(_draw(seed, count, nominal, tolerances))
+
+
+def _corner_values(first, count, nominal, relative) -> np.ndarray:
+    """Element values of corners first..first+count-1; bit j of a corner index picks the high end of element j."""
+    bits = (np.arange(first, first + count)[:, None] >> np.arange(len(nominal))) & 1
+    return nominal * (1 + relative * (2 * bits - 1))
+
+
+def _corner_chunk(task):
+    first, count, nominal, relative = task
+    return _evaluator.evaluate(_corner_values(first, count, nominal, relative))
+
+
+
+class MonteCarloResult:
+
+    def __init__(self, histograms: dict, nominal: dict, samples: int, failed: int, passed=None):
+
+        self.histograms = histograms    # output name -> OnlineHistogram
+        self.nominal = nominal          # output name -> value at the nominal element values
+        self.samples = samples
+        self.failed = failed            # Samples whose system was singular or did not converge
+        self.passed = passed            # Samples inside every limit, None without limits
+
+
+    @property
+    def yield_fraction(self):
+        return None if self.passed is None else self.passed / self.samples
+
+
+    def percentiles(self, name, q=(1, 5, 50, 95, 99)) -> dict:
+        return {p: self.histograms[name].percentile(p) for p in q}
+
+
+    def summary(self) -> str:
+        lines = [f"{self.samples} samples, {self.failed} failed"
+                 + ("" if self.passed is None else f", yield {self.yield_fraction:.2%}")]
+        for name, histogram in self.histograms.items():
+            low, median, high = (histogram.percentile(p) for p in (1, 50, 99))
+            lines.append(f"{name}: nominal {self.nominal[name]:.6g}, mean {histogram.mean:.6g}, std {histogram.std:.3g}, "
+                         f"p1/p50/p99 {low:.6g} / {median:.6g} / {high:.6g}")
+        return "\n".join(lines)
+
+
+    def __repr__(self):
+        return f"MonteCarloResult(samples={self.samples}, failed={self.failed}, outputs={list(self.histograms)})"
+
+
+
+class CornerResult:
+
+    def __init__(self, names, relative, outputs, low, high, low_corner, high_corner):
+
+        self.names = names
+        self.relative = relative
+        self.outputs = outputs
+        self.low, self.high = low, high                             # Extremes of every output over all corners
+        self._low_corner, self._high_corner = low_corner, high_corner
+
+
+    def corner(self, index) -> dict:
+        """Element values at a corner, as {'R1': '+', ...}."""
+        return {name: "+" if index >> j & 1 else "-" for j, name in enumerate(self.names)}
+
+
+    def worst_case(self, name) -> dict:
+        """{'low': (value, corner), 'high': (value, corner)} for one output."""
+        k = self.outputs.index(name)
+        return {"low": (float(self.low[k]), self.corner(self._low_corner[k])),
+                "high": (float(self.high[k]), self.corner(self._high_corner[k]))}
+
+
+    def __repr__(self):
+        return f"CornerResult(corners={2 ** len(self.names)}, outputs={self.outputs})"
+
+
+
+def _run(evaluator, tasks, chunk_function, workers):
+    """Evaluate tasks in order, in a process pool when there is more than one worker. Yields chunk results."""
+    global _evaluator
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) <= 1:
+        _evaluator = evaluator
+        yield from map(chunk_function, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), initializer=_start_worker,
+                             initargs=(evaluator.circuit, evaluator.names, evaluator.outputs)) as pool:
+        yield from pool.map(chunk_function, tasks)
+
+
+def _outputs(circuit, outputs):
+    return list(outputs) if outputs is not None else list(circuit.nodes)
+
+
+def monte_carlo(circuit, tolerances: dict, samples=DEFAULT_SAMPLES, outputs=None, limits=None, seed=0,
+                workers=None, chunk_size=CHUNK_SIZE) -> MonteCarloResult:
+    """
+    Solve the circuit for `samples` random draws of the toleranced element values.
+
+    tolerances maps element names to a relative tolerance or a Tolerance. outputs are node names or
+    'I(<element>)' (default: every node). limits maps outputs to (low, high) for the yield count.
+    The same seed gives the same result for any number of workers.
+    """
+    tolerances = as_tolerances(tolerances)
+    outputs = _outputs(circuit, outputs)
+    names = list(tolerances)
+    missing = [name for name in names if name not in circuit.elements]
+    if missing:
+        raise ValueError(f"Unknown element(s): {', '.join(missing)}")
+
+    nominal = np.array([circuit.elements[name].value for name in names], dtype=float)
+    evaluator = SampleEvaluator(circuit, names, outputs)
+    nominal_outputs = dict(zip(outputs, evaluator.evaluate(nominal)[0]))
+
+    counts = [min(chunk_size, samples - start) for start in range(0, samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(counts))
+    tasks = [(s, count, nominal, [tolerances[name] for name in names]) for s, count in zip(seeds, counts)]
+    if not tasks:
+        raise ValueError("Monte Carlo analysis needs at least one sample.")
+
+    # The first chunk runs here and fixes the histogram bins
+    pilot = evaluator.evaluate(_draw(*tasks[0][:2], nominal, tasks[0][3]))
+    histograms = {name: OnlineHistogram.around(pilot[:, k]) for k, name in enumerate(outputs)}
+    bounds = None
+    if limits is not None:
+        bounds = np.array([limits.get(name, (-np.inf, np.inf)) for name in outputs], dtype=float)
+
+    failed, passed = 0, 0
+    for chunk in itertools.chain([pilot], _run(evaluator, tasks[1:], _monte_carlo_chunk, workers)):
+        for k, histogram in enumerate(histograms.values()):
+            histogram.add(chunk[:, k])
+        bad = np.isnan(chunk).any(axis=1)
+        failed += int(np.count_nonzero(bad))
+        if bounds is not None:
+            inside = (chunk >= bounds[:, 0]) & (chunk <= bounds[:, 1])
+            passed += int(np.count_nonzero(inside.all(axis=1) & ~bad))
+
+    return MonteCarloResult(histograms, nominal_outputs, samples, failed, passed if limits is not None else None)
+
+
+def corner_analysis(circuit, tolerances: dict, outputs=None, workers=None, chunk_size=CHUNK_SIZE) -> CornerResult:
+    """Solve every combination of toleranced values at their low/high ends and keep each output's extremes."""
+    tolerances = as_tolerances(tolerances)
+    outputs = _outputs(circuit, outputs)
+    names = list(tolerances)
+    missing = [name for name in names if name not in circuit.elements]
+    if missing:
+        raise ValueError(f"Unknown element(s): {', '.join(missing)}")
+    if len(names) > CORNER_LIMIT:
+        raise ValueError(f"{2 ** len(names)} corners is too many, use monte_carlo() beyond {CORNER_LIMIT} elements.")
+
+    nominal = np.array([circuit.elements[name].value for name in names], dtype=float)
+    relative = np.array([tolerances[name].relative for name in names])
+    total = 2 ** len(names)
+    tasks = [(start, min(chunk_size, total - start), nominal, relative) for start in range(0, total, chunk_size)]
+
+    low, high = np.full(len(outputs), np.inf), np.full(len(outputs), -np.inf)
+    low_corner, high_corner = np.zeros(len(outputs), dtype=np.int64), np.zeros(len(outputs), dtype=np.int64)
+    evaluator = SampleEvaluator(circuit, names, outputs)
+    for (start, _, _, _), chunk in zip(tasks, _run(evaluator, tasks, _corner_chunk, workers)):
+        for k in range(len(outputs)):
+            column = chunk[:, k]
+            if np.all(np.isnan(column)):
+                continue
+            i, j = int(np.nanargmin(column)), int(np.nanargmax(column))
+            if column[i] < low[k]:
+                low[k], low_corner[k] = column[i], start + i
+            if column[j] > high[k]:
+                high[k], high_corner[k] = column[j], start + j
+
+    return CornerResult(names, relative, outputs, low, high, low_corner, high_corner)
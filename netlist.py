@@ -0,0 +1,802 @@
+import re
+
+import numpy as np
+import scipy.sparse as sp
+
+import blocks
+
+
+# SPICE-like netlist front end. Elements are stamped straight into a sparse
+# Modified Nodal Analysis (MNA) matrix and solved with blocks.solve, which splits off
+# independent subcircuits before handing each block to the solver.
+#
+#   * comment
+#   R1 in out 1k            resistor
+#   V1 in 0 5               independent voltage source (adds a branch current unknown)
+#   I1 0 out 1m             independent current source, current flows n+ -> n- through it
+#   E1 out 0 in 0 10        voltage-controlled voltage source (adds a branch current unknown)
+#   C1 out 0 1u             capacitor (open circuit at DC)
+#   L1 a b 10m              inductor (short circuit at DC, adds a branch current unknown)
+#   V2 in 0 PULSE(0 5 1u 1n 1n 5u 10u)              pulse source for transient analysis (transient.py)
+#   V3 in 0 SIN(0 1 1k)                             sine source: offset, amplitude, frequency [, delay, damping]
+#   V4 in 0 DC 0 AC 1 0                             small-signal AC magnitude and phase (degrees) for ac.py
+#   D1 anode cathode IS=1e-14 N=1                   diode (nonlinear)
+#   Q1 c b e NPN IS=1e-16 BF=100 BR=1               bipolar transistor, NPN or PNP (nonlinear)
+#   .end
+#
+# Circuits with diodes or transistors are solved by Newton-Raphson iteration (newton.py).
+
+
+# CONSTANTS
+GROUND_NAMES = {"0", "gnd", "GND"}
+
+THERMAL_VOLTAGE = 0.025852      # kT/q at 300 K
+GMIN = 1e-12                    # Conductance across every junction, keeps off devices from floating nodes
+EXP_LIMIT = 80.0                # exp() argument beyond which the junction current is continued linearly
+
+SUFFIXES = {
+    "t": 1e12, "g": 1e9, "meg": 1e6, "k": 1e3,
+    "m": 1e-3, "u": 1e-6, "n": 1e-9, "p": 1e-12, "f": 1e-15,
+}
+
+WAVEFORM_PATTERN = re.compile(r"(PULSE|SIN)\s*\(([^)]*)\)", re.IGNORECASE)
+VALUE_PATTERN = re.compile(r"^([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)(meg|[tgkmunpf])?[a-z]*$", re.IGNORECASE)
+
+
+
+def parse_value(text: str) -> float:
+    """Parse a SPICE number such as '4.7k', '10meg', '1e-3' or '2.2uF'."""
+    match = VALUE_PATTERN.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid value: '{text}'")
+    number, suffix = match.groups()
+    return float(number) * SUFFIXES.get((suffix or "").lower(), 1.0)
+
+
+
+class Pulse:
+    """SPICE PULSE(v1 v2 delay rise fall width period) waveform."""
+
+    def __init__(self, v1, v2, delay=0.0, rise=0.0, fall=0.0, width=float("inf"), period=float("inf")):
+
+        self.v1, self.v2 = v1, v2
+        self.delay, self.rise, self.fall, self.width, self.period = delay, rise, fall, width, period
+
+
+    def __call__(self, t):
+        local = max(t - self.delay, 0.0)
+        if self.period != float("inf"):
+            local %= self.period
+        if t < self.delay:
+            return self.v1
+        if local < self.rise:
+            return self.v1 + (self.v2 - self.v1) * local / self.rise
+        local -= self.rise
+        if local < self.width:
+            return self.v2
+        local -= self.width
+        if local < self.fall:
+            return self.v2 + (self.v1 - self.v2) * local / self.fall
+        return self.v1
+
+
+    def breakpoints(self, stop: float) -> list:
+        """Corner times up to `stop`, where a time step should land exactly."""
+        corners = np.cumsum([self.delay, self.rise, self.width, self.fall])
+        points = []
+        start = 0.0
+        while start <= stop:
+            points.extend(start + corner for corner in corners if start + corner <= stop)
+            if self.period == float("inf") or self.period <= 0:
+                break
+            start += self.period
+        return points
+
+
+
+class Sine:
+    """SPICE SIN(offset amplitude frequency delay damping) waveform."""
+
+    def __init__(self, offset, amplitude, frequency, delay=0.0, damping=0.0):
+
+        self.offset, self.amplitude, self.frequency = offset, amplitude, frequency
+        self.delay, self.damping = delay, damping
+
+
+    def __call__(self, t):
+        if t < self.delay:
+            return self.offset
+        local = t - self.delay
+        return self.offset + self.amplitude * np.exp(-self.damping * local) * np.sin(2 * np.pi * self.frequency * local)
+
+
+    def breakpoints(self, stop: float) -> list:
+        return [self.delay] if 0 < self.delay <= stop else []
+
+
+
+WAVEFORMS = {"PULSE": Pulse, "SIN": Sine}
+
+
+
+def parse_waveform(text: str):
+    """Parse 'PULSE(...)' or 'SIN(...)' into a waveform, or return None if the text has neither."""
+    match = WAVEFORM_PATTERN.search(text)
+    if not match:
+        return None
+    name, arguments = match.groups()
+    values = [parse_value(field) for field in arguments.replace(",", " ").split()]
+    try:
+        return WAVEFORMS[name.upper()](*values)
+    except TypeError:
+        raise ValueError(f"Wrong number of {name.upper()} parameters: '{match.group(0)}'") from None
+
+
+
+class Element:
+    """
+    One netlist element. Subclasses define the stamp.
+
+    stamp(index) returns (rows, cols, vals, rhs_rows, rhs_vals) for the element, where index
+    maps node names to matrix rows (ground is -1 and is dropped). The positions of the
+    entries depend only on the nodes, so a value change can overwrite the old entries in place.
+    """
+
+    kind = None
+    has_branch = False
+    nonlinear = False
+    waveform = None         # Time-dependent value for transient analysis (sources only)
+    ac = None               # Complex small-signal phasor for AC analysis (sources only)
+
+    def __init__(self, name: str, nodes: tuple, value: float):
+
+        self.name = name
+        self.nodes = tuple(nodes)
+        self.value = value
+        self.branch = None  # Row/column of the branch current unknown, if any
+
+
+    def stamp(self, index):
+        raise NotImplementedError
+
+
+    def dynamic_stamp(self, index):
+        """(rows, cols, vals) of the element's entries in the C matrix of C dx/dt + G x = b."""
+        return self._entries([])
+
+
+    def stamp_derivative(self, index):
+        """d stamp / d value, in the layout of stamp(). Zero unless the value enters the DC system."""
+        return *self._entries([]), *self._rhs([])
+
+
+    def value_law(self, index):
+        """
+        How the stamp depends on the value: (coefficients, powers) over the stamp values followed by
+        the rhs values, each entry being coefficient * value ** power. Probed from stamp() itself, so
+        resistors come out as 1 / R, sources and gains as linear and structural +-1 entries as
+        constant. None if some entry follows another law or the value is 0.
+        """
+        nominal = self.value
+        if not nominal or self.nonlinear:
+            return None
+        probes = []
+        try:
+            for factor in (1.0, 2.0, 3.0):
+                self.value = factor * nominal
+                probes.append(np.concatenate(self.stamp(index)[2::2]))
+        finally:
+            self.value = nominal
+
+        base, doubled, tripled = probes
+        ratio = np.divide(doubled, base, out=np.ones_like(base), where=base != 0)
+        powers = np.round(np.log2(np.abs(ratio)))
+        coefficients = base / nominal ** powers
+        if not np.allclose(coefficients * (3 * nominal) ** powers, tripled, rtol=1e-12, atol=0):
+            return None
+        return coefficients, powers
+
+
+    def value_at(self, t: float) -> float:
+        return self.value if self.waveform is None else self.waveform(t)
+
+
+    @staticmethod
+    def _entries(entries):
+        """Split (row, col, val) triples into arrays, dropping anything that touches ground."""
+        kept = [(r, c, v) for r, c, v in entries if r >= 0 and c >= 0]
+        rows = np.array([r for r, _, _ in kept], dtype=np.int64)
+        cols = np.array([c for _, c, _ in kept], dtype=np.int64)
+        vals = np.array([v for _, _, v in kept], dtype=float)
+        return rows, cols, vals
+
+
+    @staticmethod
+    def _rhs(entries):
+        kept = [(r, v) for r, v in entries if r >= 0]
+        return np.array([r for r, _ in kept], dtype=np.int64), np.array([v for _, v in kept], dtype=float)
+
+
+    def __repr__(self):
+        return f"{self.name} {' '.join(self.nodes)} {self.value:g}"
+
+
+
+class Resistor(Element):
+
+    kind = "R"
+
+    def stamp(self, index):
+        if self.value == 0:
+            raise ValueError(f"{self.name}: resistance must be non-zero.")
+        a, b = index[self.nodes[0]], index[self.nodes[1]]
+        g = 1.0 / self.value
+        rows, cols, vals = self._entries([(a, a, g), (b, b, g), (a, b, -g), (b, a, -g)])
+        return rows, cols, vals, *self._rhs([])
+
+
+    def stamp_derivative(self, index):
+        rows, cols, vals, rhs_rows, rhs_vals = self.stamp(index)
+        return rows, cols, -vals / self.value, rhs_rows, rhs_vals  # d(1/R)/dR = -1/R^2
+
+
+
+class CurrentSource(Element):
+
+    kind = "I"
+
+    def rhs_unit(self, index):
+        """Right-hand side entries for a value of 1; the real ones scale linearly."""
+        a, b = index[self.nodes[0]], index[self.nodes[1]]
+        return self._rhs([(a, -1.0), (b, 1.0)])
+
+
+    def stamp(self, index):
+        rows, cols, vals = self._entries([])
+        rhs_rows, rhs_vals = self.rhs_unit(index)
+        return rows, cols, vals, rhs_rows, rhs_vals * self.value
+
+
+    def stamp_derivative(self, index):
+        return *self._entries([]), *self.rhs_unit(index)
+
+
+
+class VoltageSource(Element):
+
+    kind = "V"
+    has_branch = True
+
+    def rhs_unit(self, index):
+        """Right-hand side entries for a value of 1; the real ones scale linearly."""
+        return self._rhs([(self.branch, 1.0)])
+
+
+    def stamp(self, index):
+        a, b, k = index[self.nodes[0]], index[self.nodes[1]], self.branch
+        rows, cols, vals = self._entries([(a, k, 1.0), (b, k, -1.0), (k, a, 1.0), (k, b, -1.0)])
+        rhs_rows, rhs_vals = self.rhs_unit(index)
+        return rows, cols, vals, rhs_rows, rhs_vals * self.value
+
+
+    def stamp_derivative(self, index):
+        return *self._entries([]), *self.rhs_unit(index)
+
+
+
+class VCVS(Element):
+
+    kind = "E"
+    has_branch = True
+
+    def stamp(self, index):
+        a, b, c, d = (index[node] for node in self.nodes)
+        k, gain = self.branch, self.value
+        rows, cols, vals = self._entries([
+            (a, k, 1.0), (b, k, -1.0), (k, a, 1.0), (k, b, -1.0),
+            (k, c, -gain), (k, d, gain),
+        ])
+        return rows, cols, vals, *self._rhs([])
+
+
+    def stamp_derivative(self, index):
+        _, _, c, d = (index[node] for node in self.nodes)
+        return *self._entries([(self.branch, c, -1.0), (self.branch, d, 1.0)]), *self._rhs([])
+
+
+
+class Capacitor(Element):
+
+    kind = "C"
+
+    def stamp(self, index):
+        rows, cols, vals = self._entries([])
+        return rows, cols, vals, *self._rhs([])
+
+
+    def dynamic_stamp(self, index):
+        a, b = index[self.nodes[0]], index[self.nodes[1]]
+        c = self.value
+        return self._entries([(a, a, c), (b, b, c), (a, b, -c), (b, a, -c)])
+
+
+
+class Inductor(Element):
+    """Branch equation V(a) - V(b) - L di/dt = 0, so a short circuit at DC."""
+
+    kind = "L"
+    has_branch = True
+
+    def stamp(self, index):
+        a, b, k = index[self.nodes[0]], index[self.nodes[1]], self.branch
+        rows, cols, vals = self._entries([(a, k, 1.0), (b, k, -1.0), (k, a, 1.0), (k, b, -1.0)])
+        return rows, cols, vals, *self._rhs([])
+
+
+    def dynamic_stamp(self, index):
+        k = self.branch
+        return self._entries([(k, k, -self.value)])
+
+
+
+def junction_current(u, saturation, thermal):
+    """Shockley junction current and conductance, continued linearly past EXP_LIMIT to avoid overflow."""
+    x = u / thermal
+    e = np.exp(np.minimum(x, EXP_LIMIT))
+    current = saturation * (e * (1 + np.maximum(x - EXP_LIMIT, 0.0)) - 1) + GMIN * u
+    conductance = saturation * e / thermal + GMIN
+    return current, conductance
+
+
+def limit_junction(new, old, thermal, critical):
+    """SPICE pnjlim: keep Newton from jumping far up the exponential in a single step."""
+    new = np.array(new, dtype=float)
+    for i in range(len(new)):
+        if new[i] > critical[i] and abs(new[i] - old[i]) > 2 * thermal:
+            if old[i] > 0:
+                arg = 1 + (new[i] - old[i]) / thermal
+                new[i] = old[i] + thermal * np.log(arg) if arg > 0 else critical[i]
+            else:
+                new[i] = thermal * np.log(new[i] / thermal)
+    return new
+
+
+
+class Semiconductor(Element):
+    """
+    Nonlinear element described by junction voltages u = polarity * (D @ v), where v are its terminal
+    voltages, and terminal currents I = polarity * model(u). Nothing is stamped into the linear
+    system; the Newton solver stamps the linearization J v + I_eq every iteration.
+    """
+
+    nonlinear = True
+    parameters = {}
+    junction_map = None     # D: junctions x terminals
+
+    def __init__(self, name: str, nodes: tuple, value=None, polarity=1, **parameters):
+
+        unknown = set(parameters) - set(self.parameters)
+        if unknown:
+            raise ValueError(f"{name}: unknown parameter(s) {', '.join(sorted(unknown))}")
+        self.params = dict(self.parameters, **parameters)
+        if value is not None:
+            self.params["IS"] = value
+        super().__init__(name, nodes, self.params["IS"])
+        self.polarity = polarity
+
+
+    @classmethod
+    def from_fields(cls, name, nodes, fields) -> "Semiconductor":
+        """Build from the netlist fields after the nodes: an optional model keyword and KEY=value pairs."""
+        parameters, polarity = {}, 1
+        for field in fields:
+            if "=" in field:
+                key, value = field.split("=", 1)
+                parameters[key.upper()] = parse_value(value)
+            elif field.upper() in ("NPN", "PNP") and cls is BJT:
+                polarity = 1 if field.upper() == "NPN" else -1
+            else:
+                raise ValueError(f"{name}: unexpected field '{field}'")
+        return cls(name, nodes, polarity=polarity, **parameters)
+
+
+    @property
+    def value(self) -> float:
+        """The saturation current IS, so set_value() works like it does for linear elements."""
+        return self.params["IS"]
+
+
+    @value.setter
+    def value(self, value: float):
+        self.params["IS"] = value
+
+
+    def stamp(self, index):
+        rows, cols, vals = self._entries([])
+        return rows, cols, vals, *self._rhs([])
+
+
+    @property
+    def thermal(self) -> float:
+        return self.params.get("N", 1.0) * THERMAL_VOLTAGE
+
+
+    @property
+    def critical_voltage(self) -> np.ndarray:
+        """Junction voltage where the exponential gets steep, per junction."""
+        saturation = self.params["IS"]
+        return np.full(len(self.junction_map), self.thermal * np.log(self.thermal / (np.sqrt(2) * saturation)))
+
+
+    def junctions(self, v) -> np.ndarray:
+        return self.polarity * (self.junction_map @ v)
+
+
+    def model(self, u):
+        """Terminal currents (in polarity-normalized form) and their derivatives d model / d u."""
+        raise NotImplementedError
+
+
+    def currents(self, v) -> np.ndarray:
+        """Current flowing into each terminal at terminal voltages v."""
+        return self.polarity * self.model(self.junctions(v))[0]
+
+
+    def current_derivative(self, v) -> np.ndarray:
+        """d currents / d IS at terminal voltages v. The currents are linear in IS, so a difference is exact."""
+        saturation = self.params["IS"]
+        self.params["IS"] = 2 * saturation
+        try:
+            doubled = self.currents(v)
+        finally:
+            self.params["IS"] = saturation
+        return (doubled - self.currents(v)) / saturation
+
+
+    def linearize(self, v, previous=None):
+        """
+        Companion model at terminal voltages v, with the junction voltages limited against
+        `previous` if given. Returns (J, I_eq, u) with I(v') ~ J v' + I_eq, plus the limited junctions.
+        """
+        u = self.junctions(v)
+        if previous is not None:
+            u = limit_junction(u, previous, self.thermal, self.critical_voltage)
+        current, derivative = self.model(u)
+        jacobian = derivative @ self.junction_map
+        return jacobian, self.polarity * (current - derivative @ u), u
+
+
+
+class Diode(Semiconductor):
+
+    kind = "D"
+    parameters = {"IS": 1e-14, "N": 1.0}
+    junction_map = np.array([[1.0, -1.0]])     # u = V(anode) - V(cathode)
+
+    def model(self, u):
+        current, conductance = junction_current(u[0], self.params["IS"], self.thermal)
+        return np.array([current, -current]), np.array([[conductance], [-conductance]])
+
+
+
+class BJT(Semiconductor):
+    """Ebers-Moll transport model. Terminals (collector, base, emitter)."""
+
+    kind = "Q"
+    parameters = {"IS": 1e-16, "BF": 100.0, "BR": 1.0, "N": 1.0}
+    junction_map = np.array([[0.0, 1.0, -1.0],    # u_be = V(b) - V(e)
+                             [-1.0, 1.0, 0.0]])   # u_bc = V(b) - V(c)
+
+    def model(self, u):
+        saturation, bf, br = self.params["IS"], self.params["BF"], self.params["BR"]
+        forward, gf = junction_current(u[0], saturation, self.thermal)
+        reverse, gr = junction_current(u[1], saturation, self.thermal)
+
+        collector = forward - reverse - reverse / br
+        base = forward / bf + reverse / br
+        currents = np.array([collector, base, -collector - base])
+        derivative = np.array([
+            [gf, -gr - gr / br],
+            [gf / bf, gr / br],
+            [-gf - gf / bf, gr],
+        ])
+        return currents, derivative
+
+
+
+ELEMENT_TYPES = {
+    "R": (Resistor, 2), "V": (VoltageSource, 2), "I": (CurrentSource, 2), "E": (VCVS, 4),
+    "C": (Capacitor, 2), "L": (Inductor, 2), "D": (Diode, 2), "Q": (BJT, 3),
+}
+
+
+
+def parse_element(line: str) -> Element:
+    """Parse a single element line into an Element."""
+    fields = line.split()
+    kind = fields[0][0].upper()
+    if kind not in ELEMENT_TYPES:
+        raise ValueError(f"Unsupported element '{fields[0]}'")
+
+    cls, node_count = ELEMENT_TYPES[kind]
+    if cls.nonlinear:
+        if len(fields) < node_count + 1:
+            raise ValueError(f"'{fields[0]}' needs {node_count} nodes")
+        return cls.from_fields(fields[0], fields[1:node_count + 1], fields[node_count + 1:])
+    if len(fields) < node_count + 2:
+        raise ValueError(f"'{fields[0]}' needs {node_count} nodes and a value")
+
+    # SPICE allows "V1 a 0 DC 5", and sources may add a transient waveform: "V1 a 0 DC 0 SIN(0 1 1k)"
+    value_fields = [f for f in fields[node_count + 1:] if f.upper() != "DC"]
+    if cls not in (VoltageSource, CurrentSource):
+        return cls(fields[0], fields[1:node_count + 1], parse_value(value_fields[0]))
+
+    # ... and an AC specification: "AC magnitude [phase]"
+    ac = None
+    upper = [f.upper() for f in value_fields]
+    if "AC" in upper:
+        at = upper.index("AC")
+        spec = [f for f in value_fields[at + 1:at + 3] if VALUE_PATTERN.match(f)]
+        if not spec:
+            raise ValueError(f"'{fields[0]}' needs a magnitude after AC")
+        magnitude = parse_value(spec[0])
+        phase = np.radians(parse_value(spec[1])) if len(spec) > 1 else 0.0
+        ac = complex(magnitude * np.cos(phase), magnitude * np.sin(phase))
+        value_fields = value_fields[:at] + value_fields[at + 1 + len(spec):]
+
+    waveform = parse_waveform(" ".join(value_fields))
+    leading = WAVEFORM_PATTERN.search(" ".join(value_fields)).start() > 0 if waveform else True
+    dc_fields = [f for f in value_fields if VALUE_PATTERN.match(f)][:1]
+    if dc_fields and leading:
+        value = parse_value(dc_fields[0])
+    elif waveform is not None:
+        value = waveform(0.0)
+    elif ac is not None:
+        value = 0.0
+    else:
+        raise ValueError(f"'{fields[0]}' needs a value")
+
+    element = cls(fields[0], fields[1:node_count + 1], value)
+    element.waveform = waveform
+    element.ac = ac
+    return element
+
+
+
+class Circuit:
+    """
+    A collection of elements plus the MNA system they stamp into.
+
+    The stamped triplets are kept between solves. Changing an element value with
+    set_value() only re-stamps that element; adding or removing elements restamps everything.
+    """
+
+    def __init__(self, elements=()):
+
+        self.elements = {}
+        self._stamps = None     # Cached triplet arrays, rebuilt when the topology changes
+        self._slices = {}       # element name -> (matrix slice, rhs slice) into the cache
+        self.revision = 0       # Bumped by every change, so caches built on the circuit can tell they are stale
+        self.topology = 0       # Bumped when elements are added or removed
+        self._port_cache = None # Schur complements onto ports, see thevenin()
+
+        for element in elements:
+            self.add(element)
+
+
+    @classmethod
+    def from_netlist(cls, text: str) -> "Circuit":
+        """Build a circuit from netlist text."""
+        circuit = cls()
+        for number, raw in enumerate(text.splitlines(), start=1):
+            line = raw.split(";")[0].strip()
+            if not line or line.startswith("*"):
+                continue
+            if line.startswith("."):
+                if line.lower().startswith(".end"):
+                    break
+                continue  # Other dot-commands are not supported yet
+            try:
+                circuit.add(parse_element(line))
+            except ValueError as e:
+                raise ValueError(f"Netlist line {number}: {e}") from None
+        return circuit
+
+
+    @classmethod
+    def from_file(cls, path: str) -> "Circuit":
+        with open(path) as f:
+            return cls.from_netlist(f.read())
+
+
+    def add(self, element: Element):
+        if element.name in self.elements:
+            raise ValueError(f"Duplicate element name '{element.name}'")
+        self.elements[element.name] = element
+        self._stamps = None
+        self.revision += 1
+        self.topology += 1
+
+
+    def remove(self, name: str):
+        del self.elements[name]
+        self._stamps = None
+        self.revision += 1
+        self.topology += 1
+
+
+    def set_value(self, name: str, value: float):
+        """
+        Change one element's value and re-stamp only that element. A value the element rejects
+        (e.g. R = 0) raises ValueError and leaves the circuit unchanged.
+        """
+        element = self.elements[name]
+        if self._stamps is None:
+            self._stamp_all()
+
+        previous, element.value = element.value, value
+        try:
+            rows, cols, vals, rhs_rows, rhs_vals = element.stamp(self.node_index)
+        except ValueError:
+            element.value = previous
+            raise
+        self.revision += 1
+        matrix_slice, rhs_slice = self._slices[name]
+        self._stamps["vals"][matrix_slice] = vals
+        self._stamps["rhs_vals"][rhs_slice] = rhs_vals
+
+
+    def slices(self, name: str):
+        """(matrix slice, rhs slice) of an element's entries in the arrays returned by triplets()."""
+        if self._stamps is None:
+            self._stamp_all()
+        return self._slices[name]
+
+
+    def _number_unknowns(self):
+        """Assign matrix rows: nodes in order of first appearance, then branch currents."""
+        nodes = {}
+        for element in self.elements.values():
+            for node in element.nodes:
+                if node not in GROUND_NAMES and node not in nodes:
+                    nodes[node] = len(nodes)
+
+        branches = []
+        for element in self.elements.values():
+            if element.has_branch:
+                element.branch = len(nodes) + len(branches)
+                branches.append(element.name)
+
+        self.nodes = nodes
+        self.branches = branches
+        self.node_index = dict(nodes, **{name: -1 for name in GROUND_NAMES})
+
+
+    def _stamp_all(self):
+        self._number_unknowns()
+
+        parts = {"rows": [], "cols": [], "vals": [], "rhs_rows": [], "rhs_vals": []}
+        self._slices = {}
+        matrix_start = rhs_start = 0
+
+        for element in self.elements.values():
+            rows, cols, vals, rhs_rows, rhs_vals = element.stamp(self.node_index)
+            self._slices[element.name] = (
+                slice(matrix_start, matrix_start + len(vals)),
+                slice(rhs_start, rhs_start + len(rhs_vals)),
+            )
+            matrix_start += len(vals)
+            rhs_start += len(rhs_vals)
+            for key, array in zip(parts, (rows, cols, vals, rhs_rows, rhs_vals)):
+                parts[key].append(array)
+
+        self._stamps = {
+            key: np.concatenate(arrays) if arrays else np.empty(0, dtype=float if "vals" in key else np.int64)
+            for key, arrays in parts.items()
+        }
+
+
+    @property
+    def size(self) -> int:
+        if self._stamps is None:
+            self._stamp_all()
+        return len(self.nodes) + len(self.branches)
+
+
+    @property
+    def nonlinear(self) -> bool:
+        return any(element.nonlinear for element in self.elements.values())
+
+
+    def triplets(self):
+        """The linear part of the MNA system as unsummed (rows, cols, vals) plus b."""
+        if self._stamps is None:
+            self._stamp_all()
+
+        s = self._stamps
+        b = np.bincount(s["rhs_rows"], weights=s["rhs_vals"], minlength=self.size).astype(float)
+        return s["rows"], s["cols"], s["vals"], b
+
+
+    def rhs_entries(self):
+        """Unsummed (rows, vals) of b, the right-hand side entries behind triplets()."""
+        if self._stamps is None:
+            self._stamp_all()
+        return self._stamps["rhs_rows"], self._stamps["rhs_vals"]
+
+
+    def dynamic_triplets(self):
+        """(rows, cols, vals) of the C matrix (capacitances, inductances) in C dx/dt + G x = b."""
+        if self._stamps is None:
+            self._stamp_all()
+
+        parts = [element.dynamic_stamp(self.node_index) for element in self.elements.values()]
+        rows, cols, vals = (np.concatenate([part[i] for part in parts]) for i in range(3))
+        return rows, cols, vals
+
+
+    def assemble(self):
+        """Return the MNA system (A as CSR, b) for the current element values (linear elements only)."""
+        rows, cols, vals, b = self.triplets()
+        n = self.size
+        a = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()  # Duplicates are summed
+        return a, b
+
+
+    def augmented_matrix(self) -> list:
+        """Dense [A | b] rows in the list-of-lists layout the Calculator grid uses."""
+        a, b = self.assemble()
+        return np.column_stack([a.toarray(), b]).tolist()
+
+
+    def solve(self, reduce=False) -> dict:
+        """
+        Solve the DC operating point. Returns node voltages keyed by node name and
+        branch currents keyed as 'I(<element>)'. With reduce=True internal resistor-only nodes
+        are eliminated first (reduction.py) and reconstructed afterwards.
+        """
+        if reduce:
+            return self.reduced().solve()
+        if self.nonlinear:
+            import newton
+            return newton.operating_point(self).solution
+
+        a, b = self.assemble()
+        if self.size == 0:
+            return {}
+        x = blocks.solve(a, b)  # Separate subcircuits are solved independently
+        return self.unpack(x)
+
+
+    def reduced(self, keep=()):
+        """A ReducedCircuit with series/parallel, Y-delta and Kron reductions applied; nodes in `keep` stay."""
+        import reduction
+        return reduction.reduce(self, keep)
+
+
+    def thevenin(self, plus: str, minus="0"):
+        """(V_th, R_th) seen between two nodes, from a Schur complement cached across calls (ports.py)."""
+        if self._port_cache is None:
+            import ports
+            self._port_cache = ports.PortCache(self)
+        voltage, impedance = self._port_cache.model([(plus, minus)]).thevenin()
+        return float(voltage[0]), float(impedance[0, 0])
+
+
+    def symbolic(self, names=None, cancel=None):
+        """Closed-form solution with the values of `names` (default: all elements) as sympy symbols (symbolic.py)."""
+        import symbolic
+        return symbolic.symbolic_solve(self, names, cancel=cancel)
+
+
+    def sensitivities(self, output: str) -> dict:
+        """d output / d value of every element, e.g. circuit.sensitivities("out")["R1"] in volts per ohm."""
+        import sensitivity
+        return sensitivity.circuit_sensitivities(self, output).values
+
+
+    def unpack(self, x) -> dict:
+        """Map a solution vector back to node and branch names."""
+        result = {node: float(x[i]) for node, i in self.nodes.items()}
+        result.update({f"I({name})": float(x[len(self.nodes) + k]) for k, name in enumerate(self.branches)})
+        return result
@@ -0,0 +1,193 @@
+import numpy as np
+
+from iterative import ConvergenceError
+from sparse_solver import SparsePattern
+
+
+# Nonlinear DC operating point by Newton-Raphson.
+#
+# Every iteration stamps each diode/transistor as its companion model (conductances J plus an
+# equivalent current source) on top of the linear MNA stamps and solves for the next iterate.
+# The matrix positions never change, so the assembly map and fill-reducing ordering are built
+# once (SparsePattern) and each iteration only refactors numerically.
+#
+# Convergence aids, in the order they kick in:
+#   junction limiting   pnjlim on every junction voltage, as in SPICE
+#   damping             the Newton step is halved until the KCL residual goes down
+#   source stepping     all independent sources are ramped up from zero if plain Newton fails
+
+
+# CONSTANTS
+MAX_ITERATIONS = 100            # Newton iterations per solve (per source step when stepping)
+RELTOL = 1e-6                   # Relative change of the unknowns
+VNTOL = 1e-9                    # Absolute change of the unknowns (volts / amps)
+ABSTOL = 1e-12                  # Absolute KCL residual (amps)
+DAMPING_STEPS = 10              # Step halvings tried; if none lowers the residual the smallest is kept
+MIN_SOURCE_STEP = 1e-4          # Smallest source ramp increment before giving up
+
+
+
+class OperatingPoint:
+    """Result of operating_point(): the solution vector, its named values and how it was reached."""
+
+    def __init__(self, x, solution: dict, iterations: int, source_steps: int, factorizations: int):
+
+        self.x = x
+        self.solution = solution
+        self.iterations = iterations
+        self.source_steps = source_steps        # 0 if plain Newton converged
+        self.factorizations = factorizations    # Numeric refactorizations, the symbolic one excluded
+
+
+    def __repr__(self):
+        return (f"OperatingPoint(iterations={self.iterations}, source_steps={self.source_steps}, "
+                f"factorizations={self.factorizations})")
+
+
+
+class NewtonSolver:
+    """
+    Newton-Raphson on the MNA equations F(x) = A x + I(x) - b = 0 of one circuit.
+    Build it once per topology; element values may change between solves.
+    """
+
+    def __init__(self, circuit, ordering="amd"):
+
+        self.circuit = circuit
+        self.n = circuit.size
+        rows, cols, _, _ = circuit.triplets()
+        self._linear_count = len(rows)
+
+        # Terminal rows of every device, ground (-1) mapped to a trailing zero entry of x
+        self.devices = [element for element in circuit.elements.values() if element.nonlinear]
+        self.terminals = [np.array([circuit.node_index[node] for node in device.nodes]) for device in self.devices]
+
+        device_rows, device_cols, self._masks = [], [], []
+        for terminals in self.terminals:
+            r, c = np.meshgrid(terminals, terminals, indexing="ij")
+            mask = (r >= 0) & (c >= 0)
+            device_rows.append(r[mask])
+            device_cols.append(c[mask])
+            self._masks.append(mask)
+
+        self.pattern = SparsePattern(
+            np.concatenate([rows, *device_rows]), np.concatenate([cols, *device_cols]), (self.n, self.n), ordering)
+
+
+    def _extended(self, x):
+        return np.append(x, 0.0)  # Index -1 (ground) reads 0 V
+
+
+    def residual(self, x, scale=1.0) -> np.ndarray:
+        """KCL/KVL residual F(x) with the sources scaled by `scale`."""
+        rows, cols, vals, b = self.circuit.triplets()
+        f = np.bincount(rows, weights=vals * x[cols], minlength=self.n) - scale * b
+        v = self._extended(x)
+        for device, terminals in zip(self.devices, self.terminals):
+            grounded = terminals >= 0
+            np.add.at(f, terminals[grounded], device.currents(v[terminals])[grounded])
+        return f
+
+
+    def _linearize(self, x, scale, junctions):
+        """Matrix values in pattern order and the right-hand side of the companion-model system."""
+        _, _, vals, b = self.circuit.triplets()
+        rhs = scale * b
+        v = self._extended(x)
+        parts = [vals]
+        for k, (device, terminals, mask) in enumerate(zip(self.devices, self.terminals, self._masks)):
+            jacobian, equivalent, junctions[k] = device.linearize(v[terminals], junctions[k])
+            parts.append(jacobian[mask])
+            grounded = terminals >= 0
+            np.subtract.at(rhs, terminals[grounded], equivalent[grounded])
+        return np.concatenate(parts), rhs
+
+
+    def small_signal(self, x):
+        """Device conductances dI/dv at the operating point x, as (rows, cols, vals) triplets."""
+        v = self._extended(x)
+        rows, cols, vals = [], [], []
+        for device, terminals, mask in zip(self.devices, self.terminals, self._masks):
+            jacobian, _, _ = device.linearize(v[terminals])
+            r, c = np.meshgrid(terminals, terminals, indexing="ij")
+            rows.append(r[mask])
+            cols.append(c[mask])
+            vals.append(jacobian[mask])
+        if not rows:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+        return np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+
+    def solve(self, x0=None, scale=1.0, junctions=None, max_iterations=MAX_ITERATIONS):
+        """
+        Newton iterations from x0 with sources scaled by `scale`. Returns (x, iterations, junctions).
+        Raises ConvergenceError if the iteration limit is reached.
+        """
+        x = np.zeros(self.n) if x0 is None else np.array(x0, dtype=float)
+        junctions = list(junctions) if junctions is not None else [None] * len(self.devices)
+        norm = np.linalg.norm(self.residual(x, scale), np.inf)
+
+        for iteration in range(1, max_iterations + 1):
+            vals, rhs = self._linearize(x, scale, junctions)
+            step = self.pattern.factor(vals).solve(rhs) - x
+
+            # Damping: halve the step until the residual decreases
+            alpha = 1.0
+            for _ in range(DAMPING_STEPS):
+                candidate = x + alpha * step
+                candidate_norm = np.linalg.norm(self.residual(candidate, scale), np.inf)
+                if candidate_norm < norm or norm <= ABSTOL:
+                    break
+                alpha /= 2
+            taken = candidate - x       # The step actually applied, damped or not
+            x, norm = candidate, candidate_norm
+
+            small_step = np.all(np.abs(taken) <= RELTOL * np.abs(x) + VNTOL)
+            if small_step and (norm <= ABSTOL + RELTOL * np.abs(scale * self.circuit.triplets()[3]).max(initial=0.0)):
+                return x, iteration, junctions
+
+        raise ConvergenceError(f"Newton did not converge in {max_iterations} iterations (residual {norm:.3e}).")
+
+
+    def solve_with_source_stepping(self, x0=None):
+        """Ramp every independent source from 0 to full value, warm-starting each step. Returns (x, iterations, steps)."""
+        x = np.zeros(self.n) if x0 is None else np.array(x0, dtype=float)
+        junctions = None
+        scale, increment = 0.0, 0.1
+        iterations = steps = 0
+
+        while scale < 1.0:
+            target = min(1.0, scale + increment)
+            try:
+                x_next, used, junctions_next = self.solve(x, target, junctions)
+            except ConvergenceError:
+                increment /= 4
+                if increment < MIN_SOURCE_STEP:
+                    raise ConvergenceError(f"Source stepping stalled at {scale:.1%} of the source values.") from None
+                continue
+            x, junctions, scale = x_next, junctions_next, target
+            iterations += used
+            steps += 1
+            increment = min(2 * increment, 0.5)
+
+        return x, iterations, steps
+
+
+
+def operating_point(circuit, x0=None, newton=None) -> OperatingPoint:
+    """
+    DC operating point of a circuit with diodes and transistors. Plain Newton first, source
+    stepping if that fails. Raises ConvergenceError (a ValueError) if neither converges.
+    Pass the circuit's NewtonSolver as `newton` to reuse its assembly map and ordering.
+    """
+    if circuit.size == 0:
+        return OperatingPoint(np.zeros(0), {}, 0, 0, 0)
+
+    newton = newton or NewtonSolver(circuit)
+    try:
+        x, iterations, _ = newton.solve(x0)
+        steps = 0
+    except ConvergenceError:
+        x, iterations, steps = newton.solve_with_source_stepping()
+
+    return OperatingPoint(x, circuit.unpack(x), iterations, steps, newton.pattern.numeric_factorizations)
@@ -0,0 +1,151 @@
+import numpy as np
+
+import solver
+from tracelog import TraceLog, TraceLogLevel
+
+
+# Out-of-core LU for dense matrices that do not fit in memory.
+#
+# The matrix lives in an np.memmap (C order) and is factored in place, one block of columns (a
+# panel) at a time, right-looking like solver.lu_factor:
+#
+#   1. read the panel (rows k0:n) and factor it in memory with lu_factor_columns, so every pivot
+#      is chosen exactly as the in-memory Gaussian elimination would choose it
+#   2. apply the panel's row swaps to the rest of those rows on disk
+#   3. U12 = L11^-1 A12 for the panel's rows, then A22 -= L21 U12 one tile of rows at a time
+#
+# Only the panel, U12 and one tile are in memory at any time, each sized to a third of the memory
+# budget. The solves stream the factors back in blocks of rows. Progress goes to the TraceLog.
+
+
+# CONSTANTS
+DEFAULT_MEMORY = 256 << 20      # Bytes of matrix data held in memory at once
+WORKING_SHARES = 3              # Panel, U12 and trailing tile each get this fraction of the budget
+
+
+
+class OutOfCoreLU:
+    """
+    LU factors of a square matrix kept on disk. The matrix (an np.memmap, or any writable array)
+    is overwritten with the factors, in the layout lu_factor returns; piv is the row permutation.
+    """
+
+    def __init__(self, a, block_size=solver.DEFAULT_BLOCK_SIZE, memory=DEFAULT_MEMORY, eps=solver.PIVOT_EPSILON, log=None):
+
+        if a.ndim != 2 or a.shape[0] != a.shape[1] or a.shape[0] == 0:
+            raise ValueError("LU factorization needs a square matrix.")
+        self.lu = a
+        self.shape = a.shape
+        self.piv = np.arange(a.shape[0])
+        self.block_size = max(1, int(block_size))
+        self.budget = max(1, int(memory) // a.dtype.itemsize)   # In matrix entries
+        self.log = TraceLog() if log is None else log
+        self._factor(eps)
+
+
+    def _rows_per_tile(self, width: int, shares=WORKING_SHARES) -> int:
+        return max(1, self.budget // (shares * max(1, width)))
+
+
+    def panel_width(self) -> int:
+        """Columns per panel: as wide as a third of the budget allows, in whole lu_factor blocks."""
+        n = self.shape[0]
+        width = self._rows_per_tile(n) // self.block_size * self.block_size
+        return min(n, max(self.block_size, width))
+
+
+    def _swap_rows(self, rows, sources, skip):
+        """Rows `rows` take the contents of rows `sources`, outside the columns `skip`, tile by tile."""
+        n = self.shape[0]
+        width = self._rows_per_tile(len(rows))
+        for c0 in range(0, n, width):
+            c1 = min(c0 + width, n)
+            for columns in (slice(c0, min(c1, skip.start)), slice(max(c0, skip.stop), c1)):
+                if columns.start < columns.stop:
+                    self.lu[rows, columns] = self.lu[sources, columns]  # Fancy reads copy before writing
+
+
+    def _factor(self, eps):
+        lu, n = self.lu, self.shape[0]
+        width = self.panel_width()
+        self.log(TraceLogLevel.LOG_INFO, "Out-of-core LU: %d x %d matrix, panels of %d columns, %.0f MB in memory",
+                 n, n, width, self.budget * lu.dtype.itemsize / 2 ** 20)
+
+        for k0 in range(0, n, width):
+            k1 = min(k0 + width, n)
+
+            # Panel, factored in memory with the same pivot choices as lu_factor
+            panel = np.array(lu[k0:, k0:k1])
+            local = solver.lu_factor_columns(panel, block_size=self.block_size, eps=eps)
+            lu[k0:, k0:k1] = panel
+
+            moved = np.flatnonzero(local != np.arange(len(local)))
+            if len(moved):
+                self._swap_rows(k0 + moved, k0 + local[moved], slice(k0, k1))
+                self.piv[k0:] = self.piv[k0:][local]
+
+            if k1 < n:
+                # U12 = L11^-1 A12, then A22 -= L21 U12 a tile of rows at a time
+                upper = np.array(lu[k0:k1, k1:])
+                for k in range(k1 - k0 - 1):
+                    upper[k + 1:] -= np.outer(panel[k + 1:k1 - k0, k], upper[k])
+                lu[k0:k1, k1:] = upper
+
+                lower = panel[k1 - k0:]
+                rows = self._rows_per_tile(n - k1)
+                for r0 in range(k1, n, rows):
+                    r1 = min(r0 + rows, n)
+                    tile = np.array(lu[r0:r1, k1:])
+                    tile -= lower[r0 - k1:r1 - k1] @ upper
+                    lu[r0:r1, k1:] = tile
+
+            # Work left is ~ (n - k1)^3
+            self.log(TraceLogLevel.LOG_INFO, "Out-of-core LU: %d/%d columns factored (%.0f%% of the work)",
+                     k1, n, 100.0 * (1.0 - ((n - k1) / n) ** 3))
+
+        if hasattr(lu, "flush"):
+            lu.flush()
+
+
+    def solve(self, b) -> np.ndarray:
+        """
+        Solve A x = b, streaming the factors from disk one block of rows at a time (twice: forward,
+        then backward). b may be a vector or an n x k block; x is in the original unknown order.
+        """
+        lu, n = self.lu, self.shape[0]
+        b = np.asarray(b)
+        if b.shape[0] != n:
+            raise ValueError(f"Expected {n} right-hand side values, got {b.shape[0]}.")
+        x = np.array(b[self.piv], dtype=np.result_type(lu.dtype, b.dtype))
+        rows = self._rows_per_tile(n, shares=1)
+
+        for r0 in range(0, n, rows):
+            r1 = min(r0 + rows, n)
+            block = np.array(lu[r0:r1, :r1])
+            x[r0:r1] -= block[:, :r0] @ x[:r0]
+            x[r0:r1] = solver.forward_substitution(block[:, r0:], x[r0:r1])
+        self.log(TraceLogLevel.LOG_INFO, "Out-of-core LU: forward substitution done")
+
+        for r1 in range(n, 0, -rows):
+            r0 = max(0, r1 - rows)
+            block = np.array(lu[r0:r1, r0:])
+            x[r0:r1] -= block[:, r1 - r0:] @ x[r1:]
+            x[r0:r1] = solver.backward_substitution(block[:, :r1 - r0], x[r0:r1])
+        self.log(TraceLogLevel.LOG_INFO, "Out-of-core LU: back substitution done")
+        return x
+
+
+
+def create(path, n: int, dtype=float) -> np.memmap:
+    """A new n x n memory-mapped matrix file to fill in (row by row, or in blocks of rows)."""
+    return np.memmap(path, dtype=dtype, mode="w+", shape=(n, n))
+
+
+def open_matrix(path, n: int, dtype=float) -> np.memmap:
+    """An existing n x n matrix file, mapped read-write so it can be factored in place."""
+    return np.memmap(path, dtype=dtype, mode="r+", shape=(n, n))
+
+
+def solve(a, b, block_size=solver.DEFAULT_BLOCK_SIZE, memory=DEFAULT_MEMORY, log=None) -> np.ndarray:
+    """Factor the memory-mapped matrix a in place and solve A x = b. a holds the LU factors afterwards."""
+    return OutOfCoreLU(a, block_size=block_size, memory=memory, log=log).solve(b)
@@ -0,0 +1,134 @@
+import threading
+
+import numpy as np
+
+import solver
+
+
+# Background elimination that runs while the matrix is being typed.
+#
+# Rows are factored in order with row-wise Doolittle LU: row i only needs rows 0..i-1, so a row is
+# eliminated as soon as it and every row above it are complete. Editing row r only invalidates
+# rows r..n-1. There is no row pivoting (later rows are not known yet), so each row is checked
+# for tiny pivots and large multipliers; if that happens the pipeline declines and the caller
+# falls back to the regular partially pivoted solve. Growth can still compound over many rows
+# within those limits, so callers check the backward error of the solution they get and fall
+# back the same way when it is too large.
+
+
+# CONSTANTS
+MULTIPLIER_LIMIT = 10.0         # |l_ik| above this means elimination without pivoting is unsafe
+BACKWARD_ERROR_LIMIT = 1e-12    # Pivoted LU reaches ~1e-16; above this the unpivoted factors are not trusted
+WAIT_TIMEOUT = 0.5              # Seconds solve() waits for the last rows to finish
+
+
+
+class EliminationPipeline:
+
+    def __init__(self, n: int):
+
+        self.n = n
+        self.a = np.zeros((n, n))
+        self.lu = np.zeros((n, n))
+        self.ready = np.zeros(n, dtype=bool)    # Row i has valid input
+        self.done = 0                           # Rows 0..done-1 are factored
+        self.unstable_row = None                # First row that failed the pivot checks
+        self.generation = 0                     # Bumped on every edit so stale work is discarded
+
+        self._condition = threading.Condition()
+        self._running = True
+        self._worker = threading.Thread(target=self._run, name="EliminationPipeline", daemon=True)
+        self._worker.start()
+
+
+    def submit_row(self, i: int, values):
+        """Row i has been fully entered (or changed). Rows i.. will be (re)factored."""
+        with self._condition:
+            self.a[i] = values
+            self.ready[i] = True
+            self._invalidate_from(i)
+
+
+    def invalidate_row(self, i: int):
+        """Row i no longer holds valid numbers."""
+        with self._condition:
+            self.ready[i] = False
+            self._invalidate_from(i)
+
+
+    def _invalidate_from(self, i: int):
+        self.generation += 1
+        self.done = min(self.done, i)
+        if self.unstable_row is not None and self.unstable_row >= i:
+            self.unstable_row = None
+        self._condition.notify_all()
+
+
+    def _run(self):
+
+        while True:
+            with self._condition:
+                while self._running and (self.done >= self.n or not self.ready[self.done] or self.unstable_row is not None):
+                    self._condition.wait()
+                if not self._running:
+                    return
+                i, generation = self.done, self.generation
+                row = self.a[i].copy()
+                upper = self.lu[:i]  # Rows above i are final while the generation is unchanged
+
+            stable = self._eliminate_row(row, upper, i)
+
+            with self._condition:
+                if generation != self.generation:
+                    continue  # An edit arrived meanwhile, redo from wherever it points
+                self.lu[i] = row
+                if stable:
+                    self.done = i + 1
+                else:
+                    self.unstable_row = i
+                self._condition.notify_all()
+
+
+    @staticmethod
+    def _eliminate_row(row, upper, i) -> bool:
+        """Turn row i of A into row i of L\\U in place. Returns False if the pivot checks fail."""
+        for k in range(i):
+            multiplier = row[k] / upper[k, k]
+            row[k] = multiplier
+            row[k + 1:] -= multiplier * upper[k, k + 1:]
+            if abs(multiplier) > MULTIPLIER_LIMIT:
+                return False
+        scale = np.abs(row[i:]).max(initial=0.0)
+        return abs(row[i]) > max(solver.PIVOT_EPSILON, scale * 1e-10)
+
+
+    def factorization(self, a, timeout=WAIT_TIMEOUT):
+        """
+        Return an LUFactorization of `a` if the pipeline has (or within `timeout` gets) one for
+        exactly this matrix, else None.
+        """
+        a = np.asarray(a, dtype=float)
+        with self._condition:
+            if a.shape != self.a.shape or not np.array_equal(a, self.a) or not self.ready.all():
+                return None
+            self._condition.wait_for(lambda: self.done == self.n or self.unstable_row is not None, timeout)
+            if self.done != self.n:
+                return None
+            return solver.LUFactorization.from_factors(self.lu.copy(), np.arange(self.n))
+
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        self._worker.join()
+
+
+
+def backward_error(a, x, b) -> float:
+    """Normwise backward error ||b - A x|| / (||A|| ||x|| + ||b||) of a solution, in the inf-norm."""
+    a = np.asarray(a, dtype=float)
+    x = np.asarray(x, dtype=float)
+    b = np.asarray(b, dtype=float)
+    residual = np.linalg.norm(b - a @ x, np.inf)
+    return float(residual / (np.linalg.norm(a, np.inf) * np.linalg.norm(x, np.inf) + np.linalg.norm(b, np.inf) or 1.0))
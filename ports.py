@@ -0,0 +1,225 @@
+import numpy as np
+import scipy.sparse as sp
+
+import solver
+from sparse_solver import SPARSE_MIN_SIZE
+
+
+# Thevenin/Norton equivalents and loaded solutions at selected ports, through the Schur complement.
+#
+# Split the MNA unknowns into the port nodes P and everything else I (the reduced region):
+#
+#   S = A_PP - A_PI A_II^-1 A_IP        d = b_P - A_PI A_II^-1 b_I
+#
+# S v_P = d + i is then the whole circuit as seen from the port nodes, i being the currents fed
+# into them from outside. A_II is factored once; S and d are cached per set of ports, so every
+# further query (open-circuit voltages, port impedances, a new load) only touches p x p matrices.
+#
+# Cached models check the circuit's revision counter. After a change, matrix entries of the reduced
+# region that changed force a refactorization, source values inside it only a new d, and elements
+# between port nodes alone just a re-read of A_PP and b_P.
+
+
+# CONSTANTS
+GROUND_INDEX = -1
+
+
+
+class PortModel:
+    """The Schur complement of one circuit onto the nodes of a list of ports (plus, minus)."""
+
+    def __init__(self, circuit, ports):
+
+        self.circuit = circuit
+        self.ports = [tuple(port) for port in ports]
+        self.refactorizations = 0
+        self.rhs_updates = 0
+        self._build()
+
+
+    def _build(self):
+        circuit = self.circuit
+        if circuit.nonlinear:
+            raise ValueError("Port models need a linear circuit; diodes and transistors have no Thevenin equivalent.")
+        n = circuit.size    # Stamps the circuit if needed, which numbers the nodes
+        index = circuit.node_index
+
+        missing = [node for port in self.ports for node in port if node not in index]
+        if missing:
+            raise ValueError(f"Unknown port node(s): {', '.join(missing)}")
+
+        # Port node unknowns (ground excluded) and the incidence of the ports on them
+        self.nodes = list(dict.fromkeys(node for port in self.ports for node in port if index[node] != GROUND_INDEX))
+        self.incidence = np.zeros((len(self.nodes), len(self.ports)))
+        for k, (plus, minus) in enumerate(self.ports):
+            if plus in self.nodes:
+                self.incidence[self.nodes.index(plus), k] += 1.0
+            if minus in self.nodes:
+                self.incidence[self.nodes.index(minus), k] -= 1.0
+
+        self.p_index = np.array([index[node] for node in self.nodes], dtype=np.int64)
+        inside = np.ones(n, dtype=bool)
+        inside[self.p_index] = False
+        self.i_index = np.flatnonzero(inside)
+
+        rows, cols, vals, b = circuit.triplets()
+        self._mask = inside[rows] | inside[cols]            # Entries in the reduced region, the rest is A_PP
+        self._vals = vals[self._mask].copy()
+        self._topology = circuit.topology
+        position = np.full(n, -1)
+        position[self.p_index] = np.arange(len(self.p_index))
+        self._outside = np.flatnonzero(~self._mask)
+        self._outside_at = (position[rows[self._outside]], position[cols[self._outside]])
+
+        a = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+        a_ii = a[self.i_index][:, self.i_index]
+        self._a_pi = a[self.p_index][:, self.i_index]
+
+        if len(self.i_index):
+            self._factors = solver.factorize(a_ii if len(self.i_index) >= SPARSE_MIN_SIZE else a_ii.toarray())
+            coupling = self._factors.solve(self._a_pi.T.toarray()) if len(self.p_index) else np.zeros((len(self.i_index), 0))
+            self._correction = self._a_pi @ coupling        # A_PI A_II^-1 A_IP
+        else:
+            self._factors = None
+            self._correction = np.zeros((len(self.p_index), len(self.p_index)))
+        self.refactorizations += 1
+        self._update_injection(b)
+        self._update_ports(vals, b)
+
+
+    def _update_injection(self, b):
+        self._b_inside = b[self.i_index].copy()
+        if self._factors is None:
+            self._injection_inside = np.zeros(len(self.p_index))
+        else:
+            self._injection_inside = self._a_pi @ self._factors.solve(self._b_inside)   # A_PI A_II^-1 b_I
+
+
+    def _update_ports(self, vals, b):
+        """A_PP and b_P, which are cheap and never worth invalidating anything for."""
+        self._a_pp = np.zeros((len(self.p_index), len(self.p_index)))
+        np.add.at(self._a_pp, self._outside_at, vals[self._outside])
+        self._b_p = b[self.p_index]
+        self._revision = self.circuit.revision
+
+
+    def refresh(self):
+        """Bring the cached pieces up to date with the circuit, doing only the work its changes need."""
+        circuit = self.circuit
+        if circuit.revision == self._revision:
+            return
+        if circuit.topology != self._topology:
+            self._build()
+            return
+
+        _, _, vals, b = circuit.triplets()
+        if not np.array_equal(vals[self._mask], self._vals):
+            self._build()
+            return
+        if not np.array_equal(b[self.i_index], self._b_inside):
+            self.rhs_updates += 1
+            self._update_injection(b)
+        self._update_ports(vals, b)
+
+
+    @property
+    def schur(self) -> np.ndarray:
+        """S = A_PP - A_PI A_II^-1 A_IP on the port nodes."""
+        self.refresh()
+        return self._a_pp - self._correction
+
+
+    @property
+    def injection(self) -> np.ndarray:
+        """d = b_P - A_PI A_II^-1 b_I, the Norton current injected into each port node."""
+        self.refresh()
+        return self._b_p - self._injection_inside
+
+
+    def _node_solve(self, extra_admittance=None):
+        s, d = self.schur, self.injection
+        if extra_admittance is not None:
+            s = s + self.incidence @ extra_admittance @ self.incidence.T
+        try:
+            return np.linalg.solve(s, d), s, d
+        except np.linalg.LinAlgError:
+            raise solver.SingularMatrixError("Port nodes float: no path to ground through the circuit.") from None
+
+
+    def thevenin(self):
+        """(open-circuit port voltages, port impedance matrix Z) with u = V_oc + Z i."""
+        v, s, _ = self._node_solve()
+        z = self.incidence.T @ np.linalg.solve(s, self.incidence)
+        return self.incidence.T @ v, z
+
+
+    def norton(self):
+        """(short-circuit port currents, port admittance matrix Y) with i = Y u - I_sc."""
+        v_oc, z = self.thevenin()
+        try:
+            y = np.linalg.inv(z)
+        except np.linalg.LinAlgError:
+            raise solver.SingularMatrixError("Port impedance is singular: some port has no Norton equivalent.") from None
+        return y @ v_oc, y
+
+
+    def load(self, loads) -> "LoadResult":
+        """
+        Port voltages and load currents with loads attached. `loads` is one resistance per port
+        (None or inf for open) or a ports x ports admittance matrix.
+        """
+        loads = np.asarray([np.inf if r is None else r for r in loads] if np.ndim(loads) == 1 else loads, dtype=float)
+        admittance = np.diag(1.0 / loads) if loads.ndim == 1 else loads
+        if admittance.shape != (len(self.ports), len(self.ports)):
+            raise ValueError(f"Expected a load for each of the {len(self.ports)} port(s).")
+        v, _, _ = self._node_solve(admittance)
+        u = self.incidence.T @ v
+        return LoadResult(self.ports, u, admittance @ u, dict(zip(self.nodes, v.tolist())))
+
+
+
+class LoadResult:
+
+    def __init__(self, ports, voltages, currents, nodes: dict):
+
+        self.ports = ports
+        self.voltages = voltages    # Across each port, plus minus minus
+        self.currents = currents    # Into each load, from plus to minus
+        self.nodes = nodes          # Voltages of the port nodes
+
+
+    @property
+    def power(self) -> np.ndarray:
+        return self.voltages * self.currents
+
+
+    def __repr__(self):
+        return f"LoadResult(voltages={self.voltages}, currents={self.currents})"
+
+
+
+class PortCache:
+    """Port models of one circuit, keyed by their ports and kept up to date on lookup."""
+
+    def __init__(self, circuit):
+
+        self.circuit = circuit
+        self._models = {}
+        self.hits = 0
+        self.misses = 0
+
+
+    def model(self, ports) -> PortModel:
+        key = tuple(tuple(port) for port in ports)
+        model = self._models.get(key)
+        if model is None:
+            self.misses += 1
+            model = self._models[key] = PortModel(self.circuit, key)
+        else:
+            self.hits += 1
+            model.refresh()
+        return model
+
+
+    def clear(self):
+        self._models.clear()
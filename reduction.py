@@ -0,0 +1,196 @@
+import copy
+import heapq
+
+import numpy as np
+import scipy.sparse as sp
+
+import netlist
+from sparse_solver import SparseLU
+
+
+# Topological reduction of the resistive part of a circuit before it is stamped.
+#
+# Resistors form a weighted graph (edge weight = conductance). A node that touches nothing but
+# resistors and is not an output can be eliminated by the star-mesh transform: its neighbours
+# i, j get a new conductance g_i g_j / sum(g) between them, added in parallel to any existing one.
+# That single rule covers the classic reductions by degree:
+#
+#   1   dangling resistor, removed
+#   2   series resistors merged
+#   3   Y-delta transform
+#   4+  Kron elimination, only while it does not add edges (fill-in)
+#
+# Nodes are eliminated smallest degree first. Each elimination keeps the weights it used, since
+# the eliminated voltage is their weighted average of the neighbours' voltages. Together they form
+# a triangular system that reconstructs every node of the original circuit after the reduced solve.
+
+
+# CONSTANTS
+GROUND = "0"
+REDUCTION_NAMES = {1: "dangling", 2: "series", 3: "Y-delta"}     # Degree -> name; larger degrees are "Kron"
+
+
+
+class Elimination:
+    """One eliminated node: its voltage is sum(g_k v_k) / total over the recorded neighbours."""
+
+    def __init__(self, node: str, neighbours: list, total: float):
+
+        self.node = node
+        self.neighbours = neighbours    # (node, conductance) pairs at the time of elimination
+        self.total = total
+
+
+
+class ReducedCircuit:
+    """The reduced circuit plus what is needed to map its solution back to the original nodes."""
+
+    def __init__(self, original, circuit, eliminations: list, counts: dict):
+
+        self.original = original
+        self.circuit = circuit
+        self.eliminations = eliminations
+        self.counts = counts            # Reduction name -> number applied, "parallel" included
+        self._factors = self._coupling = self._kept = None
+
+
+    def _reconstruction(self):
+        """
+        The eliminations as one sparse system (I - W) v = K u, with v the eliminated voltages in
+        elimination order and u the kept ones. A node only depends on nodes eliminated after it,
+        so I - W is upper triangular and its factorization has no fill. Built on first use.
+        """
+        if self._factors is None:
+            position = {elimination.node: i for i, elimination in enumerate(self.eliminations)}
+            self._kept = list(self.circuit.nodes)
+            kept = {node: j for j, node in enumerate(self._kept)}
+
+            rows, cols, vals, k_rows, k_cols, k_vals = [], [], [], [], [], []
+            for i, elimination in enumerate(self.eliminations):
+                rows.append(i), cols.append(i), vals.append(1.0)
+                for node, g in elimination.neighbours:
+                    if node in position:
+                        rows.append(i), cols.append(position[node]), vals.append(-g / elimination.total)
+                    elif node in kept:  # Ground contributes 0 V
+                        k_rows.append(i), k_cols.append(kept[node]), k_vals.append(g / elimination.total)
+
+            m = len(self.eliminations)
+            self._factors = SparseLU(sp.csc_matrix((vals, (rows, cols)), shape=(m, m)), ordering="natural")
+            self._coupling = sp.csr_matrix((k_vals, (k_rows, k_cols)), shape=(m, len(self._kept)))
+        return self._factors, self._coupling
+
+
+    def expand(self, solution: dict) -> dict:
+        """Add the voltages of the eliminated nodes to a solution of the reduced circuit."""
+        full = dict(solution)
+        if not self.eliminations:
+            return full
+        factors, coupling = self._reconstruction()
+        voltages = factors.solve(coupling @ np.array([solution[node] for node in self._kept]))
+        full.update(zip((elimination.node for elimination in self.eliminations), voltages.tolist()))
+        return full
+
+
+    def solve(self) -> dict:
+        """Solve the reduced circuit and reconstruct every node voltage of the original one."""
+        return self.expand(self.circuit.solve())
+
+
+    def summary(self) -> str:
+        before, after = self.original.size, self.circuit.size
+        applied = ", ".join(f"{count} {name}" for name, count in self.counts.items() if count) or "nothing to reduce"
+        return f"Reduced {before} unknowns to {after} ({applied})"
+
+
+    def __repr__(self):
+        return f"ReducedCircuit(unknowns {self.original.size} -> {self.circuit.size}, eliminated={len(self.eliminations)})"
+
+
+
+def _ground(node: str) -> str:
+    return GROUND if node in netlist.GROUND_NAMES else node
+
+
+def _connect(adjacency, a, b, g, counts):
+    if b in adjacency[a]:
+        counts["parallel"] += 1
+    adjacency[a][b] = adjacency[a].get(b, 0.0) + g
+    adjacency[b][a] = adjacency[b].get(a, 0.0) + g
+
+
+def _can_eliminate(adjacency, node) -> bool:
+    neighbours = adjacency[node]
+    degree = len(neighbours)
+    if degree == 2:
+        return sum(neighbours.values()) != 0
+    if degree == 0 or sum(neighbours.values()) == 0:
+        return False
+    if degree == 1:
+        # A resistor floating on its own: the original system is singular, leave it that way
+        (other,) = neighbours
+        return len(adjacency[other]) > 1
+    if degree > 3:
+        fill = sum(1 for i, a in enumerate(neighbours) for b in list(neighbours)[i + 1:] if b not in adjacency[a])
+        return fill <= degree
+    return True
+
+
+def reduce(circuit, keep=()) -> ReducedCircuit:
+    """
+    Eliminate internal resistor-only nodes of a circuit. Nodes in `keep`, ground and every node
+    touched by a non-resistor element stay. Returns a ReducedCircuit whose solve() gives the
+    voltages of all original nodes (branch currents of the kept elements are unchanged).
+    """
+    counts = {"parallel": 0, **{name: 0 for name in REDUCTION_NAMES.values()}, "Kron": 0}
+    adjacency = {}
+    kept_elements = []
+    protected = {GROUND, *(_ground(node) for node in keep)}
+
+    for element in circuit.elements.values():
+        if isinstance(element, netlist.Resistor):
+            if element.value == 0:
+                raise ValueError(f"{element.name}: resistance must be non-zero.")
+            a, b = (_ground(node) for node in element.nodes)
+            adjacency.setdefault(a, {})
+            adjacency.setdefault(b, {})
+            if a != b:
+                _connect(adjacency, a, b, 1.0 / element.value, counts)
+        else:
+            kept_elements.append(copy.copy(element))  # The reduced circuit renumbers branches
+            protected.update(_ground(node) for node in element.nodes)
+
+    # Smallest degree first; entries go stale when a degree changes and are skipped then
+    heap = [(len(neighbours), node) for node, neighbours in adjacency.items() if node not in protected]
+    heapq.heapify(heap)
+    eliminated, eliminations = set(), []
+
+    while heap:
+        degree, node = heapq.heappop(heap)
+        if node in eliminated or degree != len(adjacency[node]) or not _can_eliminate(adjacency, node):
+            continue
+
+        items = list(adjacency.pop(node).items())
+        total = sum(g for _, g in items)
+        eliminations.append(Elimination(node, items, total))
+        eliminated.add(node)
+        counts[REDUCTION_NAMES.get(degree, "Kron")] += 1
+
+        for a, _ in items:
+            del adjacency[a][node]
+        for i, (a, ga) in enumerate(items):
+            for b, gb in items[i + 1:]:
+                _connect(adjacency, a, b, ga * gb / total, counts)
+        for a, _ in items:
+            if a not in protected:
+                heapq.heappush(heap, (len(adjacency[a]), a))
+
+    reduced = netlist.Circuit(kept_elements)
+    seen = set()
+    for a, neighbours in adjacency.items():
+        for b, g in neighbours.items():
+            if (b, a) in seen or g == 0:
+                continue
+            seen.add((a, b))
+            reduced.add(netlist.Resistor(f"R<{a},{b}>", (a, b), 1.0 / g))
+
+    return ReducedCircuit(circuit, reduced, eliminations, counts)
@@ -0,0 +1,156 @@
+import numpy as np
+import scipy.sparse as sp
+
+import solver
+from sparse_solver import SPARSE_MIN_SIZE
+
+
+# Adjoint sensitivity analysis.
+#
+# For A x = b and an output y = x[k], solve the adjoint system A^T lam = e_k once. Then for any
+# parameter p
+#
+#   dy/dp = lam . (db/dp - dA/dp x)
+#
+# so the sensitivities to every matrix entry, every source and every element value come from
+# one transposed solve with the factors that already solved A x = b, instead of one re-solve
+# per parameter. For nonlinear circuits A is the Newton Jacobian at the operating point.
+
+
+# CONSTANTS
+REPORT_SIZE = 12                # Unknowns listed in the solution report; larger systems use the API
+REPORT_ENTRIES = 3              # Most influential entries shown per unknown
+
+
+
+class MatrixSensitivities:
+    """
+    Sensitivities of selected unknowns to every entry of A and b.
+
+        d x[k] / d a[i][j] = -lam_k[i] x[j]       d x[k] / d b[i] = lam_k[i]
+    """
+
+    def __init__(self, x, adjoints, outputs):
+
+        self.x = x
+        self.adjoints = adjoints    # One row lam_k per output
+        self.outputs = outputs
+
+
+    def wrt_matrix(self, k) -> np.ndarray:
+        """n x n array of d x[k] / d a[i][j]."""
+        return -np.outer(self.adjoints[self.outputs.index(k)], self.x)
+
+
+    def wrt_rhs(self, k) -> np.ndarray:
+        """d x[k] / d b[i]."""
+        return self.adjoints[self.outputs.index(k)].copy()
+
+
+    def largest(self, k, count=REPORT_ENTRIES) -> list:
+        """The `count` entries of [A | b] that x[k] is most sensitive to, as (label, derivative)."""
+        matrix, rhs = self.wrt_matrix(k), self.wrt_rhs(k)
+        n = len(rhs)
+        combined = np.column_stack([matrix, rhs]).ravel()
+        order = np.argsort(-np.abs(combined), kind="stable")[:count]
+        return [(f"a[{i // (n + 1)}][{i % (n + 1)}]" if i % (n + 1) < n else f"b[{i // (n + 1)}]", float(combined[i]))
+                for i in order]
+
+
+    def report(self) -> str:
+        lines = ["Sensitivities (largest d x / d entry):"]
+        for k in self.outputs:
+            entries = ", ".join(f"{label} {value:+.3g}" for label, value in self.largest(k))
+            lines.append(f"x[{k}]: {entries}")
+        return "\n".join(lines)
+
+
+
+def matrix_sensitivities(x, factorization, outputs=None) -> MatrixSensitivities:
+    """
+    Sensitivities of the unknowns in `outputs` (default: all) of A x = b, given the solution x and
+    the factorization that produced it. Costs one transposed solve per output, no refactorization.
+    """
+    x = np.asarray(x, dtype=float)
+    n = len(x)
+    outputs = list(range(n)) if outputs is None else list(outputs)
+    adjoints = np.empty((len(outputs), n))
+    for row, k in enumerate(outputs):
+        unit = np.zeros(n)
+        unit[k] = 1.0
+        adjoints[row] = factorization.solve_transpose(unit)
+    return MatrixSensitivities(x, adjoints, outputs)
+
+
+
+class CircuitSensitivities:
+
+    def __init__(self, output: str, value: float, values: dict, nominal: dict):
+
+        self.output = output
+        self.value = value          # The output itself at the operating point
+        self.values = values        # element name -> d output / d element value
+        self.nominal = nominal      # element name -> element value
+
+
+    def normalized(self) -> dict:
+        """Relative sensitivities (dy/y) / (dp/p): the % change of the output per % change of each value."""
+        if self.value == 0:
+            return {name: float("nan") for name in self.values}
+        return {name: derivative * self.nominal[name] / self.value for name, derivative in self.values.items()}
+
+
+    def report(self) -> str:
+        lines = [f"Sensitivities of {self.output} = {self.value:.6g}:"]
+        normalized = self.normalized()
+        for name in sorted(self.values, key=lambda name: -abs(normalized[name]) if np.isfinite(normalized[name]) else 0):
+            lines.append(f"{name}: {self.values[name]:+.4g} per unit, {normalized[name]:+.3f} normalized")
+        return "\n".join(lines)
+
+
+    def __repr__(self):
+        return f"CircuitSensitivities(output='{self.output}', elements={len(self.values)})"
+
+
+
+def circuit_sensitivities(circuit, output: str) -> CircuitSensitivities:
+    """d output / d value of every element of a circuit at its DC operating point, from one adjoint solve."""
+    n = circuit.size
+    names = [*circuit.nodes, *(f"I({name})" for name in circuit.branches)]
+    if output not in names:
+        raise ValueError(f"Unknown output '{output}'. Expected a node name or 'I(<element>)'.")
+
+    rows, cols, vals, b = circuit.triplets()
+    if circuit.nonlinear:
+        import newton
+        dc = newton.NewtonSolver(circuit)
+        x = newton.operating_point(circuit, newton=dc).x
+        device_rows, device_cols, device_vals = dc.small_signal(x)
+        rows, cols, vals = (np.concatenate(pair) for pair in
+                            ((rows, device_rows), (cols, device_cols), (vals, device_vals)))
+    jacobian = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+    factors = solver.factorize(jacobian if n >= SPARSE_MIN_SIZE else jacobian.toarray())
+    if not circuit.nonlinear:
+        x = factors.solve(b)
+
+    unit = np.zeros(n)
+    unit[names.index(output)] = 1.0
+    adjoint = factors.solve_transpose(unit)
+
+    # dy/dp = lam . (db/dp - dA/dp x), and for devices -lam . dI/dp
+    v = np.append(x, 0.0)  # Ground (-1) reads 0 V
+    values = {}
+    for name, element in circuit.elements.items():
+        if element.nonlinear:
+            terminals = np.array([circuit.node_index[node] for node in element.nodes])
+            derivative = element.current_derivative(v[terminals])
+            grounded = terminals >= 0
+            values[name] = -float(adjoint[terminals[grounded]] @ derivative[grounded])
+            continue
+        d_rows, d_cols, d_vals, d_rhs_rows, d_rhs_vals = element.stamp_derivative(circuit.node_index)
+        change = (np.bincount(d_rhs_rows, weights=d_rhs_vals, minlength=n)
+                  - np.bincount(d_rows, weights=d_vals * x[d_cols], minlength=n))
+        values[name] = float(adjoint @ change)
+
+    nominal = {name: element.value for name, element in circuit.elements.items()}
+    return CircuitSensitivities(output, float(x[names.index(output)]), values, nominal)
@@ -0,0 +1,408 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import steptrace
+
+
+# Headless linear solver used by the Calculator.
+# Nothing in here touches pyray, so it can be imported without opening a window.
+
+
+# CONSTANTS
+PIVOT_EPSILON = 1e-12       # Same near-zero pivot threshold the Calculator always used
+DEFAULT_BLOCK_SIZE = 64     # Panel width for the blocked LU
+CACHE_ENTRIES = 8           # Factorizations kept by a FactorizationCache
+PARALLEL_MIN_SIZE = 1024    # Below this n the trailing updates are not worth threading
+PARALLEL_MIN_COLUMNS = 128  # Narrowest column slab handed to one thread
+STEP_LOG_MAX_SIZE = 23      # Calculator grids up to this size keep the step-by-step elimination log
+
+
+
+class SingularMatrixError(ValueError):
+    """Raised when no usable pivot can be found. Subclasses ValueError so existing handlers keep working."""
+
+
+
+def as_augmented(matrix) -> np.ndarray:
+    """
+    Convert an augmented matrix (n x n+1, list-of-lists or array) to a float array.
+    Raises ValueError if the shape is not an augmented system.
+    """
+    augmented = np.array(matrix, dtype=np.result_type(np.asarray(matrix).dtype, float))
+    if augmented.ndim != 2 or augmented.shape[0] == 0 or augmented.shape[1] != augmented.shape[0] + 1:
+        raise ValueError("Matrix dimensions do not match for an augmented system.")
+    return augmented
+
+
+def default_threads(n: int) -> int:
+    """Threads lu_factor uses for an n x n matrix when none are requested."""
+    if n < PARALLEL_MIN_SIZE:
+        return 1
+    return max(1, min(os.cpu_count() or 1, n // PARALLEL_MIN_COLUMNS))
+
+
+def _update_trailing(lu, k0, k1, columns):
+    """U12 = L11^-1 A12 and A22 -= L21 U12, restricted to one slab of trailing columns."""
+    for k in range(k0, k1 - 1):
+        lu[k + 1:k1, columns] -= np.outer(lu[k + 1:k1, k], lu[k, columns])
+    lu[k1:, columns] -= lu[k1:, k0:k1] @ lu[k0:k1, columns]
+
+
+def _factor_panels(lu, piv, block_size, eps, trace, pool, threads):
+    """Body of lu_factor: factors lu (square, or tall m x c) in place and records the row swaps in piv."""
+    n, columns = lu.shape
+    steps = min(n, columns)
+
+    for k0 in range(0, steps, block_size):
+        k1 = min(k0 + block_size, steps)
+
+        # Panel factorization (columns k0:k1), swapping whole rows as we go
+        for k in range(k0, k1):
+            p = k + int(np.argmax(np.abs(lu[k:, k])))
+            if abs(lu[p, k]) < eps:
+                raise SingularMatrixError("Matrix is singular and cannot be solved.")
+            if p != k:
+                lu[[k, p]] = lu[[p, k]]
+                piv[[k, p]] = piv[[p, k]]
+                if trace is not None:
+                    trace.swap(k, p)
+            lu[k + 1:, k] /= lu[k, k]
+            if trace is not None:
+                trace.axpy(np.arange(k + 1, n), k, lu[k + 1:, k])
+            lu[k + 1:, k + 1:k1] -= np.outer(lu[k + 1:, k], lu[k, k + 1:k1])
+
+        if k1 == columns:
+            break
+
+        # Trailing update, split into column slabs when there are enough columns to share
+        slabs = min(threads, (columns - k1) // PARALLEL_MIN_COLUMNS) if pool is not None else 1
+        if slabs > 1:
+            bounds = np.linspace(k1, columns, slabs + 1).astype(int)
+            slices = [slice(start, stop) for start, stop in zip(bounds[:-1], bounds[1:])]
+            list(pool.map(lambda cols: _update_trailing(lu, k0, k1, cols), slices))
+        else:
+            _update_trailing(lu, k0, k1, slice(k1, columns))
+
+
+def lu_factor(a, block_size=DEFAULT_BLOCK_SIZE, eps=PIVOT_EPSILON, trace=None, threads=None):
+    """
+    Blocked right-looking LU factorization with partial pivoting.
+
+    Returns (lu, piv) where lu holds the unit lower factor below the diagonal and the
+    upper factor on and above it, and piv is the row permutation such that a[piv] = L @ U.
+    Each panel is eliminated column by column with vectorized rank-1 updates, and the
+    trailing matrix is updated once per panel with a single matrix product.
+    Pass a steptrace.EliminationTrace to record the row operations; None records nothing.
+
+    With threads > 1 the trailing columns are split into slabs that are updated
+    concurrently; NumPy releases the GIL inside the matrix products, so the slabs really
+    run in parallel. threads=None picks default_threads(n). For the best scaling, limit
+    the BLAS library's own threads (e.g. OPENBLAS_NUM_THREADS=1).
+    """
+    lu = np.array(a, dtype=np.promote_types(np.asarray(a).dtype, np.float32))  # float32 input stays float32
+    n = lu.shape[0]
+    if lu.ndim != 2 or lu.shape[1] != n:
+        raise ValueError("LU factorization needs a square matrix.")
+
+    piv = np.arange(n)
+    block_size = max(1, int(block_size))
+    threads = default_threads(n) if threads is None else max(1, int(threads))
+    pool = ThreadPoolExecutor(max_workers=threads) if threads > 1 else None
+
+    try:
+        _factor_panels(lu, piv, block_size, eps, trace, pool, threads)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return lu, piv
+
+
+def lu_factor_columns(block, block_size=DEFAULT_BLOCK_SIZE, eps=PIVOT_EPSILON) -> np.ndarray:
+    """
+    Factor a tall m x c block (m >= c) in place with the same pivot choices lu_factor makes for
+    those columns. Returns the row permutation piv such that block[piv] = L @ U on exit, L being
+    m x c unit lower trapezoidal. Used for the panels of the out-of-core LU.
+    """
+    if block.ndim != 2 or block.shape[0] < block.shape[1]:
+        raise ValueError("Column factorization needs a tall block (at least as many rows as columns).")
+    piv = np.arange(block.shape[0])
+    _factor_panels(block, piv, max(1, int(block_size)), eps, None, None, 1)
+    return piv
+
+
+def forward_substitution(lu, b):
+    """Solve L y = b, where L is the unit lower triangle of lu. b is left untouched."""
+    y = np.array(b, dtype=np.result_type(lu.dtype, np.asarray(b).dtype))
+    for i in range(1, lu.shape[0]):
+        y[i] -= lu[i, :i] @ y[:i]
+    return y
+
+
+def backward_substitution(lu, y):
+    """Solve U x = y, where U is the upper triangle of lu (diagonal included)."""
+    x = np.array(y, dtype=np.result_type(lu.dtype, np.asarray(y).dtype))
+    n = lu.shape[0]
+    for i in range(n - 1, -1, -1):
+        x[i] -= lu[i, i + 1:] @ x[i + 1:]
+        x[i] /= lu[i, i]
+    return x
+
+
+def lu_solve(lu, piv, b):
+    """Solve A x = b from the output of lu_factor. b may be a vector or an n x k block of vectors."""
+    b = np.asarray(b)
+    return backward_substitution(lu, forward_substitution(lu, b[piv]))
+
+
+def lu_solve_transpose(lu, piv, b):
+    """Solve A^T x = b from the output of lu_factor, reusing the same factors."""
+    b = np.asarray(b)
+    upper_t = lu.T  # U^T is lower triangular (non-unit), L^T is unit upper triangular
+    n = lu.shape[0]
+
+    w = np.array(b, dtype=np.result_type(lu.dtype, b.dtype))
+    for i in range(n):
+        w[i] -= upper_t[i, :i] @ w[:i]
+        w[i] /= upper_t[i, i]
+    for i in range(n - 2, -1, -1):
+        w[i] -= upper_t[i, i + 1:] @ w[i + 1:]
+
+    x = np.empty_like(w)
+    x[piv] = w
+    return x
+
+
+def row_echelon(matrix, block_size=DEFAULT_BLOCK_SIZE, cache=None, trace=None):
+    """
+    Reduce an augmented matrix to row-echelon form with unit pivots.
+
+    This is the same form the Calculator's step-by-step elimination produces:
+    ones on the diagonal, zeros below it, and the transformed source vector in the
+    last column. Returns (echelon, piv) where piv maps echelon rows to input rows.
+    With a FactorizationCache, an unchanged coefficient block is not factored again.
+    Row operations are recorded into `trace` (a steptrace.EliminationTrace) if one is given.
+    """
+    augmented = as_augmented(matrix)
+    n = augmented.shape[0]
+
+    if cache is not None:
+        factorization = cache.get(augmented[:, :n], sparse=False, structured=False)
+    else:
+        factorization = LUFactorization(augmented[:, :n], block_size=block_size, trace=trace)
+    lu, piv = factorization.lu, factorization.piv
+
+    if trace is not None:
+        if factorization.trace is not None and factorization.trace is not trace:
+            trace.extend(factorization.trace)  # Steps recorded when the cached factorization was made
+        trace.scale(np.arange(n), np.diag(lu))
+    rhs = forward_substitution(lu, augmented[piv, n])
+
+    echelon = np.empty_like(augmented)
+    echelon[:, :n] = np.triu(lu)
+    echelon[:, n] = rhs
+    echelon /= np.diag(lu)[:, None]
+
+    return echelon, piv
+
+
+def back_substitution(echelon):
+    """Solve an n x n+1 row-echelon matrix for x."""
+    echelon = np.asarray(echelon)
+    n = echelon.shape[0]
+    return backward_substitution(echelon[:, :n], echelon[:, n])
+
+
+class LUFactorization:
+    """Dense LU factors of a square matrix. Factor once, then solve() any number of right-hand sides."""
+
+    def __init__(self, a, block_size=DEFAULT_BLOCK_SIZE, trace=None, threads=None):
+
+        self.trace = trace
+        self.lu, self.piv = lu_factor(a, block_size=block_size, trace=trace, threads=threads)
+        self.shape = self.lu.shape
+
+
+    @classmethod
+    def from_factors(cls, lu, piv, trace=None) -> "LUFactorization":
+        """Wrap factors computed elsewhere (e.g. by the typing pipeline) without refactoring."""
+        factorization = cls.__new__(cls)
+        factorization.trace = trace
+        factorization.lu, factorization.piv = lu, piv
+        factorization.shape = lu.shape
+        return factorization
+
+
+    def solve(self, b) -> np.ndarray:
+        """Solve A x = b in O(n^2) per right-hand side. b may be a vector or an n x k block."""
+        return lu_solve(self.lu, self.piv, b)
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        """Solve A^T x = b with the same factors."""
+        return lu_solve_transpose(self.lu, self.piv, b)
+
+
+
+def prefers_sparse(a) -> bool:
+    """True when a should go through the sparse LU path (scipy installed, large and mostly zeros)."""
+    try:
+        import sparse_solver
+    except ImportError:  # scipy is optional, the dense path only needs NumPy
+        return False
+    return sparse_solver.should_use_sparse(a)
+
+
+def factorize(a, block_size=DEFAULT_BLOCK_SIZE, sparse=None, trace=None, structured=True):
+    """
+    Factor a square matrix with the dense or sparse LU, picked like solve_system does.
+    Real dense tridiagonal, banded and SPD matrices take the fast paths in structure.py,
+    unless a trace is requested (only the general LU records elimination steps) or
+    structured=False. Every result has solve() and solve_transpose(); only a dense
+    LUFactorization has the lu/piv factors that row_echelon needs, so ask with structured=False.
+    """
+    if not hasattr(a, "nnz"):
+        a = np.asarray(a)
+    if sparse is None:
+        sparse = prefers_sparse(a)
+
+    if sparse:
+        import sparse_solver
+        return sparse_solver.SparseLU(a)
+    if structured and trace is None and not np.iscomplexobj(a):  # The structured fast paths are real-only
+        import structure
+        return structure.factorize(a, block_size=block_size)
+    return LUFactorization(a, block_size=block_size, trace=trace)
+
+
+
+class FactorizationCache:
+    """
+    Small LRU cache of factorizations keyed on the coefficient block.
+
+    Changing only the source column of the Calculator grid hits the cache, so a new
+    right-hand side costs two triangular solves instead of a fresh elimination.
+    """
+
+    def __init__(self, max_entries=CACHE_ENTRIES, record_trace=False):
+
+        self.max_entries = max_entries
+        self.record_trace = record_trace  # Keep the elimination steps with each dense factorization
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def key(a) -> tuple:
+        """Content hash of a dense or sparse matrix (O(nnz), far cheaper than factoring it)."""
+        digest = hashlib.blake2b(digest_size=16)
+        if hasattr(a, "nnz"):
+            a = a.tocsr()
+            for part in (a.data, a.indices, a.indptr):
+                digest.update(np.ascontiguousarray(part).tobytes())
+            return ("sparse", a.shape, str(a.dtype), digest.hexdigest())
+
+        a = np.ascontiguousarray(a)
+        digest.update(a.tobytes())
+        return ("dense", a.shape, str(a.dtype), digest.hexdigest())
+
+
+    def get(self, a, block_size=DEFAULT_BLOCK_SIZE, sparse=None, structured=True):
+        """
+        Return the factorization of a, factoring it only on a cache miss. structured=False
+        always gives a dense LUFactorization (with lu and piv) for a dense request.
+        """
+        if not hasattr(a, "nnz"):
+            a = np.asarray(a, dtype=np.result_type(np.asarray(a).dtype, float))
+        if sparse is None:
+            sparse = prefers_sparse(a)
+        key = self.key(a) + (bool(sparse), bool(structured))
+
+        with self._lock:
+            if key in self.entries:
+                self.hits += 1
+                self.entries.move_to_end(key)
+                return self.entries[key]
+            self.misses += 1
+
+        trace = steptrace.EliminationTrace() if self.record_trace and not sparse else None
+        factorization = factorize(a, block_size=block_size, sparse=sparse, trace=trace, structured=structured)
+
+        with self._lock:
+            self.entries[key] = factorization
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+        return factorization
+
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+
+
+def solve_system(a, b, block_size=DEFAULT_BLOCK_SIZE, sparse=None, cache=None, method="direct", **iterative_options):
+    """
+    Solve A x = b. With sparse=None the path is picked automatically: scipy sparse
+    matrices and large dense matrices below the density threshold use sparse LU.
+    Pass a FactorizationCache to reuse the factors of a coefficient block seen before.
+
+    method="cg" or "gmres" switches to the preconditioned Krylov solvers in iterative.py;
+    iterative_options (preconditioner, tol, maxiter) are passed through to iterative.solve.
+    method="refine" factors in float32 and refines to double precision (conditioning.refine_solve).
+    """
+    if method == "refine":
+        import conditioning
+        result = conditioning.refine_solve(a, b, tol=iterative_options.get("tol"),
+                                           max_iterations=iterative_options.get("maxiter") or conditioning.REFINE_ITERATIONS)
+        return result.x
+
+    if method != "direct":
+        import iterative
+        return iterative.solve(a, b, method=method, **iterative_options)
+
+    if cache is not None:
+        return cache.get(a, block_size=block_size, sparse=sparse).solve(b)
+    return factorize(a, block_size=block_size, sparse=sparse).solve(b)
+
+
+def solve_many(a, rhs, block_size=DEFAULT_BLOCK_SIZE, sparse=None, cache=None):
+    """
+    Solve A X = B for a whole n x k block of right-hand sides with one factorization.
+    Returns X with one solution per column, e.g. one column per step of a source sweep.
+    """
+    rhs = np.asarray(rhs)
+    if rhs.ndim != 2:
+        raise ValueError("solve_many expects an n x k matrix of right-hand sides.")
+    return solve_system(a, rhs, block_size=block_size, sparse=sparse, cache=cache)
+
+
+def solve_batch(a, b) -> np.ndarray:
+    """
+    Solve a stack of independent systems A[k] x[k] = b[k] (k x n x n and k x n) in one batched
+    LAPACK call. Real or complex; used where many small systems share a shape, e.g. an AC sweep.
+    """
+    a = np.asarray(a)
+    b = np.asarray(b)
+    if a.ndim != 3 or a.shape[1] != a.shape[2] or b.shape != a.shape[:2]:
+        raise ValueError("solve_batch expects a k x n x n stack of matrices and a k x n stack of vectors.")
+    try:
+        return np.linalg.solve(a, b[..., None])[..., 0]
+    except np.linalg.LinAlgError:
+        raise SingularMatrixError("A matrix in the batch is singular and cannot be solved.") from None
+
+
+def solve(matrix, block_size=DEFAULT_BLOCK_SIZE, sparse=None, cache=None, method="direct", **iterative_options):
+    """Solve an augmented system [A | b] and return x as a 1-D array."""
+    augmented = as_augmented(matrix)
+    n = augmented.shape[0]
+    return solve_system(augmented[:, :n], augmented[:, n], block_size=block_size, sparse=sparse, cache=cache,
+                        method=method, **iterative_options)
@@ -0,0 +1,219 @@
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.csgraph import reverse_cuthill_mckee
+from scipy.sparse.linalg import splu
+
+from solver import SingularMatrixError
+
+
+# Sparse LU path for nodal-analysis matrices, which are almost entirely zeros.
+# The dense solver switches here automatically (see solver.solve_system).
+
+
+# CONSTANTS
+DENSITY_THRESHOLD = 0.05    # Below this fraction of non-zeros the sparse path wins
+SPARSE_MIN_SIZE = 200       # Tiny systems are faster dense no matter how empty they are
+
+ORDERINGS = {
+    "amd": "MMD_AT_PLUS_A",     # Minimum degree on A^T + A, good for symmetric-ish MNA matrices
+    "colamd": "COLAMD",         # Column AMD, SuperLU's default
+    "rcm": "NATURAL",           # We permute with reverse Cuthill-McKee ourselves
+    "natural": "NATURAL",
+}
+
+
+
+def density(a) -> float:
+    """Fraction of stored non-zeros in a dense or sparse square matrix."""
+    n_rows, n_cols = a.shape
+    if n_rows == 0 or n_cols == 0:
+        return 0.0
+    nnz = a.nnz if sp.issparse(a) else np.count_nonzero(a)
+    return nnz / (n_rows * n_cols)
+
+
+def should_use_sparse(a, threshold=DENSITY_THRESHOLD, min_size=SPARSE_MIN_SIZE) -> bool:
+    """Decide whether a system should go through the sparse path."""
+    if sp.issparse(a):
+        return True
+    a = np.asarray(a)  # The Calculator passes lists of rows
+    return a.shape[0] >= min_size and density(a) < threshold
+
+
+def to_csr(a) -> sp.csr_matrix:
+    """Convert a dense array, list-of-lists or any scipy sparse matrix to CSR (real or complex)."""
+    if sp.issparse(a):
+        return sp.csr_matrix(a)
+    return sp.csr_matrix(np.asarray(a, dtype=np.result_type(np.asarray(a).dtype, float)))
+
+
+def rcm_order(a) -> np.ndarray:
+    """Reverse Cuthill-McKee permutation of the symmetrized sparsity pattern."""
+    a = to_csr(a)
+    pattern = (abs(a) + abs(a.T)).tocsr()
+    return np.asarray(reverse_cuthill_mckee(pattern, symmetric_mode=True))
+
+
+
+class SparseLU:
+    """
+    Sparse LU factorization of a square matrix with a fill-reducing ordering.
+    Factor once, then call solve() for any number of right-hand sides.
+    """
+
+    def __init__(self, a, ordering="amd"):
+
+        if ordering not in ORDERINGS:
+            raise ValueError(f"Unknown ordering '{ordering}'. Expected one of {sorted(ORDERINGS)}.")
+
+        a = to_csr(a)
+        if a.shape[0] != a.shape[1]:
+            raise ValueError("Sparse LU needs a square matrix.")
+
+        self.shape = a.shape
+        self.ordering = ordering
+        self.perm = rcm_order(a) if ordering == "rcm" else None
+
+        if self.perm is not None:
+            a = a[self.perm][:, self.perm]
+
+        try:
+            self.lu = splu(a.tocsc(), permc_spec=ORDERINGS[ordering])
+        except RuntimeError as e:  # SuperLU reports singular factors as RuntimeError
+            raise SingularMatrixError(f"Matrix is singular and cannot be solved. ({e})") from None
+
+
+    @property
+    def fill(self) -> int:
+        """Number of non-zeros in L and U combined."""
+        return self.lu.L.nnz + self.lu.U.nnz
+
+
+    def solve(self, b) -> np.ndarray:
+        """Solve A x = b. b may be a vector or an n x k block of vectors."""
+        b = np.asarray(b)
+        if self.perm is None:
+            return self.lu.solve(b)
+
+        y = self.lu.solve(b[self.perm])
+        x = np.empty_like(y)
+        x[self.perm] = y
+        return x
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        """Solve A^T x = b with the same factors."""
+        b = np.asarray(b)
+        if self.perm is None:
+            return self.lu.solve(b, trans="T")
+
+        y = self.lu.solve(b[self.perm], trans="T")
+        x = np.empty_like(y)
+        x[self.perm] = y
+        return x
+
+
+
+class SparsePattern:
+    """
+    A sparsity pattern that stays fixed across many factorizations (Newton iterations, time steps).
+
+    The symbolic work is done once: duplicate triplets are mapped to slots of a preallocated CSC
+    layout, and the fill-reducing column order SuperLU picks on the first factorization is kept.
+    Every later factor(vals) is a bincount into that layout plus a numeric factorization with
+    the stored order. SuperLU does not expose a numeric-only refactorization, so this is as close
+    as scipy gets.
+    """
+
+    def __init__(self, rows, cols, shape, ordering="amd"):
+
+        if ordering not in ("amd", "colamd", "natural"):
+            raise ValueError(f"SparsePattern supports column orderings amd, colamd and natural, not '{ordering}'.")
+
+        self.shape = shape
+        self.ordering = ordering
+        self.perm_c = None          # Column order chosen by the first factorization, factors are of A[:, perm_c]
+        self.symbolic_factorizations = 0
+        self.numeric_factorizations = 0
+
+        n = shape[0]
+        keys = np.asarray(cols, dtype=np.int64) * n + np.asarray(rows, dtype=np.int64)
+        unique, self._slots = np.unique(keys, return_inverse=True)
+        self._rows, self._cols = unique % n, unique // n
+        self._layout(np.arange(n))
+
+
+    @property
+    def nnz(self) -> int:
+        return len(self._rows)
+
+
+    def _layout(self, perm_c):
+        """Precompute the CSC arrays of A[:, perm_c] and where each triplet lands in them."""
+        n = self.shape[0]
+        position = np.empty(n, dtype=np.int64)
+        position[perm_c] = np.arange(n)
+        columns = position[self._cols]
+
+        order = np.lexsort((self._rows, columns))
+        self._indices = self._rows[order].astype(np.int32)
+        self._indptr = np.concatenate([[0], np.cumsum(np.bincount(columns, minlength=n))]).astype(np.int32)
+        where = np.empty(len(order), dtype=np.int64)
+        where[order] = np.arange(len(order))
+        self._data_slots = where[self._slots]
+
+
+    def assemble(self, vals) -> sp.csc_matrix:
+        """A[:, perm_c] as CSC from triplet values in the original order (duplicates summed)."""
+        data = np.bincount(self._data_slots, weights=vals, minlength=self.nnz)
+        return sp.csc_matrix((data, self._indices, self._indptr), shape=self.shape)
+
+
+    def factor(self, vals) -> "PatternLU":
+        """Factor the matrix with these triplet values."""
+        try:
+            if self.perm_c is None:
+                lu = splu(self.assemble(vals), permc_spec=ORDERINGS[self.ordering])
+                self.perm_c = np.argsort(lu.perm_c)  # SuperLU's perm_c maps old column -> new position
+                self._layout(self.perm_c)
+                self.symbolic_factorizations += 1
+                return PatternLU(lu, None)
+
+            lu = splu(self.assemble(vals), permc_spec="NATURAL")
+            self.numeric_factorizations += 1
+            return PatternLU(lu, self.perm_c)
+        except RuntimeError as e:
+            raise SingularMatrixError(f"Matrix is singular and cannot be solved. ({e})") from None
+
+
+
+class PatternLU:
+    """Factors of A[:, perm_c] from SparsePattern.factor, solving in the original unknown order."""
+
+    def __init__(self, lu, perm_c):
+
+        self.lu = lu
+        self.perm_c = perm_c
+        self.shape = lu.shape
+
+
+    def solve(self, b) -> np.ndarray:
+        y = self.lu.solve(np.asarray(b))
+        if self.perm_c is None:
+            return y
+        x = np.empty_like(y)
+        x[self.perm_c] = y
+        return x
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        b = np.asarray(b)
+        if self.perm_c is None:
+            return self.lu.solve(b, trans="T")
+        return self.lu.solve(b[self.perm_c], trans="T")
+
+
+
+def solve(a, b, ordering="amd") -> np.ndarray:
+    """Factor a sparse (or sparse-able) matrix and solve A x = b."""
+    return SparseLU(a, ordering=ordering).solve(b)
@@ -0,0 +1,142 @@
+from bisect import bisect_right
+
+import numpy as np
+
+
+# Compact record of the row operations performed during elimination.
+# Operations are stored as arrays and only turned into text when a line is actually displayed.
+
+
+# OP-CODES
+SWAP = 0    # Swap row target with row source
+SCALE = 1   # Divide row target by factor
+AXPY = 2    # Row target -= factor * row source
+
+
+
+class EliminationTrace:
+    """
+    Row operations of one elimination, recorded in bulk.
+
+    Each record is a chunk of operations sharing an op-code and source row, e.g. all the
+    row-axpys that clear one pivot column, so recording costs O(1) Python calls per pivot.
+    Indexing or iterating renders the operations as text on demand.
+    """
+
+    def __init__(self):
+
+        self._chunks = []       # (opcode, target rows, source row, factors)
+        self._offsets = [0]     # Cumulative operation count at the start of each chunk
+
+
+    def _record(self, opcode: int, targets, source: int, factors):
+        targets = np.atleast_1d(np.asarray(targets))
+        if len(targets) == 0:
+            return
+        factors = np.broadcast_to(np.asarray(factors), targets.shape).copy()
+        self._chunks.append((opcode, targets, source, factors))
+        self._offsets.append(self._offsets[-1] + len(targets))
+
+
+    def swap(self, i: int, k: int):
+        self._record(SWAP, i, k, np.nan)
+
+
+    def scale(self, rows, pivots):
+        self._record(SCALE, rows, -1, pivots)
+
+
+    def axpy(self, targets, source: int, factors):
+        self._record(AXPY, targets, source, factors)
+
+
+    def extend(self, other: "EliminationTrace"):
+        """Append all operations of another trace (chunks are shared, not copied)."""
+        for opcode, targets, source, factors in other._chunks:
+            self._chunks.append((opcode, targets, source, factors))
+            self._offsets.append(self._offsets[-1] + len(targets))
+
+
+    def op(self, index: int) -> tuple:
+        """Return operation `index` as (opcode, target, source, factor)."""
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("trace index out of range")
+        chunk = bisect_right(self._offsets, index) - 1
+        opcode, targets, source, factors = self._chunks[chunk]
+        position = index - self._offsets[chunk]
+        return opcode, int(targets[position]), source, float(factors[position])
+
+
+    def render(self, index: int) -> str:
+        opcode, target, source, factor = self.op(index)
+        if opcode == SWAP:
+            return f"Swapped row {target} with row {source}."
+        if opcode == SCALE:
+            return f"Normalized row {target}: R{target} / {factor:.4g}"
+        return f"Eliminated row {target} using row {source}: R{target} - {factor:.4g} * R{source}"
+
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+
+    def __getitem__(self, index: int) -> str:
+        return self.render(index)
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.render(index)
+
+
+
+class StepReport:
+    """
+    Solution log for the PopupWindow: plain text lines mixed with lazily rendered traces.
+    Behaves like a read-only list of lines, so the popup only renders the lines it shows.
+    """
+
+    def __init__(self):
+
+        self._parts = []        # Lists of strings or EliminationTrace objects
+        self._offsets = [0]
+
+
+    def add(self, text: str):
+        """Append text; embedded newlines start new lines."""
+        lines = text.rstrip("\n").split("\n")
+        if self._parts and isinstance(self._parts[-1], list):
+            self._parts[-1].extend(lines)
+            self._offsets[-1] += len(lines)
+        else:
+            self._parts.append(lines)
+            self._offsets.append(self._offsets[-1] + len(lines))
+
+
+    def add_trace(self, trace: EliminationTrace):
+        self._parts.append(trace)
+        self._offsets.append(self._offsets[-1] + len(trace))
+
+
+    def __len__(self) -> int:
+        return self._offsets[-1]
+
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("report index out of range")
+        part = bisect_right(self._offsets, index) - 1
+        return self._parts[part][index - self._offsets[part]]
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+    def __str__(self) -> str:
+        return "\n".join(self)
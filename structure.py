@@ -0,0 +1,291 @@
+import numpy as np
+
+import solver
+
+
+# Structure detection and fast paths for the matrices circuits actually produce:
+#   tridiagonal     ladders and RC chains       Thomas algorithm, O(n)
+#   banded          nodes numbered along a path banded LU with partial pivoting, O(n kl (kl + ku))
+#   spd             resistive networks          Cholesky, half the work of LU and no pivoting
+# Anything else (or a fast path that turns out to be unsafe) goes to the general blocked LU.
+
+
+# CONSTANTS
+BANDED_MIN_SIZE = 64            # Below this the blocked dense LU is already instant
+BAND_FRACTION = 0.1             # Bandwidth (kl + ku) at most this fraction of n counts as banded
+SYMMETRY_TOLERANCE = 1e-12      # Relative to the largest entry
+
+
+
+class NotPositiveDefiniteError(ValueError):
+    """Raised by CholeskyFactorization when a symmetric matrix turns out not to be positive definite."""
+
+
+
+class MatrixStructure:
+    """Bandwidths and symmetry of a square matrix, as found by analyze()."""
+
+    def __init__(self, n: int, lower_bandwidth: int, upper_bandwidth: int, symmetric: bool, positive_diagonal: bool):
+
+        self.n = n
+        self.lower_bandwidth = lower_bandwidth
+        self.upper_bandwidth = upper_bandwidth
+        self.symmetric = symmetric
+        self.positive_diagonal = positive_diagonal  # Necessary for positive definiteness, Cholesky decides
+
+
+    @property
+    def kind(self) -> str:
+        """'tridiagonal', 'banded', 'spd' (candidate) or 'general'."""
+        if self.n == 0:
+            return "general"
+        if self.lower_bandwidth <= 1 and self.upper_bandwidth <= 1:
+            return "tridiagonal"
+        if self.n >= BANDED_MIN_SIZE and self.lower_bandwidth + self.upper_bandwidth <= BAND_FRACTION * self.n:
+            return "banded"
+        if self.symmetric and self.positive_diagonal:
+            return "spd"
+        return "general"
+
+
+    def __repr__(self):
+        return (f"MatrixStructure(n={self.n}, kl={self.lower_bandwidth}, ku={self.upper_bandwidth}, "
+                f"symmetric={self.symmetric}, kind='{self.kind}')")
+
+
+
+def analyze(a) -> MatrixStructure:
+    """Find the bandwidths and symmetry of a dense square matrix in O(n^2)."""
+    a = np.asarray(a, dtype=float)
+    n = a.shape[0]
+    if a.ndim != 2 or a.shape[1] != n:
+        raise ValueError("Structure analysis needs a square matrix.")
+
+    # First and last non-zero column of every row give both bandwidths in a couple of passes
+    nonzero = a != 0
+    filled = nonzero.any(axis=1)
+    index = np.arange(n)
+    first = np.argmax(nonzero, axis=1)
+    last = n - 1 - np.argmax(nonzero[:, ::-1], axis=1)
+    lower = int((index - first)[filled].max(initial=0))
+    upper = int((last - index)[filled].max(initial=0))
+
+    # Everything outside the band is zero, so comparing the diagonals inside it is enough
+    tolerance = SYMMETRY_TOLERANCE * np.abs(a).max(initial=0.0)
+    symmetric = lower == upper and all(np.abs(np.diag(a, offset) - np.diag(a, -offset)).max() <= tolerance
+                                       for offset in range(1, upper + 1))
+    return MatrixStructure(n, lower, upper, symmetric, bool(np.all(np.diag(a) > 0)))
+
+
+
+class ThomasFactorization:
+    """
+    LU of a tridiagonal matrix without pivoting, stored as three diagonals.
+    Only safe when the pivots stay away from zero, which factor checks; diagonally dominant
+    and SPD tridiagonal matrices (ladders, RC chains) always pass.
+    """
+
+    method = "Thomas algorithm"
+
+    def __init__(self, a, eps=solver.PIVOT_EPSILON):
+
+        a = np.asarray(a, dtype=float)
+        n = a.shape[0]
+        self.shape = a.shape
+        self.upper = np.diag(a, 1).copy()
+        self.multipliers = np.diag(a, -1).copy()
+        self.pivots = np.diag(a).copy()
+
+        # Pivots relative to their row: growth here is what partial pivoting would have prevented
+        scale = np.abs(self.pivots)
+        scale[1:] += np.abs(self.multipliers)
+        scale[:-1] += np.abs(self.upper)
+
+        pivots, multipliers, upper = self.pivots, self.multipliers, self.upper
+        for i in range(n):
+            if i > 0:
+                multipliers[i - 1] /= pivots[i - 1]
+                pivots[i] -= multipliers[i - 1] * upper[i - 1]
+            if abs(pivots[i]) <= max(eps, 1e-10 * scale[i]):
+                raise solver.SingularMatrixError(f"Tridiagonal pivot {i} vanished without pivoting.")
+
+
+    def solve(self, b) -> np.ndarray:
+        """Solve A x = b in O(n). b may be a vector or an n x k block."""
+        x = np.array(b, dtype=float)
+        for i in range(1, len(x)):
+            x[i] -= self.multipliers[i - 1] * x[i - 1]
+        x[-1] /= self.pivots[-1]
+        for i in range(len(x) - 2, -1, -1):
+            x[i] = (x[i] - self.upper[i] * x[i + 1]) / self.pivots[i]
+        return x
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        """Solve A^T x = b with the same factors."""
+        x = np.array(b, dtype=float)
+        x[0] /= self.pivots[0]
+        for i in range(1, len(x)):
+            x[i] = (x[i] - self.upper[i - 1] * x[i - 1]) / self.pivots[i]
+        for i in range(len(x) - 2, -1, -1):
+            x[i] -= self.multipliers[i] * x[i + 1]
+        return x
+
+
+
+class BandedLU:
+    """
+    LU with partial pivoting that never leaves the band (LAPACK gbtrf layout, row-wise).
+
+    Pivoting can push U's upper bandwidth to kl + ku, so each working row keeps room for
+    2 kl + ku + 1 entries. L's multipliers are kept per column with the row swaps applied
+    in sequence, so nothing outside the band is ever stored.
+    """
+
+    method = "banded LU"
+
+    def __init__(self, a, lower_bandwidth: int, upper_bandwidth: int, eps=solver.PIVOT_EPSILON):
+
+        a = np.asarray(a, dtype=float)
+        n = a.shape[0]
+        kl, ku = lower_bandwidth, upper_bandwidth
+        width = kl + ku + 1                 # Columns k..k+kl+ku touched at step k
+
+        self.shape = a.shape
+        self.lower_bandwidth, self.upper_bandwidth = kl, ku
+        self.piv = np.arange(n)
+        self.multipliers = np.zeros((n, kl))
+        self.u = np.zeros((n, width))       # u[k, j - k] = U[k, j]
+
+        # work[i, j - i + kl] = A[i, j]
+        work = np.zeros((n, 2 * kl + ku + 1))
+        for offset in range(-kl, ku + 1):
+            diagonal = np.diag(a, offset)
+            start = max(0, -offset)
+            work[start:start + len(diagonal), kl + offset] = diagonal
+
+        # Window offsets are the same at every step: row k + r, column k + c sits at c - r + kl
+        window = np.arange(width)[None, :] - np.arange(kl + 1)[:, None] + kl
+        scale = np.abs(a).max(initial=0.0)
+
+        for k in range(n):
+            m, w = min(kl + 1, n - k), min(width, n - k)
+            rows = np.arange(k, k + m)[:, None]
+            block = work[rows, window[:m, :w]]
+
+            p = int(np.argmax(np.abs(block[:, 0])))
+            if abs(block[p, 0]) <= max(eps, 1e-15 * scale):
+                raise solver.SingularMatrixError("Matrix is singular and cannot be solved.")
+            if p:
+                block[[0, p]] = block[[p, 0]]
+                self.piv[k] = k + p
+
+            multipliers = block[1:, 0] / block[0, 0]
+            block[1:, 1:] -= np.outer(multipliers, block[0, 1:])
+            block[1:, 0] = 0.0
+
+            self.u[k, :w] = block[0]
+            self.multipliers[k, :m - 1] = multipliers
+            work[rows[1:], window[1:m, :w]] = block[1:]
+
+
+    def solve(self, b) -> np.ndarray:
+        """Solve A x = b in O(n (kl + ku)). b may be a vector or an n x k block."""
+        x = np.array(b, dtype=float)
+        n, kl = self.shape[0], self.lower_bandwidth
+        width = self.u.shape[1]
+
+        for k in range(n):
+            p = self.piv[k]
+            if p != k:
+                x[[k, p]] = x[[p, k]]
+            m = min(kl + 1, n - k)
+            x[k + 1:k + m] -= np.multiply.outer(self.multipliers[k, :m - 1], x[k])
+
+        for k in range(n - 1, -1, -1):
+            w = min(width, n - k)
+            x[k] = (x[k] - self.u[k, 1:w] @ x[k + 1:k + w]) / self.u[k, 0]
+        return x
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        """Solve A^T x = b with the same factors."""
+        x = np.array(b, dtype=float)
+        n, kl = self.shape[0], self.lower_bandwidth
+        width = self.u.shape[1]
+
+        for k in range(n):  # U^T is lower triangular with the band stored along U's rows
+            lo = max(0, k - width + 1)
+            x[k] = (x[k] - self.u[np.arange(lo, k), k - np.arange(lo, k)] @ x[lo:k]) / self.u[k, 0]
+
+        for k in range(n - 1, -1, -1):
+            m = min(kl + 1, n - k)
+            x[k] -= self.multipliers[k, :m - 1] @ x[k + 1:k + m]
+            p = self.piv[k]
+            if p != k:
+                x[[k, p]] = x[[p, k]]
+        return x
+
+
+
+class CholeskyFactorization:
+    """A = L L^T for symmetric positive-definite matrices. Raises NotPositiveDefiniteError otherwise."""
+
+    method = "Cholesky"
+
+    def __init__(self, a):
+
+        a = np.asarray(a, dtype=float)
+        self.shape = a.shape
+        try:
+            self.lower = np.linalg.cholesky(a)
+        except np.linalg.LinAlgError:
+            raise NotPositiveDefiniteError("Matrix is symmetric but not positive definite.") from None
+
+
+    def solve(self, b) -> np.ndarray:
+        """Solve A x = b with one forward and one backward substitution."""
+        lower = self.lower
+        x = np.array(b, dtype=float)
+        n = lower.shape[0]
+        for i in range(n):
+            x[i] = (x[i] - lower[i, :i] @ x[:i]) / lower[i, i]
+        for i in range(n - 1, -1, -1):
+            x[i] = (x[i] - lower[i + 1:, i] @ x[i + 1:]) / lower[i, i]
+        return x
+
+
+    def solve_transpose(self, b) -> np.ndarray:
+        """A is symmetric, so this is solve()."""
+        return self.solve(b)
+
+
+
+def factorize(a, block_size=solver.DEFAULT_BLOCK_SIZE, structure=None):
+    """
+    Factor a dense square matrix with the cheapest safe method for its structure.
+    Falls back to the general blocked LU when no fast path applies or one declines.
+    """
+    a = np.asarray(a, dtype=float)
+    structure = structure or analyze(a)
+    kind = structure.kind
+
+    try:
+        if kind == "tridiagonal":
+            try:
+                return ThomasFactorization(a)
+            except solver.SingularMatrixError:  # Needs pivoting, the banded LU does that within the band
+                return BandedLU(a, 1, 1)
+        if kind == "banded":
+            return BandedLU(a, structure.lower_bandwidth, structure.upper_bandwidth)
+        if kind == "spd":
+            return CholeskyFactorization(a)
+    except NotPositiveDefiniteError:
+        pass
+
+    return solver.LUFactorization(a, block_size=block_size)
+
+
+def describe(factorization) -> str:
+    """Name of the method that produced a factorization, for the solution report."""
+    return getattr(factorization, "method", "blocked LU")
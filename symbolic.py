@@ -0,0 +1,142 @@
+from fractions import Fraction
+
+import numpy as np
+import sympy as sy
+from sympy.polys.matrices import DomainMatrix
+from sympy.polys.matrices.exceptions import DMNonInvertibleMatrixError
+
+import solver
+
+
+# Symbolic DC solve of linear circuits.
+#
+# Chosen element values become sympy symbols named after their elements, every other value an
+# exact rational. The MNA system is stamped from each element's value law (Element.value_law),
+# so a resistor contributes 1/R1, a source V1 and a gain E1, and solved once.
+#
+# With few symbols the solve runs over the field of rational functions, so every answer comes
+# out cancelled to lowest terms. The expanded forms grow exponentially with the symbol count
+# though (a ladder's node voltages have one term per spanning tree), so beyond CANCEL_LIMIT
+# symbols the answers are left in the nested form plain elimination produces.
+#
+# The closed forms are then compiled with lambdify after common-subexpression elimination into
+# plain NumPy functions, so sweeping millions of value combinations is array arithmetic instead
+# of millions of solves.
+
+
+# CONSTANTS
+CANCEL_LIMIT = 10               # Most symbols for which the answers are cancelled to lowest terms
+
+
+
+class SymbolicSolution:
+    """Closed-form node voltages and branch currents of a circuit in terms of its symbolic element values."""
+
+    def __init__(self, symbols: list, expressions: dict):
+
+        self.symbols = symbols              # sympy Symbols, named after their elements
+        self.expressions = expressions      # Node name or 'I(<element>)' -> sympy expression
+        self._compiled = {}
+
+
+    def __getitem__(self, name):
+        return self.expressions[name]
+
+
+    def compile(self, outputs=None):
+        """
+        NumPy function of the symbol values (in self.symbols order) returning one array per output.
+        Shared subexpressions are computed once. Compiled functions are cached per output list.
+        """
+        outputs = tuple(self.expressions if outputs is None else outputs)
+        if outputs not in self._compiled:
+            function = sy.lambdify(self.symbols, [self.expressions[name] for name in outputs], modules="numpy", cse=True)
+            self._compiled[outputs] = function
+        return self._compiled[outputs]
+
+
+    def evaluate(self, values: dict, outputs=None) -> dict:
+        """
+        Evaluate the closed forms for arrays of element values, e.g. {'R1': np.linspace(1e3, 2e3, 10**6)}.
+        Arrays broadcast against each other; constant outputs are broadcast to the same shape.
+        """
+        missing = [str(symbol) for symbol in self.symbols if str(symbol) not in values]
+        if missing:
+            raise ValueError(f"Missing value(s) for {', '.join(missing)}")
+
+        outputs = tuple(self.expressions if outputs is None else outputs)
+        arguments = [np.asarray(values[str(symbol)], dtype=float) for symbol in self.symbols]
+        results = self.compile(outputs)(*arguments)
+        shape = np.broadcast_shapes(*(argument.shape for argument in arguments)) if arguments else ()
+        return {name: np.broadcast_to(np.asarray(result, dtype=float), shape) for name, result in zip(outputs, results)}
+
+
+    def __repr__(self):
+        return f"SymbolicSolution(symbols={self.symbols}, outputs={len(self.expressions)})"
+
+
+
+def exact(value: float):
+    """A float as the exact rational it was written as ('0.001' stays 1/1000)."""
+    return sy.Rational(Fraction(repr(float(value))))
+
+
+def symbolic_solve(circuit, names=None, cancel=None) -> SymbolicSolution:
+    """
+    Solve a linear circuit with the values of the elements in `names` (default: all of them) kept
+    symbolic. cancel=True/False forces or skips reducing the answers to lowest terms (default: up
+    to CANCEL_LIMIT symbols). Raises ValueError for nonlinear circuits or values that are not a power law.
+    """
+    if circuit.nonlinear:
+        raise ValueError("Symbolic solving needs a linear circuit (R, sources, E, C, L).")
+
+    n = circuit.size
+    names = list(circuit.elements if names is None else names)
+    missing = [name for name in names if name not in circuit.elements]
+    if missing:
+        raise ValueError(f"Unknown element(s): {', '.join(missing)}")
+
+    rows, cols, vals, _ = circuit.triplets()
+    rhs_rows, rhs_vals = circuit.rhs_entries()
+    matrix_entries = [exact(value) for value in vals]
+    rhs_entries = [exact(value) for value in rhs_vals]
+
+    symbols = []
+    for name in names:
+        matrix_slice, rhs_slice = circuit.slices(name)
+        count = matrix_slice.stop - matrix_slice.start
+        if count + rhs_slice.stop - rhs_slice.start == 0:
+            continue  # Nothing stamped at DC (capacitors), the value cannot show up in the answer
+        law = circuit.elements[name].value_law(circuit.node_index)
+        if law is None:
+            raise ValueError(f"{name}: value cannot be made symbolic.")
+        symbol = sy.Symbol(name, positive=True)
+        symbols.append(symbol)
+        coefficients, powers = law
+        entries = [exact(coefficient) * symbol ** int(power) for coefficient, power in zip(coefficients, powers)]
+        matrix_entries[matrix_slice] = entries[:count]
+        rhs_entries[rhs_slice] = entries[count:]
+
+    a = sy.zeros(n, n)
+    for r, c, entry in zip(rows, cols, matrix_entries):
+        a[r, c] += entry
+    b = sy.zeros(n, 1)
+    for r, entry in zip(rhs_rows, rhs_entries):
+        b[r] += entry
+
+    if cancel is None:
+        cancel = len(symbols) <= CANCEL_LIMIT
+    try:
+        if cancel:
+            # Rational functions in the symbols: exact, and every result comes out cancelled
+            domain = sy.QQ.frac_field(*symbols) if symbols else sy.QQ
+            x = DomainMatrix.from_Matrix(a).convert_to(domain).lu_solve(
+                DomainMatrix.from_Matrix(b).convert_to(domain)).to_Matrix()
+            x = [sy.factor(value) for value in x]
+        else:
+            x = list(a.LUsolve(b))
+    except (DMNonInvertibleMatrixError, ZeroDivisionError, ValueError):
+        raise solver.SingularMatrixError("Matrix is singular and cannot be solved.") from None
+
+    unknowns = [*circuit.nodes, *(f"I({name})" for name in circuit.branches)]
+    return SymbolicSolution(symbols, dict(zip(unknowns, x)))
@@ -0,0 +1,43 @@
+import io
+import json
+from fractions import Fraction
+
+import pytest
+
+import batch
+
+
+def run(paths, exact_mode=False):
+    output = io.StringIO()
+    solved, failed = batch.run([str(path) for path in paths], output, workers=1, exact_mode=exact_mode)
+    return solved, failed, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_netlist_input(tmp_path):
+    path = tmp_path / "divider.cir"
+    path.write_text("V1 in 0 10\nR1 in out 1k\nR2 out 0 3k\n")
+    solved, failed, records = run([path])
+    assert (solved, failed) == (1, 0)
+    assert records[0]["x"][:2] == pytest.approx([10.0, 7.5])  # Nodes in, out, then I(V1)
+
+
+@pytest.mark.parametrize("exact_mode", [False, True])
+def test_csv_fractions(tmp_path, exact_mode):
+    path = tmp_path / "systems.csv"
+    path.write_text("1/2,0,1\n0,4,2\n\n2,0,1/3\n0,1,0.5\n")
+    solved, failed, records = run([path], exact_mode=exact_mode)
+    assert (solved, failed) == (2, 0)
+    first, second = ([float(Fraction(value)) for value in record["x"]] for record in records)  # Exact mode writes "1/2"
+    assert first == pytest.approx([2.0, 0.5])
+    assert second == pytest.approx([1 / 6, 0.5])
+
+
+def test_large_netlist_stays_sparse(tmp_path):
+    sections = 300
+    path = tmp_path / "ladder.cir"
+    path.write_text("\n".join(["V1 n0 0 1"] + [f"R{k} n{k} n{k + 1} 1" for k in range(sections)] + [f"Rload n{sections} 0 1"]))
+    (_, system), = batch.read_netlist(str(path))
+    assert isinstance(system, tuple) and hasattr(system[0], "nnz")
+    solved, failed, records = run([path])
+    assert (solved, failed) == (1, 0)
+    assert records[0]["x"][sections] == pytest.approx(1 / (sections + 1))    # Node n300 across Rload
@@ -0,0 +1,48 @@
+import pytest
+
+pytest.importorskip("pyray")
+
+import main
+from tracelog import TraceLog
+
+
+@pytest.fixture
+def calculator():
+    main.log = TraceLog()
+    main.RM = main.ResourceManager()
+    return main.Calculator()
+
+
+def fill(calculator, rows):
+    calculator.matrix_rows = len(rows)
+    calculator.matrix_size = len(rows[0]) - 1
+    calculator.generate_matrix_boxes()
+    for row_boxes, row in zip(calculator.matrix_boxes, rows):
+        for box, text in zip(row_boxes, row):
+            box.text = text
+
+
+def report(calculator) -> str:
+    return "\n".join(calculator.solution[i] for i in range(len(calculator.solution)))
+
+
+def test_solve_square_system(calculator):
+    fill(calculator, [["2", "1", "3"], ["1", "3", "5"]])
+    calculator.solve_matrix()
+    text = report(calculator)
+    assert "Error" not in text
+    assert "x[0] = 0.80" in text and "x[1] = 1.40" in text
+
+
+def test_solve_fraction_entries(calculator):
+    fill(calculator, [["1/2", "0", "1"], ["0", "4", "2"]])
+    calculator.solve_matrix()
+    text = report(calculator)
+    assert "x[0] = 2.00" in text and "x[1] = 0.50" in text
+
+
+def test_record_steps_off_skips_traces(calculator):
+    calculator.record_steps = False
+    fill(calculator, [["2", "1", "3"], ["1", "3", "5"]])
+    calculator.solve_matrix()
+    assert all(factorization.trace is None for factorization in calculator.factor_cache.entries.values())
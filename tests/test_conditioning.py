@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+import conditioning
+
+
+def test_refine_reaches_double_precision():
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((50, 50)) + 10 * np.eye(50)
+    b = rng.standard_normal(50)
+    result = conditioning.refine_solve(a, b)
+    assert result.converged
+    assert result.x == pytest.approx(np.linalg.solve(a, b))
+
+
+def test_singular_in_float32_falls_back_to_float64():
+    a = np.array([[1.0, 1.0], [1.0, 1.0 + 1e-9]])     # The 1e-9 is lost in float32
+    b = np.array([2.0, 2.0 + 1e-9])
+    result = conditioning.refine_solve(a, b)
+    assert not result.converged
+    assert result.x == pytest.approx([1.0, 1.0])
@@ -0,0 +1,16 @@
+from fractions import Fraction
+
+import pytest
+
+import exact
+
+
+def test_bareiss_solve_is_exact():
+    assert exact.bareiss_solve([[1, 2, 3], ["1/2", 3, 4]]) == [Fraction(1, 2), Fraction(5, 4)]
+
+
+@pytest.mark.parametrize("solve", [exact.bareiss_solve, exact.fraction_solve])
+@pytest.mark.parametrize("matrix", [[], [[1, 2, 3]]])
+def test_bad_dimensions_raise_value_error(solve, matrix):
+    with pytest.raises(ValueError, match="dimensions"):
+        solve(matrix)
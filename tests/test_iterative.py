@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve
+
+import iterative
+
+
+def grid_laplacian(size: int, ground=1.0):
+    """5-point grid Laplacian with every node tied to ground, so it is SPD."""
+    line = sp.diags([-1.0, 2.0, -1.0], [-1, 0, 1], shape=(size, size))
+    eye = sp.identity(size)
+    return (sp.kron(line, eye) + sp.kron(eye, line) + ground * sp.identity(size * size)).tocsr()
+
+
+@pytest.mark.parametrize("kind", ["ilu0", "ic0", "mic0"])
+def test_factors_keep_the_pattern_of_a(kind):
+    a = grid_laplacian(6)
+    m = iterative.make_preconditioner(a, kind)
+    pattern = abs(sp.tril(a)) > 0
+    assert ((abs(m.lower) > 0) > pattern).nnz == 0
+    r = np.arange(a.shape[0], dtype=float)
+    assert m.apply(r) == pytest.approx(spsolve((m.lower @ m.upper).tocsc(), r))
+
+
+def test_ic0_matches_ilu0_on_symmetric_input():
+    a = grid_laplacian(5)
+    ilu, ic = iterative.ILU0Preconditioner(a), iterative.IC0Preconditioner(a)
+    assert abs(ilu.lower @ ilu.upper - ic.lower @ ic.upper).max() < 1e-12
+
+
+def test_mic0_keeps_row_sums():
+    a = grid_laplacian(8)
+    m = iterative.MIC0Preconditioner(a)
+    ones = np.ones(a.shape[0])
+    assert m.lower @ (m.upper @ ones) == pytest.approx(a @ ones)
+
+
+@pytest.mark.parametrize("kind", ["jacobi", "ic0", "mic0"])
+def test_cg_converges(kind):
+    a = grid_laplacian(20, ground=0.01)
+    b = np.ones(a.shape[0])
+    result = iterative.cg(a, b, preconditioner=kind, tol=1e-10)
+    assert result.converged
+    assert np.linalg.norm(a @ result.x - b) <= 1e-9 * np.linalg.norm(b)
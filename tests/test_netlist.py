@@ -0,0 +1,38 @@
+import pytest
+
+import netlist
+
+
+DIVIDER = """
+V1 in 0 10
+R1 in out 1k
+R2 out 0 1k
+"""
+
+
+def test_solve_divider():
+    assert netlist.Circuit.from_netlist(DIVIDER).solve()["out"] == pytest.approx(5.0)
+
+
+def test_rejected_value_leaves_circuit_unchanged():
+    circuit = netlist.Circuit.from_netlist(DIVIDER)
+    revision = circuit.revision
+    with pytest.raises(ValueError):
+        circuit.set_value("R2", 0)
+    assert circuit.elements["R2"].value == 1000.0
+    assert circuit.revision == revision
+    assert circuit.solve()["out"] == pytest.approx(5.0)
+
+
+def test_set_value_restamps():
+    circuit = netlist.Circuit.from_netlist(DIVIDER)
+    circuit.solve()
+    circuit.set_value("R2", 3000.0)
+    assert circuit.solve()["out"] == pytest.approx(7.5)
+
+
+@pytest.mark.parametrize("cancel", [True, False])
+def test_symbolic_divider(cancel):
+    pytest.importorskip("sympy")
+    solution = netlist.Circuit.from_netlist(DIVIDER).symbolic(["R2"], cancel=cancel)
+    assert solution.evaluate({"R2": 3000.0})["out"] == pytest.approx(7.5)
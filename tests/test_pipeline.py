@@ -0,0 +1,38 @@
+import numpy as np
+
+import pipeline
+
+
+def typed_factorization(a):
+    """Feed every row of a to a fresh pipeline and return what it makes of them."""
+    typing = pipeline.EliminationPipeline(len(a))
+    try:
+        for i, row in enumerate(a):
+            typing.submit_row(i, row)
+        return typing.factorization(a, timeout=5.0)
+    finally:
+        typing.close()
+
+
+def test_well_pivoted_matrix_is_factored():
+    rng = np.random.default_rng(0)
+    a = rng.standard_normal((30, 30)) + 30 * np.eye(30)
+    factors = typed_factorization(a)
+    assert factors is not None
+    b = np.ones(30)
+    assert pipeline.backward_error(a, factors.solve(b), b) < pipeline.BACKWARD_ERROR_LIMIT
+
+
+def test_large_multiplier_declines():
+    a = np.eye(30)
+    a[0, 0] = 0.02
+    a[1, 0] = 1.0    # Multiplier 50: partial pivoting would swap these rows
+    assert typed_factorization(a) is None
+
+
+def test_backward_error_flags_a_poor_solution():
+    a = np.array([[4.0, 1.0], [1.0, 3.0]])
+    b = np.array([1.0, 2.0])
+    x = np.linalg.solve(a, b)
+    assert pipeline.backward_error(a, x, b) < 1e-15
+    assert pipeline.backward_error(a, x * (1 + 1e-6), b) > pipeline.BACKWARD_ERROR_LIMIT
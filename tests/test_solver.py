@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+import solver
+import structure
+
+
+TRIDIAGONAL = np.diag([4.0] * 30) + np.diag([1.0] * 29, 1) + np.diag([-1.0] * 29, -1)
+
+
+@pytest.mark.parametrize("record_trace", [True, False])
+def test_row_echelon_through_cache(record_trace):
+    cache = solver.FactorizationCache(record_trace=record_trace)
+    matrix = [[2, 1, 3], [1, 3, 5]]     # SPD: factorize() alone would take the Cholesky fast path
+    echelon, _ = solver.row_echelon(matrix, cache=cache)
+    assert solver.back_substitution(echelon) == pytest.approx([0.8, 1.4])
+    assert (cache.get(np.array(matrix)[:, :2], sparse=False, structured=False).trace is not None) == record_trace
+
+
+def test_cache_with_tridiagonal_matrix():
+    cache = solver.FactorizationCache()
+    b = np.arange(30.0)
+    fast = cache.get(TRIDIAGONAL)
+    assert isinstance(fast, structure.ThomasFactorization)
+    assert fast.solve(b) == pytest.approx(np.linalg.solve(TRIDIAGONAL, b))
+    assert fast.solve_transpose(b) == pytest.approx(np.linalg.solve(TRIDIAGONAL.T, b))
+
+    general = cache.get(TRIDIAGONAL, structured=False)
+    assert isinstance(general, solver.LUFactorization)
+    assert general.solve(b) == pytest.approx(fast.solve(b))
+    assert cache.get(TRIDIAGONAL) is fast and cache.misses == 2
+
+    augmented = np.column_stack([TRIDIAGONAL, b])
+    echelon, _ = solver.row_echelon(augmented, cache=cache)
+    assert solver.back_substitution(echelon) == pytest.approx(fast.solve(b))
+    assert cache.hits == 2
@@ -0,0 +1,18 @@
+import numpy as np
+import pytest
+
+import netlist
+import transient
+
+
+def test_capacitor_only_node_starts_at_zero():
+    circuit = netlist.Circuit.from_netlist("""
+V1 in 0 PULSE(0 1 0 1n 1n 1 2)
+R1 in a 1k
+C1 a b 1u
+C2 b 0 1u
+""")
+    result = transient.simulate(circuit, 5e-3, max_step=5e-5, adaptive=False)
+    assert result["b"][0] == pytest.approx(0.0, abs=1e-9)
+    assert np.all(np.isfinite(result["b"]))
+    assert result["b"][-1] == pytest.approx(0.5, rel=0.01)     # Two equal capacitors in series split the step
@@ -0,0 +1,160 @@
+import atexit
+import queue
+import sys
+import threading
+from enum import IntEnum
+
+try:
+    from pyray import TraceLogLevel
+except ImportError:  # Headless tools (batch CLI, solvers) run without raylib installed
+
+    class TraceLogLevel(IntEnum):
+        """Same values as raylib's TraceLogLevel."""
+        LOG_ALL = 0
+        LOG_TRACE = 1
+        LOG_DEBUG = 2
+        LOG_INFO = 3
+        LOG_WARNING = 4
+        LOG_ERROR = 5
+        LOG_FATAL = 6
+        LOG_NONE = 7
+
+
+# Asynchronous log backend shared by the app and the headless modules.
+#
+#   log = TraceLog()
+#   log(TraceLogLevel.LOG_INFO, "Eliminated row %d: %s", k, row)
+#
+# Records below the current level are dropped before any formatting happens. Everything
+# else is queued as (level, text, args) and formatted + written in batches by a writer thread.
+# Arguments are formatted later, so pass values that will not be mutated afterwards.
+
+
+# CONSTANTS
+BATCH_SIZE = 512            # Records written per batch at most
+DEFAULT_COLOR = "\033[37m"  # White
+RESET_COLOR = "\033[0m"
+
+
+
+class TraceLog:
+
+    _instance = None
+    _lock = threading.Lock()
+
+    colors = {
+        TraceLogLevel.LOG_INFO: "\033[34m",         # Blue
+        TraceLogLevel.LOG_WARNING: "\033[33m",      # Yellow
+        TraceLogLevel.LOG_ERROR: "\033[31m",        # Red
+    }
+
+    level_names = {
+        TraceLogLevel.LOG_TRACE: "[TRACE]",
+        TraceLogLevel.LOG_DEBUG: "[DEBUG]",
+        TraceLogLevel.LOG_INFO: "[INFO]",
+        TraceLogLevel.LOG_WARNING: "[WARNING]",
+        TraceLogLevel.LOG_ERROR: "[ERROR]",
+        TraceLogLevel.LOG_FATAL: "[FATAL]",
+    }
+
+    def __new__(cls, *args, **kwargs):
+
+        with cls._lock:
+
+            if not cls._instance:
+                cls._instance = super().__new__(cls)
+
+        return cls._instance
+
+
+    def __init__(self, level=TraceLogLevel.LOG_INFO, path=None):
+
+        if hasattr(self, "queue"):  # Singleton: only the first construction configures it
+            return
+
+        self.level = level
+        self.queue = queue.Queue()
+        self.stream = None
+        self.use_color = False
+        self.set_output(path)
+
+        self.writer = threading.Thread(target=self._write_loop, name="TraceLogWriter", daemon=True)
+        self.writer.start()
+        atexit.register(self.close)
+
+
+    def __call__(self, level: int, text: str, *args):
+
+        if level < self.level:
+            return
+        self.queue.put((level, text, args))
+
+
+    def is_enabled(self, level: int) -> bool:
+        """Check before building expensive log arguments."""
+        return level >= self.level
+
+
+    def set_level(self, level: int):
+        self.level = level
+
+
+    def set_output(self, path=None):
+        """Write to stdout (path=None) or append to a file. Colors are only used on a terminal."""
+        self.flush()
+        if self.stream is not None and self.stream is not sys.stdout:
+            self.stream.close()
+        self.stream = sys.stdout if path is None else open(path, "a", buffering=1 << 16)
+        self.use_color = hasattr(self.stream, "isatty") and self.stream.isatty()
+
+
+    def format(self, level: int, text: str, args: tuple) -> str:
+
+        if args:
+            try:
+                text = text % args
+            except (TypeError, ValueError):
+                text = " ".join([text, *map(str, args)])
+
+        line = f"{self.level_names.get(level, '[UNKNOWN]')}: {text}"
+        if self.use_color:
+            line = f"{self.colors.get(level, DEFAULT_COLOR)}{line}{RESET_COLOR}"
+        return line
+
+
+    def _write_loop(self):
+
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            lines = [self.format(*record) for record in batch if record is not None]
+            if lines:
+                try:
+                    self.stream.write("\n".join(lines) + "\n")
+                    self.stream.flush()
+                except (ValueError, OSError):  # Stream closed underneath us at shutdown
+                    pass
+
+            for _ in batch:
+                self.queue.task_done()
+            if stop:
+                return
+
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        if hasattr(self, "writer") and self.writer.is_alive():
+            self.queue.join()
+
+
+    def close(self):
+        """Flush and stop the writer thread."""
+        if self.writer.is_alive():
+            self.queue.put(None)
+            self.writer.join()
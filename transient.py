@@ -0,0 +1,304 @@
+import os
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+import scipy.sparse as sp
+
+import solver
+from netlist import GMIN
+from sparse_solver import SPARSE_MIN_SIZE
+
+
+# Transient analysis of linear RLC circuits: C dx/dt + G x = b(t).
+#
+#   backward Euler  (G + C/h) x1 = b1 + (C/h) x0
+#   trapezoidal     (G + 2C/h) x1 = b1 + b0 + (2C/h - G) x0
+#
+# The matrix only depends on the method and the step h, so fixed-step runs factor it exactly
+# once. Adaptive runs keep h on a power-of-two ladder below the maximum step and cache the
+# factorization of every rung they visit, so growing the step back reuses old factors.
+#
+# Waveforms are streamed to a memory-mapped float64 file (time, then one column per unknown),
+# grown in chunks, so memory stays flat however many steps are taken.
+
+
+# CONSTANTS
+DEFAULT_POINTS = 50             # Default maximum step is stop / DEFAULT_POINTS
+RELTOL = 1e-3                   # Local truncation error tolerance, relative
+VNTOL = 1e-6                    # ... absolute for node voltages
+ABSTOL = 1e-9                   # ... absolute for branch currents
+SAFETY = 0.9
+MAX_HALVINGS = 30               # Smallest step is max_step / 2**MAX_HALVINGS
+FACTOR_CACHE = 16               # Step sizes whose factorizations are kept
+GROWTH_ROWS = 1 << 16           # Rows added to the waveform file each time it fills up
+
+METHODS = {"be": (1.0, 1, 1 / 2), "trap": (2.0, 2, 1 / 3)}  # Matrix C/h factor, order, Milne error constant
+
+
+
+class WaveformFile:
+    """Append-only (time, x) rows backed by np.memmap; the file grows in GROWTH_ROWS chunks."""
+
+    def __init__(self, path: str, columns: int):
+
+        self.path = path
+        self.columns = columns
+        self.rows = 0
+        self.capacity = 0
+        self._file = open(path, "w+b")
+        self._array = None
+        self._grow()
+
+
+    def _grow(self):
+        if self._array is not None:
+            self._array.flush()
+        self.capacity += GROWTH_ROWS
+        self._file.truncate(self.capacity * self.columns * 8)
+        self._array = np.memmap(self._file, dtype=np.float64, mode="r+", shape=(self.capacity, self.columns))
+
+
+    def append(self, t: float, x):
+        if self.rows == self.capacity:
+            self._grow()
+        self._array[self.rows, 0] = t
+        self._array[self.rows, 1:] = x
+        self.rows += 1
+
+
+    def close(self) -> np.memmap:
+        """Trim the file to the rows written and reopen it read-only."""
+        self._array.flush()
+        self._array = None
+        self._file.truncate(self.rows * self.columns * 8)
+        self._file.close()
+        return open_waveforms(self.path, self.columns)
+
+
+
+def open_waveforms(path: str, columns: int) -> np.memmap:
+    """Map a waveform file written by transient analysis (rows of time followed by the unknowns)."""
+    rows = os.path.getsize(path) // (8 * columns)
+    if rows == 0:
+        return np.zeros((0, columns))
+    return np.memmap(path, dtype=np.float64, mode="r", shape=(rows, columns))
+
+
+
+class TransientResult:
+
+    def __init__(self, waveforms, names, path, steps, rejected, factorizations):
+
+        self.waveforms = waveforms          # Read-only memmap, one row per accepted time point
+        self.names = names                  # Column names: "time", then node names and "I(<element>)"
+        self.path = path
+        self.steps = steps
+        self.rejected = rejected
+        self.factorizations = factorizations
+
+
+    @property
+    def time(self):
+        return self.waveforms[:, 0]
+
+
+    def __getitem__(self, name):
+        """Waveform of one node voltage or branch current, e.g. result["out"] or result["I(L1)"]."""
+        return self.waveforms[:, self.names.index(name)]
+
+
+    def __repr__(self):
+        return (f"TransientResult(points={len(self.waveforms)}, steps={self.steps}, rejected={self.rejected}, "
+                f"factorizations={self.factorizations}, path='{self.path}')")
+
+
+
+class TransientSolver:
+
+    def __init__(self, circuit):
+
+        if circuit.nonlinear:
+            raise ValueError("Transient analysis supports linear circuits (R, C, L, sources, E) only.")
+
+        self.circuit = circuit
+        n = self.n = circuit.size
+        rows, cols, vals, self.b_dc = circuit.triplets()
+        self.g = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+        rows, cols, vals = circuit.dynamic_triplets()
+        self.c = sp.coo_matrix((vals, (rows, cols)), shape=(n, n)).tocsr()
+
+        # Sources with waveforms: b(t) = b_dc + sum over sources of unit stamp * (w(t) - dc value)
+        self.sources = [element for element in circuit.elements.values() if element.waveform is not None]
+        units = [element.rhs_unit(circuit.node_index) for element in self.sources]
+        self._unit_rows = np.concatenate([rows for rows, _ in units]) if units else np.zeros(0, dtype=np.int64)
+        self._unit_vals = np.concatenate([vals for _, vals in units]) if units else np.zeros(0)
+        self._unit_source = np.repeat(np.arange(len(units)), [len(rows) for rows, _ in units])
+
+        # Error weights: volts for node rows, amps for branch rows
+        self.abstol = np.full(n, ABSTOL)
+        self.abstol[:len(circuit.nodes)] = VNTOL
+
+        self._factors = OrderedDict()
+        self.factorizations = 0
+
+
+    def rhs(self, t: float) -> np.ndarray:
+        b = self.b_dc.copy()
+        if self.sources:
+            delta = np.array([source.value_at(t) - source.value for source in self.sources])
+            np.add.at(b, self._unit_rows, self._unit_vals * delta[self._unit_source])
+        return b
+
+
+    def factorization(self, method: str, h: float):
+        """Factors of G + alpha C / h, cached per (method, h)."""
+        key = (method, h)
+        if key in self._factors:
+            self._factors.move_to_end(key)
+            return self._factors[key]
+
+        alpha = METHODS[method][0]
+        matrix = (self.g + (alpha / h) * self.c).tocsr()
+        factors = solver.factorize(matrix if self.n >= SPARSE_MIN_SIZE else matrix.toarray())
+        self.factorizations += 1
+        self._factors[key] = factors
+        while len(self._factors) > FACTOR_CACHE:
+            self._factors.popitem(last=False)
+        return factors
+
+
+    def step(self, method, h, t0, x0, b0):
+        """One integration step from (t0, x0). Returns (x1, b1)."""
+        b1 = self.rhs(t0 + h)
+        if method == "be":
+            rhs = b1 + (self.c @ x0) / h
+        else:
+            rhs = b1 + b0 + (2 / h) * (self.c @ x0) - self.g @ x0
+        return self.factorization(method, h).solve(rhs), b1
+
+
+    def initial_state(self) -> np.ndarray:
+        """
+        DC operating point at t = 0: capacitors open, inductors shorted. Every node gets a GMIN
+        shunt to ground, as in SPICE, so a node reached only through capacitors is not floating.
+        """
+        if not self.n:
+            return np.zeros(0)
+        shunt = np.zeros(self.n)
+        shunt[:len(self.circuit.nodes)] = GMIN
+        return solver.solve_system(self.g + sp.diags(shunt), self.rhs(0.0))
+
+
+    def breakpoints(self, stop: float) -> np.ndarray:
+        points = {stop}
+        for source in self.sources:
+            points.update(float(t) for t in source.waveform.breakpoints(stop) if 0 < t <= stop)
+        return np.array(sorted(points))
+
+
+    def run(self, stop, max_step=None, method="trap", adaptive=True, path=None) -> TransientResult:
+        if method not in METHODS:
+            raise ValueError(f"Unknown integration method '{method}'. Expected one of {sorted(METHODS)}.")
+        if stop <= 0:
+            raise ValueError("Stop time must be positive.")
+
+        max_step = max_step or stop / DEFAULT_POINTS
+        if path is None:
+            handle, path = tempfile.mkstemp(prefix="transient-", suffix=".f64")
+            os.close(handle)
+
+        names = ["time", *self.circuit.nodes, *(f"I({name})" for name in self.circuit.branches)]
+        writer = WaveformFile(path, len(names))
+
+        x = self.initial_state()
+        b = self.rhs(0.0)
+        writer.append(0.0, x)
+
+        if adaptive:
+            steps, rejected = self._run_adaptive(stop, max_step, method, x, b, writer)
+        else:
+            steps, rejected = self._run_fixed(stop, max_step, method, x, b, writer), 0
+
+        return TransientResult(writer.close(), names, path, steps, rejected, self.factorizations)
+
+
+    def _run_fixed(self, stop, h, method, x, b, writer) -> int:
+        """Uniform steps: one factorization for the whole run."""
+        count = int(np.ceil(stop / h - 1e-9))
+        for k in range(1, count + 1):
+            x, b = self.step(method, h, (k - 1) * h, x, b)
+            writer.append(k * h, x)
+        return count
+
+
+    def _run_adaptive(self, stop, max_step, method, x, b, writer):
+        """
+        Error-controlled steps. The local truncation error is estimated Milne-style from the
+        difference between the corrector and a polynomial predictor through the last points.
+        """
+        _, order, constant = METHODS[method]
+        breakpoints = self.breakpoints(stop)
+        history = [(0.0, x)]            # Last order + 1 accepted points for the predictor
+        level = 4                       # Start a few rungs below max_step
+        t, steps, rejected = 0.0, 0, 0
+        after_breakpoint = True
+
+        while t < stop * (1 - 1e-12):
+            h = max_step / 2 ** level
+            upcoming = breakpoints[np.searchsorted(breakpoints, t * (1 + 1e-12) + 1e-300, side="right")]
+            landing = t + h >= upcoming * (1 - 1e-9)
+            if landing:
+                h = upcoming - t
+
+            # The first step after a discontinuity uses backward Euler, trapezoidal would ring
+            step_method = "be" if after_breakpoint else method
+            x_new, b_new = self.step(step_method, h, t, x, b)
+
+            if len(history) > order:
+                predicted = extrapolate(history[-(order + 1):], t + h)
+                scale = RELTOL * np.maximum(np.abs(x_new), np.abs(x)) + self.abstol
+                error = constant * np.max(np.abs(x_new - predicted) / scale, initial=0.0)
+                if error > 1 and level < MAX_HALVINGS:
+                    level += max(1, int(np.ceil(np.log2(error) / (order + 1))))
+                    level = min(level, MAX_HALVINGS)
+                    rejected += 1
+                    continue
+                growth = SAFETY * error ** (-1 / (order + 1)) if error > 0 else 2.0
+                if growth >= 2.0 and level > 0:
+                    level -= 1
+
+            t, x, b = (upcoming if landing else t + h), x_new, b_new
+            writer.append(t, x)
+            steps += 1
+            history = (history + [(t, x)])[-(order + 1):]
+            after_breakpoint = landing and t < stop
+            if after_breakpoint:
+                history = [(t, x)]
+
+        return steps, rejected
+
+
+
+def extrapolate(points, t):
+    """Value at t of the polynomial through the (time, x) points (Lagrange form)."""
+    result = 0.0
+    for i, (ti, xi) in enumerate(points):
+        weight = 1.0
+        for j, (tj, _) in enumerate(points):
+            if j != i:
+                weight *= (t - tj) / (ti - tj)
+        result = result + weight * xi
+    return result
+
+
+
+def simulate(circuit, stop, max_step=None, method="trap", adaptive=True, path=None) -> TransientResult:
+    """
+    Transient analysis from the DC operating point at t = 0 up to `stop` seconds.
+
+    With adaptive=False the step is fixed at max_step and a single factorization is reused for
+    every time point. Waveforms are written to `path` (a temporary file if None) and returned as
+    a read-only memmap.
+    """
+    return TransientSolver(circuit).run(stop, max_step, method, adaptive, path)